@@ -0,0 +1,444 @@
+"""
+Async Database CRUD Operations Module
+
+Async counterparts of the CRUD classes in database.py. With the Supabase
+backend all calls share one pooled HTTP/2 connection to Supabase's REST API
+(PostgREST) with keep-alive, so FastAPI endpoints and tools can await them
+without blocking the event loop. With the SQLite backend calls run in worker
+threads.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+import httpx
+from database import (
+    SUPABASE_URL, SUPABASE_KEY, storage,
+    User, UserCreate, UserUpdate,
+    Conversation, ConversationCreate, ConversationUpdate,
+    Message, MessageCreate, MessageUpdate,
+    Escalation, EscalationCreate, EscalationUpdate,
+    SessionBootstrap, Page, PageQuery
+)
+from storage_backends import Order, Conditions, Keyset, postgrest_keyset_filter
+from config.constants import STORAGE_BACKEND, DEFAULT_PAGE_SIZE, DB_POOL_SIZE, DB_KEEPALIVE_CONNECTIONS, DB_KEEPALIVE_EXPIRY_SECONDS, DB_TIMEOUT_SECONDS
+
+class AsyncPostgrestClient:
+    def __init__(
+        self,
+        url: str = SUPABASE_URL,
+        key: str = SUPABASE_KEY,
+        pool_size: int = DB_POOL_SIZE,
+        keepalive_connections: int = DB_KEEPALIVE_CONNECTIONS,
+        timeout: float = DB_TIMEOUT_SECONDS
+    ):
+        """Initialize the pooled HTTP/2 client for the Supabase REST API"""
+        self._client = httpx.AsyncClient(
+            base_url=f"{url.rstrip('/')}/rest/v1",
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Prefer": "return=representation"
+            },
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=keepalive_connections,
+                keepalive_expiry=DB_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            timeout=timeout
+        )
+
+    @staticmethod
+    def _eq_params(filters: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        return {column: f"eq.{value}" for column, value in (filters or {}).items()}
+
+    async def _request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> Any:
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        response = await self._client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+    async def insert(self, table: str, rows: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Insert rows and return them as stored"""
+        return await self._request("POST", f"/{table}", timeout=timeout, json=rows) or []
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order: Optional[Order] = None,
+        limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+        conditions: Optional[Conditions] = None,
+        keyset: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        """Select rows matching equality filters.
+
+        order is a list of (column, descending) pairs; conditions are extra
+        (column, operator, value) filters such as ("sent_at", "gte", "2025-07-01").
+        """
+        params = [("select", columns), *self._eq_params(filters).items()]
+        params += [(column, f"{op}.{value}") for column, op, value in conditions or []]
+        if keyset:
+            params.append(("or", f"({postgrest_keyset_filter(keyset)})"))
+        if order:
+            params.append(("order", ",".join(f"{column}.{'desc' if descending else 'asc'}" for column, descending in order)))
+        if limit is not None:
+            params.append(("limit", str(limit)))
+        return await self._request("GET", f"/{table}", timeout=timeout, params=params) or []
+
+    async def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Update rows matching equality filters and return them"""
+        return await self._request("PATCH", f"/{table}", timeout=timeout, params=self._eq_params(filters), json=data) or []
+
+    async def delete(self, table: str, filters: Dict[str, Any], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Delete rows matching equality filters and return them"""
+        return await self._request("DELETE", f"/{table}", timeout=timeout, params=self._eq_params(filters)) or []
+
+    async def get_or_create_session(self, session_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Call the get_or_create_session_conversation database function"""
+        rows = await self._request("POST", "/rpc/get_or_create_session_conversation", timeout=timeout, json={"p_session_id": session_id})
+        return rows[0] if rows else None
+
+    async def aclose(self):
+        await self._client.aclose()
+
+class AsyncSQLiteClient:
+    """Async facade over the SQLite storage backend; each call runs in a worker thread"""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else storage
+
+    async def insert(self, table: str, rows: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.insert, table, rows)
+
+    async def select(self, table: str, filters: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None, **kwargs) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.select, table, filters, **kwargs)
+
+    async def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.update, table, filters, data)
+
+    async def delete(self, table: str, filters: Dict[str, Any], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.delete, table, filters)
+
+    async def get_or_create_session(self, session_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.get_or_create_session, session_id)
+
+    async def aclose(self):
+        pass
+
+# Shared client, created on first use so it binds to the running event loop
+_client = None
+
+def get_async_client():
+    """Get the shared client for the configured storage backend"""
+    global _client
+    if _client is None:
+        _client = AsyncSQLiteClient() if STORAGE_BACKEND == "sqlite" else AsyncPostgrestClient()
+    return _client
+
+async def _aselect_page(table: str, model, page_query: PageQuery, timeout: Optional[float] = None) -> Page:
+    """Run a keyset-paginated select"""
+    rows = await get_async_client().select(
+        table,
+        order=page_query.order,
+        limit=page_query.fetch_limit,
+        timeout=timeout,
+        conditions=page_query.filters,
+        keyset=page_query.keyset
+    )
+    return page_query.to_page(rows, model)
+
+async def close_async_client():
+    """Close the shared client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+# Async CRUD Operations for Users
+class AsyncUserCRUD:
+    @staticmethod
+    async def create(user: UserCreate, timeout: Optional[float] = None) -> User:
+        """Create a new user"""
+        rows = await get_async_client().insert("users", [user.model_dump(mode="json")], timeout=timeout)
+        if rows:
+            return User(**rows[0])
+        raise Exception("Failed to create user")
+
+    @staticmethod
+    async def get(user_id: int, timeout: Optional[float] = None) -> Optional[User]:
+        """Get user by ID"""
+        rows = await get_async_client().select("users", {"id": user_id}, timeout=timeout)
+        return User(**rows[0]) if rows else None
+
+    @staticmethod
+    async def get_by_email(email: str, timeout: Optional[float] = None) -> Optional[User]:
+        """Get user by email"""
+        rows = await get_async_client().select("users", {"email": email}, timeout=timeout)
+        return User(**rows[0]) if rows else None
+
+    @staticmethod
+    async def get_all(timeout: Optional[float] = None) -> List[User]:
+        """Get all users"""
+        rows = await get_async_client().select("users", timeout=timeout)
+        return [User(**user) for user in rows]
+
+    @staticmethod
+    async def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                       timeout: Optional[float] = None) -> Page[User]:
+        """Get a page of users"""
+        return await _aselect_page("users", User, PageQuery(order_by, ("id",), limit, after, descending), timeout=timeout)
+
+    @staticmethod
+    async def update(user_id: int, user_update: UserUpdate, timeout: Optional[float] = None) -> Optional[User]:
+        """Update user"""
+        update_data = {k: v for k, v in user_update.model_dump(mode="json").items() if v is not None}
+        if not update_data:
+            return await AsyncUserCRUD.get(user_id, timeout=timeout)
+
+        rows = await get_async_client().update("users", {"id": user_id}, update_data, timeout=timeout)
+        return User(**rows[0]) if rows else None
+
+    @staticmethod
+    async def delete(user_id: int, timeout: Optional[float] = None) -> bool:
+        """Delete user"""
+        rows = await get_async_client().delete("users", {"id": user_id}, timeout=timeout)
+        return len(rows) > 0
+
+# Async CRUD Operations for Conversations
+class AsyncConversationCRUD:
+    @staticmethod
+    async def create(conversation: ConversationCreate, timeout: Optional[float] = None) -> Conversation:
+        """Create a new conversation"""
+        rows = await get_async_client().insert("conversations", [conversation.model_dump(mode="json")], timeout=timeout)
+        if rows:
+            return Conversation(**rows[0])
+        raise Exception("Failed to create conversation")
+
+    @staticmethod
+    async def get(conversation_id: int, timeout: Optional[float] = None) -> Optional[Conversation]:
+        """Get conversation by ID"""
+        rows = await get_async_client().select("conversations", {"id": conversation_id}, timeout=timeout)
+        return Conversation(**rows[0]) if rows else None
+
+    @staticmethod
+    async def get_by_user(user_id: int, timeout: Optional[float] = None) -> List[Conversation]:
+        """Get all conversations for a user"""
+        rows = await get_async_client().select("conversations", {"user_id": user_id}, timeout=timeout)
+        return [Conversation(**conv) for conv in rows]
+
+    @staticmethod
+    async def get_latest_by_user(user_id: int, timeout: Optional[float] = None) -> Optional[Conversation]:
+        """Get the most recently started conversation for a user"""
+        rows = await get_async_client().select("conversations", {"user_id": user_id}, order=[("started_at", True), ("id", True)], limit=1, timeout=timeout)
+        return Conversation(**rows[0]) if rows else None
+
+    @staticmethod
+    async def get_all(timeout: Optional[float] = None) -> List[Conversation]:
+        """Get all conversations"""
+        rows = await get_async_client().select("conversations", timeout=timeout)
+        return [Conversation(**conv) for conv in rows]
+
+    @staticmethod
+    async def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                       user_id: Optional[int] = None, started_after: Optional[datetime] = None, started_before: Optional[datetime] = None,
+                       timeout: Optional[float] = None) -> Page[Conversation]:
+        """Get a page of conversations, optionally filtered by user and start time"""
+        return await _aselect_page("conversations", Conversation, PageQuery(order_by, ("id", "started_at"), limit, after, descending, [
+            ("user_id", "eq", user_id),
+            ("started_at", "gte", started_after),
+            ("started_at", "lt", started_before)
+        ]), timeout=timeout)
+
+    @staticmethod
+    async def update(conversation_id: int, conversation_update: ConversationUpdate, timeout: Optional[float] = None) -> Optional[Conversation]:
+        """Update conversation"""
+        update_data = {k: v for k, v in conversation_update.model_dump(mode="json").items() if v is not None}
+        if not update_data:
+            return await AsyncConversationCRUD.get(conversation_id, timeout=timeout)
+
+        rows = await get_async_client().update("conversations", {"id": conversation_id}, update_data, timeout=timeout)
+        return Conversation(**rows[0]) if rows else None
+
+    @staticmethod
+    async def delete(conversation_id: int, timeout: Optional[float] = None) -> bool:
+        """Delete conversation"""
+        rows = await get_async_client().delete("conversations", {"id": conversation_id}, timeout=timeout)
+        return len(rows) > 0
+
+# Async CRUD Operations for Messages
+class AsyncMessageCRUD:
+    @staticmethod
+    async def create(message: MessageCreate, timeout: Optional[float] = None) -> Message:
+        """Create a new message"""
+        rows = await get_async_client().insert("messages", [message.model_dump(mode="json")], timeout=timeout)
+        if rows:
+            return Message(**rows[0])
+        raise Exception("Failed to create message")
+
+    @staticmethod
+    async def create_many(messages: List[MessageCreate], timeout: Optional[float] = None) -> List[Message]:
+        """Create several messages in one bulk insert, preserving their order"""
+        if not messages:
+            return []
+        rows = await get_async_client().insert("messages", [message.model_dump(mode="json") for message in messages], timeout=timeout)
+        if rows:
+            return [Message(**msg) for msg in rows]
+        raise Exception("Failed to create messages")
+
+    @staticmethod
+    async def get(message_id: int, timeout: Optional[float] = None) -> Optional[Message]:
+        """Get message by ID"""
+        rows = await get_async_client().select("messages", {"id": message_id}, timeout=timeout)
+        return Message(**rows[0]) if rows else None
+
+    @staticmethod
+    async def get_by_conversation(conversation_id: int, timeout: Optional[float] = None) -> List[Message]:
+        """Get all messages for a conversation"""
+        rows = await get_async_client().select("messages", {"conversation_id": conversation_id}, order=[("sent_at", False), ("id", False)], timeout=timeout)
+        return [Message(**msg) for msg in rows]
+
+    @staticmethod
+    async def get_recent_contents(conversation_id: int, limit: int = 5, timeout: Optional[float] = None) -> List[str]:
+        """Get the content of the last `limit` messages of a conversation, oldest first"""
+        rows = await get_async_client().select(
+            "messages", {"conversation_id": conversation_id}, columns="content",
+            order=[("sent_at", True), ("id", True)], limit=limit, timeout=timeout
+        )
+        return [msg["content"] for msg in reversed(rows)]
+
+    @staticmethod
+    async def get_all(timeout: Optional[float] = None) -> List[Message]:
+        """Get all messages"""
+        rows = await get_async_client().select("messages", timeout=timeout)
+        return [Message(**msg) for msg in rows]
+
+    @staticmethod
+    async def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                       conversation_id: Optional[int] = None, sent_after: Optional[datetime] = None, sent_before: Optional[datetime] = None,
+                       timeout: Optional[float] = None) -> Page[Message]:
+        """Get a page of messages, optionally filtered by conversation and send time"""
+        return await _aselect_page("messages", Message, PageQuery(order_by, ("id", "sent_at"), limit, after, descending, [
+            ("conversation_id", "eq", conversation_id),
+            ("sent_at", "gte", sent_after),
+            ("sent_at", "lt", sent_before)
+        ]), timeout=timeout)
+
+    @staticmethod
+    async def update(message_id: int, message_update: MessageUpdate, timeout: Optional[float] = None) -> Optional[Message]:
+        """Update message"""
+        update_data = {k: v for k, v in message_update.model_dump(mode="json").items() if v is not None}
+        if not update_data:
+            return await AsyncMessageCRUD.get(message_id, timeout=timeout)
+
+        rows = await get_async_client().update("messages", {"id": message_id}, update_data, timeout=timeout)
+        return Message(**rows[0]) if rows else None
+
+    @staticmethod
+    async def delete(message_id: int, timeout: Optional[float] = None) -> bool:
+        """Delete message"""
+        rows = await get_async_client().delete("messages", {"id": message_id}, timeout=timeout)
+        return len(rows) > 0
+
+# Async CRUD Operations for Escalations
+class AsyncEscalationCRUD:
+    @staticmethod
+    async def create(escalation: EscalationCreate, timeout: Optional[float] = None) -> Escalation:
+        """Create a new escalation"""
+        rows = await get_async_client().insert("escalations", [escalation.model_dump(mode="json")], timeout=timeout)
+        if rows:
+            return Escalation(**rows[0])
+        raise Exception("Failed to create escalation")
+
+    @staticmethod
+    async def get(escalation_id: int, timeout: Optional[float] = None) -> Optional[Escalation]:
+        """Get escalation by ID"""
+        rows = await get_async_client().select("escalations", {"id": escalation_id}, timeout=timeout)
+        return Escalation(**rows[0]) if rows else None
+
+    @staticmethod
+    async def get_by_conversation(conversation_id: int, timeout: Optional[float] = None) -> List[Escalation]:
+        """Get all escalations for a conversation"""
+        rows = await get_async_client().select("escalations", {"conversation_id": conversation_id}, timeout=timeout)
+        return [Escalation(**esc) for esc in rows]
+
+    @staticmethod
+    async def get_all(timeout: Optional[float] = None) -> List[Escalation]:
+        """Get all escalations"""
+        rows = await get_async_client().select("escalations", timeout=timeout)
+        return [Escalation(**esc) for esc in rows]
+
+    @staticmethod
+    async def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                       conversation_id: Optional[int] = None, status: Optional[str] = None, issue_type: Optional[str] = None,
+                       created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                       timeout: Optional[float] = None) -> Page[Escalation]:
+        """Get a page of escalations, optionally filtered by conversation, status, issue type and creation time"""
+        return await _aselect_page("escalations", Escalation, PageQuery(order_by, ("id", "created_at"), limit, after, descending, [
+            ("conversation_id", "eq", conversation_id),
+            ("status", "eq", status),
+            ("issue_type", "eq", issue_type),
+            ("created_at", "gte", created_after),
+            ("created_at", "lt", created_before)
+        ]), timeout=timeout)
+
+    @staticmethod
+    async def update(escalation_id: int, escalation_update: EscalationUpdate, timeout: Optional[float] = None) -> Optional[Escalation]:
+        """Update escalation"""
+        update_data = {k: v for k, v in escalation_update.model_dump(mode="json").items() if v is not None}
+        if not update_data:
+            return await AsyncEscalationCRUD.get(escalation_id, timeout=timeout)
+
+        rows = await get_async_client().update("escalations", {"id": escalation_id}, update_data, timeout=timeout)
+        return Escalation(**rows[0]) if rows else None
+
+    @staticmethod
+    async def delete(escalation_id: int, timeout: Optional[float] = None) -> bool:
+        """Delete escalation"""
+        rows = await get_async_client().delete("escalations", {"id": escalation_id}, timeout=timeout)
+        return len(rows) > 0
+
+# Async session bootstrap for chat sessions
+class AsyncSessionCRUD:
+    @staticmethod
+    async def get_or_create(session_id: str, timeout: Optional[float] = None) -> SessionBootstrap:
+        """Get or create the anonymous user and conversation for a session in one round trip"""
+        row = await get_async_client().get_or_create_session(session_id, timeout=timeout)
+        if row:
+            return SessionBootstrap(**row)
+        raise Exception("Failed to get or create session conversation")
+
+# Async convenience functions for common operations
+async def aget_conversation_with_messages(conversation_id: int, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Get conversation with one page of its messages, oldest first"""
+    conversation = await AsyncConversationCRUD.get(conversation_id)
+    if not conversation:
+        return None
+
+    page = await AsyncMessageCRUD.get_page(limit=limit, after=after, order_by="sent_at", conversation_id=conversation_id)
+    return {
+        "conversation": conversation,
+        "messages": page.items,
+        "next_cursor": page.next_cursor
+    }
+
+async def acreate_user_conversation(user_id: int, title: str = None) -> Conversation:
+    """Create a new conversation for a user"""
+    conversation_data = ConversationCreate(
+        user_id=user_id,
+        title=title or f"Conversation {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+    )
+    return await AsyncConversationCRUD.create(conversation_data)
+
+async def aadd_message_to_conversation(conversation_id: int, content: str, **kwargs) -> Message:
+    """Add a message to a conversation"""
+    message_data = MessageCreate(
+        conversation_id=conversation_id,
+        content=content,
+        **kwargs
+    )
+    return await AsyncMessageCRUD.create(message_data)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Agent mode benchmark for Alexa - Member Support Agent
+Runs the same questions through the tool-calling agent flow and the
+pre-retrieval flow and compares latency, LLM round trips, tokens and answers.
+
+Questions come from a JSON file of [{"question": ..., "expected": ...}]; an
+answer is counted correct when it contains the expected text. Without a file
+a built-in set is used and only the answers are printed for review. The fast
+path and the answer cache are switched off so every turn reaches the model.
+
+Usage: python benchmark_agent_modes.py [--questions FILE] [--show-answers]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+from langchain_community.callbacks import get_openai_callback
+from chat_chain import ChatChain, DEFAULT_SESSION_KEY
+
+DEFAULT_QUESTIONS = [
+    {"question": "How do I open a new account?"},
+    {"question": "What should I do if my debit card is lost or stolen?"},
+    {"question": "Why should I join Horizon Bay Credit Union?"},
+    {"question": "How can I reach member services?"},
+    {"question": "What services do you offer?"}
+]
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def run_mode(mode: str, questions: List[Dict[str, str]]) -> Dict[str, Any]:
+    chain = ChatChain(mode=mode)
+    chain.router = None
+    chain.answer_cache = None
+    latencies, round_trips, prompt_tokens, total_tokens, answers = [], [], [], [], []
+    try:
+        for question in questions:
+            # Every question starts a fresh conversation
+            chain.memory.clear(DEFAULT_SESSION_KEY)
+            with get_openai_callback() as usage:
+                start = time.perf_counter()
+                answer = chain.get_response(question["question"])
+                latencies.append(time.perf_counter() - start)
+            round_trips.append(usage.successful_requests)
+            prompt_tokens.append(usage.prompt_tokens)
+            total_tokens.append(usage.total_tokens)
+            answers.append(answer)
+    finally:
+        chain.message_writer.close()
+
+    graded = [(question, answer) for question, answer in zip(questions, answers) if question.get("expected")]
+    correct = sum(normalize(question["expected"]) in normalize(answer) for question, answer in graded)
+    return {
+        "latency_p50": statistics.median(latencies),
+        "latency_max": max(latencies),
+        "round_trips": statistics.mean(round_trips),
+        "prompt_tokens": statistics.mean(prompt_tokens),
+        "total_tokens": statistics.mean(total_tokens),
+        "accuracy": correct / len(graded) if graded else None,
+        "answers": answers
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the agent and pre-retrieval flows")
+    parser.add_argument("--questions", help="JSON list of {question, expected}; a built-in set if omitted")
+    parser.add_argument("--show-answers", action="store_true", help="Print both answers to every question")
+    args = parser.parse_args()
+
+    questions = DEFAULT_QUESTIONS
+    if args.questions:
+        with open(args.questions) as f:
+            questions = json.load(f)
+
+    print(f"=== Agent mode benchmark: {len(questions)} questions ===")
+    results = {mode: run_mode(mode, questions) for mode in ("agent", "pre_retrieval")}
+
+    print(f"{'mode':<15}{'p50 s':>8}{'max s':>8}{'LLM calls':>11}{'prompt tok':>12}{'total tok':>11}{'accuracy':>10}")
+    for mode, result in results.items():
+        accuracy = f"{result['accuracy']:.0%}" if result["accuracy"] is not None else "-"
+        print(
+            f"{mode:<15}{result['latency_p50']:>8.2f}{result['latency_max']:>8.2f}{result['round_trips']:>11.1f}"
+            f"{result['prompt_tokens']:>12.0f}{result['total_tokens']:>11.0f}{accuracy:>10}"
+        )
+
+    if args.show_answers or results["agent"]["accuracy"] is None:
+        for i, question in enumerate(questions):
+            print(f"\nQ: {question['question']}")
+            for mode, result in results.items():
+                print(f"  [{mode}] {result['answers'][i]}")
+
+if __name__ == "__main__":
+    main()
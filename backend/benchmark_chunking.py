@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Chunking benchmark for Alexa - Member Support Agent
+Compares the structured chunker with the character splitter on retrieval hit
+rate and on the tokens the top k chunks add to every LLM call.
+
+Questions come from a JSON file of [{"question": ..., "expected": ...}], where
+a hit means a retrieved chunk contains the expected text. Without one, a
+known-item set is sampled from the knowledge base: each question is a
+sentence from the PDFs and must retrieve a chunk that contains it whole.
+
+Usage: python benchmark_chunking.py [--questions FILE] [--provider local] [--k 3]
+"""
+
+import argparse
+import json
+import random
+import re
+import tempfile
+from typing import Any, Dict, List
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from chunker import count_tokens
+from config.constants import PDF_DIR, EMBEDDING_PROVIDER
+from document_pipeline import DocumentPipeline
+from embedding_batcher import EmbeddingBatcher
+from embedding_providers import create_embeddings
+from vector_index import VectorIndex
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def chunk_with(chunker: str, pdf_dir: str) -> List[Document]:
+    pipeline = DocumentPipeline()
+    pipeline.chunker = chunker
+    return pipeline.chunk_documents(pipeline.load_documents(pdf_dir))
+
+def sample_questions(pdf_dir: str, count: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Known-item questions: sentences of 8 to 30 words taken from the PDF pages"""
+    pipeline = DocumentPipeline()
+    pipeline.chunker = "character"
+    sentences = []
+    for page in pipeline.load_documents(pdf_dir):
+        for sentence in re.split(r"(?<=[.!?])\s+", " ".join(page.page_content.split())):
+            if 8 <= len(sentence.split()) <= 30:
+                sentences.append(sentence)
+    random.Random(seed).shuffle(sentences)
+    return [{"question": sentence, "expected": sentence} for sentence in sentences[:count]]
+
+def evaluate(chunks: List[Document], questions: List[Dict[str, str]], embeddings: Embeddings, k: int) -> Dict[str, Any]:
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = [None] * len(texts)
+    for offset, batch in EmbeddingBatcher(embeddings).iter_batches(texts):
+        vectors[offset:offset + len(batch)] = batch
+
+    with tempfile.TemporaryDirectory() as path:
+        index = VectorIndex(path, embedding_function=embeddings)
+        index.upsert([str(i) for i in range(len(texts))], texts, [chunk.metadata for chunk in chunks], vectors)
+        hits = 0
+        context_tokens = 0
+        for question in questions:
+            context = [doc.page_content for doc in index.similarity_search(question["question"], k=k)]
+            hits += any(normalize(question["expected"]) in normalize(text) for text in context)
+            context_tokens += sum(count_tokens(text) for text in context)
+
+    chunk_tokens = [count_tokens(text) for text in texts]
+    return {
+        "chunks": len(chunks),
+        "avg_chunk_tokens": sum(chunk_tokens) / max(len(chunks), 1),
+        "max_chunk_tokens": max(chunk_tokens, default=0),
+        "hit_rate": hits / max(len(questions), 1),
+        "tokens_per_turn": context_tokens / max(len(questions), 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunkers on retrieval hit rate and tokens per turn")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--questions", help="JSON list of {question, expected}; sampled from the PDFs if omitted")
+    parser.add_argument("--samples", type=int, default=100, help="Known-item questions to sample")
+    parser.add_argument("--provider", default=EMBEDDING_PROVIDER, help="Embedding provider: openai or local")
+    parser.add_argument("--k", type=int, default=3, help="Chunks retrieved per question")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions) as f:
+            questions = json.load(f)
+    else:
+        questions = sample_questions(args.pdf_dir, args.samples)
+    if not questions:
+        print("❌ No questions to evaluate")
+        return
+
+    embeddings = create_embeddings(args.provider)
+    print(f"=== Chunking benchmark: {len(questions)} questions, top {args.k}, {args.provider} embeddings ===")
+    print(f"{'chunker':<12}{'chunks':>8}{'avg tok':>10}{'max tok':>10}{'hit rate':>10}{'tok/turn':>10}")
+    for chunker in ("character", "structured"):
+        result = evaluate(chunk_with(chunker, args.pdf_dir), questions, embeddings, args.k)
+        print(
+            f"{chunker:<12}{result['chunks']:>8}{result['avg_chunk_tokens']:>10.0f}{result['max_chunk_tokens']:>10}"
+            f"{result['hit_rate']:>10.1%}{result['tokens_per_turn']:>10.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
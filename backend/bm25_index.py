@@ -0,0 +1,153 @@
+"""
+Lexical retrieval for Alexa - Member Support Agent
+An in-memory BM25 inverted index over the knowledge base chunks, persisted
+next to the vector store, and a hybrid retriever that fuses its results with
+vector search using reciprocal rank fusion
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from config.constants import BM25_INDEX_FILE, BM25_K1, BM25_B, HYBRID_FETCH_K, RRF_K
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; hyphenated or dotted terms such as
+    "1-888-hbcu-help" are kept whole as well as split into their parts"""
+    tokens = []
+    for term in _TOKEN.findall(text.lower()):
+        tokens.append(term)
+        parts = re.split(r"[-.]", term)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    def __init__(self, path: str = BM25_INDEX_FILE, k1: float = BM25_K1, b: float = BM25_B):
+        """Initialize an empty index; use load() to read a persisted one"""
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._mtime: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    @classmethod
+    def load(cls, path: str = BM25_INDEX_FILE) -> "BM25Index":
+        """Load the persisted index, or an empty one if there is none"""
+        index = cls(path)
+        index.refresh()
+        return index
+
+    def refresh(self):
+        """Reload from disk if another process re-indexed since the last load"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path) as f:
+            data = json.load(f)
+        self.docs = {chunk_id: (text, metadata) for chunk_id, (text, metadata) in data["docs"].items()}
+        self.lengths = data["lengths"]
+        self.postings = data["postings"]
+        self._total_length = sum(self.lengths.values())
+        self._mtime = mtime
+
+    def save(self):
+        # Write then rename so readers never see a half-written index
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"docs": self.docs, "lengths": self.lengths, "postings": self.postings}, f)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def clear(self):
+        self.docs, self.lengths, self.postings = {}, {}, {}
+        self._total_length = 0
+
+    def add(self, ids: List[str], documents: List[Document]):
+        """Index documents under their chunk ids, replacing any with the same id"""
+        self.delete([chunk_id for chunk_id in ids if chunk_id in self.docs])
+        for chunk_id, document in zip(ids, documents):
+            counts = Counter(tokenize(document.page_content))
+            self.docs[chunk_id] = (document.page_content, document.metadata)
+            self.lengths[chunk_id] = sum(counts.values())
+            self._total_length += self.lengths[chunk_id]
+            for term, count in counts.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+
+    def delete(self, ids: List[str]):
+        for chunk_id in ids:
+            if chunk_id not in self.docs:
+                continue
+            text, _ = self.docs.pop(chunk_id)
+            self._total_length -= self.lengths.pop(chunk_id)
+            for term in set(tokenize(text)):
+                postings = self.postings.get(term)
+                if postings is not None:
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self.postings[term]
+
+    def search(self, query: str, k: int = HYBRID_FETCH_K) -> List[Tuple[str, float]]:
+        """Top k (chunk id, BM25 score) pairs for the query"""
+        if not self.docs:
+            return []
+        doc_count = len(self.docs)
+        avg_length = self._total_length / doc_count
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, count in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def document(self, chunk_id: str) -> Document:
+        text, metadata = self.docs[chunk_id]
+        return Document(page_content=text, metadata=metadata)
+
+class HybridRetriever(BaseRetriever):
+    """Fuses BM25 and vector search results with reciprocal rank fusion"""
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 3
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        self.lexical_index.refresh()
+        ranked_lists = [
+            [self.lexical_index.document(chunk_id) for chunk_id, _ in self.lexical_index.search(query, self.fetch_k)],
+            self.vectorstore.similarity_search(query, k=self.fetch_k)
+        ]
+
+        # Both sides return the same chunks, so the text identifies a result
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranked in ranked_lists:
+            for rank, document in enumerate(ranked):
+                key = document.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, document)
+        best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [documents[key] for key in best]
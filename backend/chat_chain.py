@@ -3,27 +3,56 @@ Chat Chain for Alexa - Member Support Agent
 Builds LangChain's AgentExecutor with tool calling agent
 """
 
+import asyncio
+from collections import Counter
 from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.memory import ConversationBufferMemory
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from prompt_manager import get_system_prompt
-from tools import send_notification, record_user_details, log_unknown_question, search_knowledge_base
+from prompt_manager import get_system_prompt, get_pre_retrieval_system_prompt
+from session_memory import SessionMemoryStore
+from message_writer import MessageWriter
+from session_registry import SessionRegistry
+from semantic_cache import SemanticCache
+from intent_router import IntentRouter
+from embedding_providers import create_embeddings
+from config.constants import EMBEDDING_MODEL, SEMANTIC_CACHE_ENABLED, INTENT_ROUTER_ENABLED, AGENT_MODE
+from tools import set_message_writer, send_notification, record_user_details, log_unknown_question, search_knowledge_base, search_context, asearch_context
+
+# Memory key used when no session_id is given (e.g. gradio_test.py)
+DEFAULT_SESSION_KEY = "local"
+
+# Member-facing status shown while a tool runs during a streamed turn
+TOOL_STATUS_MESSAGES = {
+    "search_knowledge_base": "Searching knowledge base...",
+    "record_user_details": "Saving your contact details...",
+    "send_notification": "Contacting a member service specialist...",
+    "log_unknown_question": "Logging your question for follow-up..."
+}
+
+# Turns that only used these tools answer from the knowledge base alone, so
+# their answers can be reused for other members
+CACHEABLE_TOOLS = {"search_knowledge_base"}
 
 class ChatChain:
-    def __init__(self):
-        """Initialize the agent executor with tools, memory, and LLM"""
+    def __init__(self, mode: str = AGENT_MODE):
+        """Initialize the agent executor with tools, memory, and LLM.
+
+        In "pre_retrieval" mode the knowledge base is searched on the member's
+        message before the first LLM call and the results are put in the
+        prompt, so a knowledge base answer takes one LLM round trip instead of
+        two. The model keeps the escalation and logging tools.
+        """
+        if mode not in ("agent", "pre_retrieval"):
+            raise ValueError(f"Unknown agent mode: {mode}")
+        self.mode = mode
         # Initialize LLM
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.7
         )
 
-        # Initialize memory
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        # Initialize per-session memory (history is passed to the executor on each turn)
+        self.memory = SessionMemoryStore(token_counter=self.llm.get_num_tokens_from_messages)
 
         # Define all tools
         self.tools = [
@@ -32,20 +61,26 @@ class ChatChain:
             record_user_details,
             log_unknown_question
         ]
+        if self.pre_retrieval:
+            # Search already ran before the call
+            self.tools = self.tools[1:]
 
         # Bind tools to LLM
         self.llm_with_tools = self.llm.bind_tools(self.tools)
 
         # Get system prompt
-        system_prompt = get_system_prompt()
+        system_prompt = get_pre_retrieval_system_prompt() if self.pre_retrieval else get_system_prompt()
 
         # Create prompt template for agent
-        self.prompt = ChatPromptTemplate.from_messages([
+        messages = [
             ("system", system_prompt),
             ("placeholder", "{chat_history}"),
             ("human", "{input}"),
             ("placeholder", "{agent_scratchpad}")
-        ])
+        ]
+        if self.pre_retrieval:
+            messages.insert(2, ("system", "KNOWLEDGE BASE RESULTS for the member's message:\n\n{context}"))
+        self.prompt = ChatPromptTemplate.from_messages(messages)
 
         # Create the agent
         self.agent = create_tool_calling_agent(
@@ -58,44 +93,63 @@ class ChatChain:
         self.executor = AgentExecutor(
             agent=self.agent,
             tools=self.tools,
-            memory=self.memory,
             verbose=True,  # Enable verbose to see tool calls
-            max_iterations=5
+            max_iterations=5,
+            return_intermediate_steps=True  # Tool names decide whether an answer is cacheable
         )
+
+        # Greetings, thanks and goodbyes are answered from templates without the agent
+        self.router = IntentRouter() if INTENT_ROUTER_ENABLED else None
+        # Turns served per path: "fast_path", "cache" or "agent"
+        self.route_counts = Counter()
+
+        # Semantic answer cache in front of the agent for repeated FAQ questions
+        self.answer_cache = None
+        if SEMANTIC_CACHE_ENABLED:
+            self.answer_cache = SemanticCache(embed=create_embeddings(model=EMBEDDING_MODEL).embed_query)
         
-        # Session management
-        self.session_conversations = {}  # session_id -> conversation_id
+        # Session management (session_id -> conversation_id, shared across workers)
+        self.session_registry = SessionRegistry()
+
+        # Messages are persisted in batches off the response path
+        self.message_writer = MessageWriter()
+        self.message_writer.start()
+        # Escalations read recent messages back from the database
+        set_message_writer(self.message_writer)
+
+    @property
+    def pre_retrieval(self) -> bool:
+        return self.mode == "pre_retrieval"
 
     def get_or_create_conversation(self, session_id: str) -> int:
         """Get existing conversation or create new one for session"""
-        from database import ConversationCRUD, UserCRUD, ConversationCreate, UserCreate
+        return self.session_registry.get_or_create(
+            session_id, lambda: self._create_conversation(session_id)
+        )
+
+    def _create_conversation(self, session_id: str) -> int:
+        """Get or create the anonymous user and conversation for a session"""
+        from database import SessionCRUD
         
-        # Check if session already has a conversation
-        if session_id in self.session_conversations:
-            return self.session_conversations[session_id]
+        session = SessionCRUD.get_or_create(session_id)
         
-        # Create anonymous user for this session
-        try:
-            user = UserCRUD.create(UserCreate(
-                name="Anonymous",
-                email=f"anonymous_{session_id}@demo.com"
-            ))
-        except Exception:
-            # User might already exist, try to get by email
-            user = UserCRUD.get_by_email(f"anonymous_{session_id}@demo.com")
-            if not user:
-                raise Exception("Failed to create or retrieve user")
-        
-        # Create new conversation for this session
-        conversation = ConversationCRUD.create(ConversationCreate(
-            user_id=user.id
-        ))
+        print(f"📝 SESSION: Using conversation {session.conversation_id} for session {session_id}")
+        return session.conversation_id
+
+    async def aget_or_create_conversation(self, session_id: str) -> int:
+        """Async variant of get_or_create_conversation using the async CRUD layer"""
+        return await self.session_registry.aget_or_create(
+            session_id, lambda: self._acreate_conversation(session_id)
+        )
+
+    async def _acreate_conversation(self, session_id: str) -> int:
+        """Get or create the anonymous user and conversation over the pooled async client"""
+        from async_database import AsyncSessionCRUD
         
-        # Store conversation ID for this session
-        self.session_conversations[session_id] = conversation.id
+        session = await AsyncSessionCRUD.get_or_create(session_id)
         
-        print(f"📝 SESSION: Created conversation {conversation.id} for session {session_id}")
-        return conversation.id
+        print(f"📝 SESSION: Using conversation {session.conversation_id} for session {session_id}")
+        return session.conversation_id
 
     def store_message(self, conversation_id: int, content: str, sender: str = "user"):
         """Store message in database"""
@@ -112,6 +166,116 @@ class ChatChain:
             print(f"❌ MESSAGE STORAGE ERROR: {e}")
             return None
 
+    def enqueue_message(self, conversation_id: int, content: str, sender: str = "user") -> bool:
+        """Queue message for write-behind persistence; returns whether it was queued"""
+        from database import MessageCreate
+        
+        queued = self.message_writer.enqueue(MessageCreate(
+            conversation_id=conversation_id,
+            content=content
+        ))
+        if queued:
+            print(f"💾 MESSAGE: Queued {sender} message for conversation {conversation_id}")
+        return queued
+
+    def _build_input(self, message: str, session_id: str = None) -> str:
+        """Create enhanced input with session context for tools"""
+        if session_id:
+            return f"Session ID: {session_id}\n\nUser Message: {message}"
+        return message
+
+    def _agent_input(self, message: str, session_id: str = None, context: str = None) -> dict:
+        """Build executor input with this session's chat history and, in
+        pre-retrieval mode, the knowledge base results"""
+        agent_input = {
+            "input": self._build_input(message, session_id),
+            "chat_history": self.memory.get_history(session_id or DEFAULT_SESSION_KEY)
+        }
+        if self.pre_retrieval:
+            agent_input["context"] = context or "No results."
+        return agent_input
+
+    def _retrieval_query(self, message: str, session_id: str = None) -> str:
+        """Search query for pre-retrieval: the member's message, after their
+        previous one so a follow-up like "what about for cars?" keeps its topic"""
+        history = self.memory.get_history(session_id or DEFAULT_SESSION_KEY)
+        previous = next((turn.content for turn in reversed(history) if turn.type == "human"), None)
+        return f"{previous}\n{message}" if previous else message
+
+    def _retrieve(self, message: str, session_id: str = None) -> str:
+        """Knowledge base results for pre-retrieval mode, or None"""
+        return search_context(self._retrieval_query(message, session_id)) if self.pre_retrieval else None
+
+    async def _aretrieve(self, message: str, session_id: str = None) -> str:
+        return await asearch_context(self._retrieval_query(message, session_id)) if self.pre_retrieval else None
+
+    def _tools_used(self, intermediate_steps: list) -> set:
+        """Tools the turn relied on; a pre-retrieved answer counts as a knowledge base search"""
+        tools_used = {action.tool for action, _ in intermediate_steps}
+        if self.pre_retrieval:
+            tools_used.add("search_knowledge_base")
+        return tools_used
+
+    def _fast_path(self, message: str) -> str:
+        """Templated answer for a trivial turn; router failures never fail the turn"""
+        if not self.router:
+            return None
+        try:
+            route = self.router.route(message)
+        except Exception as e:
+            print(f"❌ ROUTER ERROR: {e}")
+            return None
+        if route:
+            print(f"⚡ FAST PATH: '{message}' → {route['intent']} ({route['method']}, {route['confidence']:.2f})")
+            return route["response"]
+        return None
+
+    def _record_route(self, route: str):
+        """Count which path served the turn"""
+        self.route_counts[route] += 1
+        print(f"🛣️ ROUTE: {route} (totals: {dict(self.route_counts)})")
+
+    def _cached_answer(self, message: str, session_id: str = None) -> str:
+        """Look up a cached answer; cache failures never fail the turn.
+
+        Only standalone answers are cached, so a turn with chat history (which
+        may be a follow-up like "what about for cars?") skips the lookup.
+        """
+        if not self.answer_cache or self.memory.get_history(session_id or DEFAULT_SESSION_KEY):
+            return None
+        try:
+            answer = self.answer_cache.lookup(message)
+        except Exception as e:
+            print(f"❌ CACHE ERROR: {e}")
+            return None
+        if answer:
+            print(f"⚡ CACHE HIT: '{message}'")
+        return answer
+
+    def _cache_answer(self, message: str, agent_input: dict, tools_used: set, response_text: str):
+        """Cache a standalone answer that came from the knowledge base alone"""
+        if not self.answer_cache or agent_input["chat_history"]:
+            return
+        if "search_knowledge_base" not in tools_used or not tools_used <= CACHEABLE_TOOLS:
+            return
+        try:
+            self.answer_cache.store(message, response_text)
+        except Exception as e:
+            print(f"❌ CACHE ERROR: {e}")
+
+    def _finish_turn(self, message: str, response_text: str, session_id: str = None, conversation_id: int = None):
+        """Add the turn to session memory and queue the answer for persistence"""
+        self.memory.add_turn(session_id or DEFAULT_SESSION_KEY, message, response_text)
+        if conversation_id:
+            self.enqueue_message(conversation_id, response_text, "agent")
+
+    def _error_response(self, e: Exception) -> str:
+        """Log an agent failure and build the member-facing apology"""
+        print(f"❌ AGENT ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return f"I apologize, but I encountered an error: {str(e)}. Please try again or contact support at 1-888-HBCU-HELP."
+
     def get_response(self, message: str, session_id: str = None) -> str:
         """Get response using the agent executor with verbose logging and session management"""
         try:
@@ -122,30 +286,132 @@ class ChatChain:
             if session_id:
                 conversation_id = self.get_or_create_conversation(session_id)
                 # Store user message
-                self.store_message(conversation_id, message, "user")
+                self.enqueue_message(conversation_id, message, "user")
             
-            # Create enhanced input with session context for tools
-            enhanced_input = message
-            if session_id:
-                enhanced_input = f"Session ID: {session_id}\n\nUser Message: {message}"
+            # Answer trivial turns from templates and repeated FAQ questions
+            # from the cache, otherwise run the agent
+            response_text, route = self._fast_path(message), "fast_path"
+            if response_text is None:
+                response_text, route = self._cached_answer(message, session_id), "cache"
+            if response_text is None:
+                route = "agent"
+                agent_input = self._agent_input(message, session_id, self._retrieve(message, session_id))
+                response = self.executor.invoke(agent_input)
+                
+                # Extract the response text
+                response_text = response.get('output', 'I apologize, but I encountered an issue processing your request.')
+                tools_used = self._tools_used(response.get("intermediate_steps", []))
+                self._cache_answer(message, agent_input, tools_used, response_text)
+            self._record_route(route)
+            # Store agent response if we have a conversation
+            self._finish_turn(message, response_text, session_id, conversation_id)
             
-            # Use the agent executor that's already configured
-            response = self.executor.invoke({"input": enhanced_input})
+            print(f"🤖 AGENT RESPONSE: {response_text[:100]}...")
+            return response_text
+                
+        except Exception as e:
+            return self._error_response(e)
+
+    async def aget_response(self, message: str, session_id: str = None) -> str:
+        """Async variant of get_response that never blocks the event loop.
+
+        The agent runs through AgentExecutor.ainvoke, so the OpenAI round trips
+        are awaited and sync tools are run in LangChain's thread pool. The
+        session bootstrap goes through the async CRUD layer.
+        """
+        try:
+            print(f"🎯 AGENT EXECUTOR (async): Processing message: '{message}'")
             
-            # Extract the response text
-            response_text = response.get('output', 'I apologize, but I encountered an issue processing your request.')
+            conversation_id = None
+            if session_id:
+                conversation_id = await self.aget_or_create_conversation(session_id)
+                self.enqueue_message(conversation_id, message, "user")
             
-            # Store agent response if we have a conversation
-            if conversation_id:
-                self.store_message(conversation_id, response_text, "agent")
+            response_text, route = self._fast_path(message), "fast_path"
+            if response_text is None:
+                response_text, route = await asyncio.to_thread(self._cached_answer, message, session_id), "cache"
+            if response_text is None:
+                route = "agent"
+                agent_input = self._agent_input(message, session_id, await self._aretrieve(message, session_id))
+                response = await self.executor.ainvoke(agent_input)
+                
+                response_text = response.get('output', 'I apologize, but I encountered an issue processing your request.')
+                tools_used = self._tools_used(response.get("intermediate_steps", []))
+                await asyncio.to_thread(self._cache_answer, message, agent_input, tools_used, response_text)
+            self._record_route(route)
+            self._finish_turn(message, response_text, session_id, conversation_id)
             
             print(f"🤖 AGENT RESPONSE: {response_text[:100]}...")
             return response_text
                 
         except Exception as e:
-            print(f"❌ AGENT ERROR: {e}")
-            import traceback
-            traceback.print_exc()
-            return f"I apologize, but I encountered an error: {str(e)}. Please try again or contact support at 1-888-HBCU-HELP." 
-        
-    
\ No newline at end of file
+            return self._error_response(e)
+
+    async def astream_response(self, message: str, session_id: str = None):
+        """Stream a turn as events while the agent runs.
+
+        Yields dicts of the form {"type": "status", "message": ...} when a tool
+        starts, {"type": "token", "content": ...} for each answer token and a
+        final {"type": "done", "response": ..., "route": ...}. The finished answer is stored
+        through enqueue_message just like get_response. If the client disconnects
+        mid-turn, the part of the answer already streamed is stored instead, so
+        the user message never goes unanswered in memory or the database.
+        """
+        conversation_id = None
+        response_text = None
+        streamed_tokens = []
+        finished = False
+        try:
+            print(f"🎯 AGENT EXECUTOR (stream): Processing message: '{message}'")
+            
+            if session_id:
+                conversation_id = await self.aget_or_create_conversation(session_id)
+                self.enqueue_message(conversation_id, message, "user")
+            
+            response_text, route = self._fast_path(message), "fast_path"
+            if response_text is None:
+                response_text, route = await asyncio.to_thread(self._cached_answer, message, session_id), "cache"
+            if response_text is not None:
+                yield {"type": "token", "content": response_text}
+            else:
+                route = "agent"
+                context = None
+                if self.pre_retrieval:
+                    yield {"type": "status", "message": TOOL_STATUS_MESSAGES["search_knowledge_base"]}
+                    context = await self._aretrieve(message, session_id)
+                agent_input = self._agent_input(message, session_id, context)
+                tools_used = self._tools_used([])
+                async for event in self.executor.astream_events(agent_input, version="v2"):
+                    kind = event["event"]
+                    if kind == "on_tool_start":
+                        tools_used.add(event["name"])
+                        status = TOOL_STATUS_MESSAGES.get(event["name"], "Working on it...")
+                        yield {"type": "status", "message": status}
+                    elif kind == "on_chat_model_stream":
+                        # Tool-call chunks carry no text content, only answer tokens do
+                        content = event["data"]["chunk"].content
+                        if content:
+                            streamed_tokens.append(content)
+                            yield {"type": "token", "content": content}
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        output = event["data"].get("output") or {}
+                        response_text = output.get("output")
+                
+                if not response_text:
+                    response_text = "".join(streamed_tokens) or 'I apologize, but I encountered an issue processing your request.'
+                await asyncio.to_thread(self._cache_answer, message, agent_input, tools_used, response_text)
+            self._record_route(route)
+            self._finish_turn(message, response_text, session_id, conversation_id)
+            finished = True
+            
+            print(f"🤖 AGENT RESPONSE: {response_text[:100]}...")
+            yield {"type": "done", "response": response_text, "route": route}
+                
+        except Exception as e:
+            yield {"type": "error", "message": self._error_response(e)}
+        finally:
+            # Closed at a yield (client disconnected) before the turn was recorded
+            partial = response_text or "".join(streamed_tokens)
+            if not finished and partial:
+                print(f"⚠️ STREAM CLOSED: Storing the {len(partial)}-character answer streamed so far")
+                self._finish_turn(message, partial, session_id, conversation_id)
@@ -0,0 +1,254 @@
+"""
+Structure-aware chunking for Alexa - Member Support Agent
+Splits PDFs along their layout instead of every N characters: headings start
+new sections, lists and tables stay whole where they fit, and chunk sizes are
+measured in chat model tokens. Every chunk records its section title
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Tuple
+import fitz
+from langchain.schema import Document
+from config.constants import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS, HEADING_FONT_RATIO, TOKENIZER_ENCODING
+from embedding_batcher import estimate_tokens
+
+_LIST_ITEM = re.compile(r"^(?:[-•●▪◦*–]|\(?\d{1,2}[.)]|\(?[a-zA-Z][.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_SENTENCE_PUNCTUATION = re.compile(r"[.!?:;,]")
+_BOLD = 16  # PyMuPDF span flag
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        # tiktoken ships with langchain-openai; without it (or its data files) counts are estimated
+        return None
+
+def count_tokens(text: str) -> int:
+    """Tokens text takes up in the chat model's context"""
+    encoding = _encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _classify(text: str, size: float, bold: bool, body_size: float) -> str:
+    emphasized = size >= body_size * HEADING_FONT_RATIO or bold
+    item = _LIST_ITEM.match(text)
+    if item:
+        # "1. Card Services" set in bold or a larger font is a numbered heading
+        if text[0].isdigit() and emphasized and len(text) <= 80 and not _SENTENCE_PUNCTUATION.search(text[item.end():]):
+            return "heading"
+        return "list"
+    if len(text) <= 120 and not text.endswith((".", ":")) and emphasized:
+        return "heading"
+    return "text"
+
+def extract_blocks(pdf_path: str) -> List[Document]:
+    """Layout blocks of a PDF in reading order, one Document per block.
+
+    metadata["kind"] is "heading", "list", "table" or "text". Tables are
+    rendered one row per line with " | " between cells, list blocks one item
+    per line, and headings and paragraphs as a single line.
+    """
+    raw = []  # (page, kind or None, text, font size, bold)
+    with fitz.open(pdf_path) as pdf:
+        for page_number, page in enumerate(pdf):
+            tables = page.find_tables().tables
+            boxes = [fitz.Rect(table.bbox) for table in tables]
+            items: List[Tuple[float, float, Any]] = []
+            for table in tables:
+                rows = [" | ".join(" ".join((cell or "").split()) for cell in row) for row in table.extract()]
+                items.append((table.bbox[1], table.bbox[0], (page_number, "table", "\n".join(rows), 0.0, False)))
+            for block in page.get_text("dict")["blocks"]:
+                if block["type"] != 0 or any(fitz.Rect(block["bbox"]).intersects(box) for box in boxes):
+                    continue
+                lines = ["".join(span["text"] for span in line["spans"]).strip() for line in block["lines"]]
+                spans = [span for line in block["lines"] for span in line["spans"] if span["text"].strip()]
+                if not spans:
+                    continue
+                size = max(span["size"] for span in spans)
+                bold = all(span["flags"] & _BOLD for span in spans)
+                items.append((block["bbox"][1], block["bbox"][0], (page_number, None, [line for line in lines if line], size, bold)))
+            raw.extend(item for _, _, item in sorted(items, key=lambda item: item[:2]))
+
+    # Body text is the font size carrying the most characters
+    sizes = Counter()
+    for _, kind, lines, size, _ in raw:
+        if kind is None:
+            sizes[round(size, 1)] += sum(len(line) for line in lines)
+    body_size = sizes.most_common(1)[0][0] if sizes else 0.0
+
+    blocks = []
+    for page_number, kind, lines, size, bold in raw:
+        if kind is None:
+            kind = _classify(lines[0], size, bold, body_size)
+            if kind == "list":
+                # Continuation lines belong to the item above them
+                items = []
+                for line in lines:
+                    if items and not _LIST_ITEM.match(line):
+                        items[-1] = f"{items[-1]} {line}"
+                    else:
+                        items.append(line)
+                text = "\n".join(items)
+            else:
+                text = " ".join(lines)
+        else:
+            text = lines
+        blocks.append(Document(
+            page_content=text,
+            metadata={"source": pdf_path, "page": page_number, "kind": kind, "font_size": round(size, 1)}
+        ))
+    return blocks
+
+class StructuredChunker:
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        count: Callable[[str], int] = count_tokens
+    ):
+        """Pack layout blocks into chunks of at most max_tokens.
+
+        Blocks are only split when one alone is too large: tables by row
+        (repeating the header row), lists by item and paragraphs by sentence,
+        with overlap_tokens of trailing sentences carried into the next piece.
+        Plain page documents without a "kind" are treated as paragraphs.
+        """
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.count = count
+
+    def split_documents(self, blocks: List[Document]) -> List[Document]:
+        chunks = []
+        for _, source_blocks in groupby(blocks, key=lambda block: block.metadata.get("source")):
+            chunks.extend(self._split_source(list(source_blocks)))
+        return chunks
+
+    @staticmethod
+    def _units(blocks: List[Document]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(kind, text, metadata) per block, with each list merged with the sentence introducing it"""
+        units = []
+        for block in blocks:
+            kind = block.metadata.get("kind", "text")
+            text = block.page_content.strip()
+            if not text:
+                continue
+            if kind == "list" and units and (units[-1][0] == "list" or (units[-1][0] == "text" and units[-1][1].endswith(":"))):
+                units[-1] = ("list", f"{units[-1][1]}\n{text}", units[-1][2])
+                continue
+            units.append((kind, text, block.metadata))
+        return units
+
+    def _split_source(self, blocks: List[Document]) -> List[Document]:
+        chunks = []
+        sections: List[Tuple[float, str]] = []  # Open headings, outermost first, with their font sizes
+        current: List[str] = []
+        state = {"has_body": False, "metadata": {}}
+
+        def fits(text: str) -> bool:
+            # Measured on the joined text, so the newlines between blocks count too
+            return self.count("\n".join(current + [text])) <= self.max_tokens
+
+        def flush():
+            if current:
+                chunks.append(Document(
+                    page_content="\n".join(current),
+                    metadata={
+                        "source": state["metadata"].get("source", ""),
+                        "page": state["metadata"].get("page", 0),
+                        "section": " > ".join(title for _, title in sections)
+                    }
+                ))
+            current.clear()
+            state.update(has_body=False, metadata={})
+
+        def append(text: str, metadata: Dict[str, Any]):
+            if not current:
+                state["metadata"] = metadata
+            current.append(text)
+
+        for kind, text, metadata in self._units(blocks):
+            if kind == "heading":
+                # A heading closes the section's chunk; consecutive headings stay together
+                if state["has_body"]:
+                    flush()
+                size = metadata.get("font_size", 0.0)
+                while sections and sections[-1][0] <= size:
+                    sections.pop()
+                sections.append((size, text))
+                append(text, metadata)
+                continue
+
+            if state["has_body"] and not fits(text):
+                flush()
+            if fits(text):
+                pieces = [text]
+            else:
+                used = self.count("\n".join(current + [""])) if current else 0
+                pieces = self._pieces(kind, text, self.max_tokens - used)
+            for piece in pieces:
+                if state["has_body"] and not fits(piece):
+                    flush()
+                append(piece, metadata)
+                state["has_body"] = True
+        flush()
+        return chunks
+
+    def _pieces(self, kind: str, text: str, budget: int) -> List[str]:
+        """Split one block that does not fit in a chunk along its own structure"""
+        budget = max(budget, self.max_tokens // 2)
+        if kind == "table":
+            header, *rows = text.split("\n")
+            return self._pack(rows, budget, prefix=header) if rows else self._windows(header, budget)
+        if kind == "list":
+            return self._pack(text.split("\n"), budget)
+        return self._pack(_SENTENCE_END.split(" ".join(text.split())), budget, separator=" ", overlap=self.overlap_tokens)
+
+    def _pack(self, parts: List[str], budget: int, prefix: str = "", separator: str = "\n", overlap: int = 0) -> List[str]:
+        """Greedily join parts into pieces of at most budget tokens, each starting with prefix"""
+        pieces, current = [], []
+
+        def join(parts: List[str]) -> str:
+            return separator.join(([prefix] if prefix else []) + parts)
+
+        # Windows leave room for the prefix and the separator after it
+        window_budget = budget - self.count(join([""])) if prefix else budget
+        for part in parts:
+            for window in self._windows(part, window_budget):
+                if current and self.count(join(current + [window])) > budget:
+                    pieces.append(join(current))
+                    # Carry trailing parts over so a split paragraph keeps its context
+                    carried = []
+                    for previous in reversed(current):
+                        if self.count(separator.join([previous] + carried)) > overlap:
+                            break
+                        carried.insert(0, previous)
+                    if self.count(join(carried + [window])) > budget:
+                        carried = []
+                    current = carried
+                current.append(window)
+        if current:
+            pieces.append(join(current))
+        return pieces
+
+    def _windows(self, text: str, budget: int) -> List[str]:
+        """text as is if it fits in budget tokens, else cut between words"""
+        if self.count(text) <= budget:
+            return [text]
+        windows, current, tokens = [], [], 0
+        for word in text.split():
+            size = self.count(f" {word}")
+            if current and tokens + size > budget:
+                windows.append(" ".join(current))
+                current, tokens = [], 0
+            current.append(word)
+            tokens += size
+        if current:
+            windows.append(" ".join(current))
+        return windows
@@ -1,5 +1,5 @@
 # Document processing settings
-CHUNK_SIZE = 1000
+CHUNK_SIZE = 1000  # Characters, for CHUNKER=character
 CHUNK_OVERLAP = 200
 
 # File paths
@@ -9,13 +9,115 @@ if os.path.exists("../data/knowledge_base"):
     PDF_DIR = "../data/knowledge_base"
     VECTOR_DB_DIR = "../data/vector_db" 
     LOGS_DIR = "../data/logs"
+    SESSION_REGISTRY_PATH = "../data/session_registry.sqlite3"
+    SQLITE_DB_PATH = "../data/member_support.sqlite3"
+    EMBEDDING_CACHE_PATH = "../data/embedding_cache.sqlite3"
 else:
     PDF_DIR = "data/knowledge_base"
     VECTOR_DB_DIR = "data/vector_db"
     LOGS_DIR = "data/logs"
+    SESSION_REGISTRY_PATH = "data/session_registry.sqlite3"
+    SQLITE_DB_PATH = "data/member_support.sqlite3"
+    EMBEDDING_CACHE_PATH = "data/embedding_cache.sqlite3"
+
+# Document ingestion settings
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", os.cpu_count() or 1))  # Processes used to parse PDFs
+CHUNKER = os.getenv("CHUNKER", "character")  # "character", or "structured" (layout and token aware; re-chunks and re-embeds on switch)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 256))  # Max chat model tokens per structured chunk
+CHUNK_OVERLAP_TOKENS = 32  # Carried over only when a paragraph has to be split
+HEADING_FONT_RATIO = 1.15  # Blocks set this much larger than body text are headings
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o-mini's tokenizer
 
 # Embedding settings
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")  # "openai" or "local" (CPU-only, works offline)
 EMBEDDING_MODEL = "text-embedding-3-small"
+LOCAL_EMBEDDING_DIMENSIONS = 1024
+# Vectors from different providers are not comparable, so each keeps its own index
+if EMBEDDING_PROVIDER != "openai":
+    VECTOR_DB_DIR = f"{VECTOR_DB_DIR}_{EMBEDDING_PROVIDER}"
+EMBEDDING_CACHE_MAX_ENTRIES = 10000  # Query embeddings kept in memory
+EMBEDDING_CACHE_PERSIST = os.getenv("EMBEDDING_CACHE_PERSIST", "true").lower() == "true"  # SQLite tier kept across restarts
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))  # Chunks per embedding request during ingestion
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4))  # Embedding requests in flight at once
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 3000))
+EMBEDDING_TOKENS_PER_MINUTE = float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1000000))
+EMBEDDING_MAX_RETRIES = 5
 
 # Vector store settings
-COLLECTION_NAME = "member_support_docs" 
\ No newline at end of file
+COLLECTION_NAME = "member_support_docs" 
+INDEX_VERSION_FILE = os.path.join(VECTOR_DB_DIR, "index_version")  # Rewritten on every re-index
+INGEST_MANIFEST_FILE = os.path.join(VECTOR_DB_DIR, "ingest_manifest.json")  # Content hashes of indexed files and chunks
+BM25_INDEX_FILE = os.path.join(VECTOR_DB_DIR, "bm25_index.json")  # Lexical index over the same chunks
+VECTOR_INDEX_DIR = os.path.join(VECTOR_DB_DIR, "numpy_index")  # Memory-mapped copy of the embeddings
+VECTOR_ENGINE = os.getenv("VECTOR_ENGINE", "chroma")  # Query engine: "chroma", "numpy" or "ivf" (approximate)
+
+# IVF approximate index settings (VECTOR_ENGINE=ivf)
+IVF_NLIST = int(os.getenv("IVF_NLIST", 0))  # Clusters; 0 picks 4 * sqrt(chunks)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 8))  # Clusters scanned per query: higher is slower with better recall
+IVF_MIN_TRAIN_SIZE = 1000  # Smaller indexes are searched exactly
+IVF_RETRAIN_GROWTH = 4.0  # Retrain once the index has grown this many times since training
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLES_PER_LIST = 64
+
+# Retrieved context compression (applied to search_knowledge_base results)
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "false").lower() == "true"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 600))  # Max tokens of retrieved context per search
+CONTEXT_MIN_RELEVANCE = 0.1  # Share of question terms a sentence (or half its neighbour's) needs outside the top chunk
+CONTEXT_MIN_OVERLAP_CHARS = 40  # Shortest repeated span between chunks that is removed
+BOILERPLATE_MIN_CHUNKS = 5  # Short lines repeated in this many chunks are headers or footers
+
+# Hybrid retrieval settings (BM25 + vector search fused with reciprocal rank fusion)
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "false").lower() == "true"  # The BM25 index is kept up to date either way
+HYBRID_FETCH_K = 10  # Candidates taken from each side before fusion
+RRF_K = 60
+RETRIEVER_WARMUP = os.getenv("RETRIEVER_WARMUP", "true").lower() == "true"  # Build the retriever in the background at startup
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Semantic answer cache (FAQ answers served without running the agent)
+# Off by default: a hit serves an answer written for another member's question,
+# which at a loose threshold may be about a different card or account type
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 60 * 60
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))  # Min cosine similarity for a hit
+
+# Agent flow: "agent" lets the model call search_knowledge_base; "pre_retrieval"
+# searches before the first LLM call and puts the results in the prompt
+AGENT_MODE = os.getenv("AGENT_MODE", "agent")
+
+# Fast-path intent router (greetings, thanks and goodbyes answered without the agent)
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "false").lower() == "true"
+INTENT_RULE_THRESHOLD = float(os.getenv("INTENT_RULE_THRESHOLD", 0.9))  # Min share of words a rule must cover
+INTENT_CLASSIFIER = os.getenv("INTENT_CLASSIFIER", "false").lower() == "true"  # Local classifier for turns the rules miss
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", 0.6))  # Min similarity to an example
+
+# Conversation memory settings
+MEMORY_MAX_TOKENS = 2000  # Per-session history window sent to the LLM
+MEMORY_MAX_SESSIONS = 1000  # Live sessions kept before LRU eviction
+MEMORY_SESSION_TTL_SECONDS = 30 * 60  # Idle sessions are dropped after this
+
+# Message persistence settings (write-behind queue)
+MESSAGE_QUEUE_MAX_SIZE = 10000  # Messages buffered before new ones go to the dead-letter file
+MESSAGE_BATCH_SIZE = 50  # Messages per bulk insert
+MESSAGE_FLUSH_INTERVAL_SECONDS = 0.5  # Max time a message waits for its batch to fill
+MESSAGE_WRITE_MAX_RETRIES = 3
+MESSAGE_DEAD_LETTER_FILE = os.path.join(LOGS_DIR, "message_dead_letter.jsonl")
+
+# Session registry settings (session_id -> conversation_id)
+SESSION_REGISTRY_BACKEND = os.getenv("SESSION_REGISTRY_BACKEND", "sqlite")  # "sqlite", "database" or "memory"
+SESSION_CACHE_MAX_ENTRIES = 10000  # In-process LRU front
+
+# Storage backend for the CRUD layer: "supabase" or "sqlite" (local file, no external service)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", SQLITE_DB_PATH)
+
+# Async database client settings (pooled HTTP/2 connection to Supabase)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))  # Max concurrent connections
+DB_KEEPALIVE_CONNECTIONS = int(os.getenv("DB_KEEPALIVE_CONNECTIONS", 10))  # Idle connections kept open
+DB_KEEPALIVE_EXPIRY_SECONDS = 30.0
+DB_TIMEOUT_SECONDS = float(os.getenv("DB_TIMEOUT_SECONDS", 10))  # Default per-call timeout
+
+# List endpoint pagination
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
@@ -0,0 +1,131 @@
+"""
+Retrieved-context compression for Alexa - Member Support Agent
+Shrinks what search_knowledge_base hands the agent before it reaches the LLM:
+text repeated by overlapping chunks, headers and footers repeated across pages
+and sentences unrelated to the question are removed, and what is left is
+trimmed to a token budget, least relevant sentences first
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from langchain.schema import Document
+from bm25_index import tokenize
+from chunker import count_tokens
+from config.constants import CONTEXT_TOKEN_BUDGET, CONTEXT_MIN_RELEVANCE, CONTEXT_MIN_OVERLAP_CHARS, BOILERPLATE_MIN_CHUNKS
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_PAGE_MARKER = re.compile(r"^(?:page\s+)?\d+(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE)
+_STOPWORDS = frozenset(
+    "a an and are can could do does for from have how i in is it me my of on or should the to "
+    "was what when where which who why will with would you your".split()
+)
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+def find_boilerplate(texts: Iterable[str], min_count: int = BOILERPLATE_MIN_CHUNKS) -> Set[str]:
+    """Short lines repeated in at least min_count chunks, such as page headers and footers"""
+    counts = Counter()
+    for text in texts:
+        counts.update({_normalize(line) for line in text.split("\n") if 0 < len(line.strip()) <= 80})
+    return {line for line, count in counts.items() if count >= min_count}
+
+def _overlap(first: str, second: str, min_chars: int) -> int:
+    """Length of the longest end of first that second starts with, if at least min_chars"""
+    for size in range(min(len(first), len(second)), min_chars - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+class ContextCompressor:
+    def __init__(
+        self,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        min_relevance: float = CONTEXT_MIN_RELEVANCE,
+        boilerplate: Optional[Set[str]] = None,
+        min_overlap_chars: int = CONTEXT_MIN_OVERLAP_CHARS,
+        count: Callable[[str], int] = count_tokens
+    ):
+        """Initialize with the lines to treat as boilerplate (see find_boilerplate).
+
+        A sentence's relevance is the share of the question's terms it
+        contains, or half that of a neighbouring sentence, so the steps around
+        a matching sentence survive. The top-ranked chunk is kept whole since
+        vector search found it without shared wording; in the others,
+        sentences below min_relevance are dropped.
+        """
+        self.token_budget = token_budget
+        self.min_relevance = min_relevance
+        self.boilerplate = boilerplate or set()
+        self.min_overlap_chars = min_overlap_chars
+        self.count = count
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def _sentences(self, text: str) -> List[Tuple[bool, str]]:
+        """(starts a line, sentence) pairs, skipping boilerplate lines and page numbers"""
+        sentences = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if not line or _normalize(line) in self.boilerplate or _PAGE_MARKER.match(line):
+                continue
+            for position, sentence in enumerate(_SENTENCE_END.split(line)):
+                sentences.append((position == 0, sentence))
+        return sentences
+
+    def compress(self, query: str, documents: List[Document]) -> Tuple[str, Dict[str, int]]:
+        """Compressed context for the query, best-ranked document first, and
+        {"tokens_in", "tokens_out", "tokens_saved"} for this call"""
+        original = "\n\n".join(doc.page_content for doc in documents)
+        query_terms = {term for term in tokenize(query) if term not in _STOPWORDS}
+
+        # [rank, position, starts a line, sentence, tokens, relevance]
+        entries = []
+        seen = set()
+        previous = []
+        for rank, doc in enumerate(documents):
+            text = doc.page_content.strip()
+            # Overlapping chunks repeat the end of one at the start of the next
+            for other in previous:
+                text = text[_overlap(other, text, self.min_overlap_chars):]
+                size = _overlap(text, other, self.min_overlap_chars)
+                text = text[:len(text) - size]
+            previous.append(doc.page_content.strip())
+
+            sentences = []
+            for starts_line, sentence in self._sentences(text):
+                key = _normalize(sentence)
+                if key in seen:
+                    continue
+                seen.add(key)
+                terms = set(tokenize(sentence))
+                score = len(terms & query_terms) / len(query_terms) if query_terms else 1.0
+                sentences.append([rank, len(sentences), starts_line, sentence, self.count(sentence), score])
+            scores = [entry[5] for entry in sentences]
+            for i, entry in enumerate(sentences):
+                neighbours = scores[max(i - 1, 0):i] + scores[i + 1:i + 2]
+                entry[5] = max([entry[5]] + [score / 2 for score in neighbours])
+            if rank:
+                sentences = [entry for entry in sentences if entry[5] >= self.min_relevance]
+            entries.extend(sentences)
+
+        # Over budget: drop the least relevant sentences, from the lowest-ranked chunks first
+        total = sum(entry[4] for entry in entries)
+        for entry in sorted(entries, key=lambda entry: (entry[5], -entry[0], -entry[1])):
+            if total <= self.token_budget:
+                break
+            entries.remove(entry)
+            total -= entry[4]
+
+        chunks = {}
+        for rank, _, starts_line, sentence, _, _ in entries:
+            separator = "\n" if starts_line else " "
+            chunks[rank] = f"{chunks[rank]}{separator}{sentence}" if rank in chunks else sentence
+        context = "\n\n".join(chunks[rank] for rank in sorted(chunks))
+
+        stats = {"tokens_in": self.count(original), "tokens_out": self.count(context)}
+        stats["tokens_saved"] = stats["tokens_in"] - stats["tokens_out"]
+        self.tokens_in += stats["tokens_in"]
+        self.tokens_out += stats["tokens_out"]
+        return context, stats
@@ -1,16 +1,20 @@
 """
-Supabase Database CRUD Operations Module
+Database CRUD Operations Module
 
-This module provides a centralized interface for all database operations
-using Supabase as the backend database service.
+This module provides a centralized interface for all database operations.
+Supabase is the default backend; set STORAGE_BACKEND=sqlite to use a local
+SQLite file with the same schema instead (see storage_backends.py).
 """
 
 import os
+import base64
+import json
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Generic, Tuple, TypeVar
 from pydantic import BaseModel, Field
-from supabase import create_client, Client
 from dotenv import load_dotenv
+from config.constants import DEFAULT_PAGE_SIZE, STORAGE_BACKEND, SQLITE_DB_PATH
+from storage_backends import create_storage_backend
 
 # Load environment variables from root directory
 load_dotenv(dotenv_path="../.env")
@@ -19,11 +23,8 @@ load_dotenv(dotenv_path="../.env")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
-
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Initialize the configured storage backend (raises if Supabase is selected but not configured)
+storage = create_storage_backend(STORAGE_BACKEND, SUPABASE_URL, SUPABASE_KEY, SQLITE_DB_PATH)
 
 # Pydantic Models
 class UserBase(BaseModel):
@@ -85,151 +86,292 @@ class Escalation(EscalationBase):
     created_at: datetime
     resolved_at: Optional[datetime] = None
 
+class SessionBootstrap(BaseModel):
+    user_id: int
+    conversation_id: int
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+# Keyset pagination
+class PageQuery:
+    """Keyset (cursor) pagination over a table ordered by id or a timestamp column.
+
+    The cursor is an opaque token holding the sort value and id of the last
+    row returned, so each page is an indexed range scan instead of an OFFSET.
+    Timestamp orderings use id as a tie-breaker.
+    """
+
+    def __init__(
+        self,
+        order_by: str,
+        allowed_order_by: Tuple[str, ...],
+        limit: int = DEFAULT_PAGE_SIZE,
+        after: Optional[str] = None,
+        descending: bool = False,
+        conditions: Optional[List[Tuple[str, str, Any]]] = None
+    ):
+        if order_by not in allowed_order_by:
+            raise ValueError(f"order_by must be one of: {list(allowed_order_by)}")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.order_by = order_by
+        self.limit = limit
+        self.descending = descending
+        self.order_columns = [order_by] if order_by == "id" else [order_by, "id"]
+        self.keyset: Optional[Tuple[str, str, Any, int]] = None
+
+        # Filters are (column, operator, value); unset filters are skipped
+        self.filters = [
+            (column, op, value.isoformat() if isinstance(value, datetime) else value)
+            for column, op, value in (conditions or []) if value is not None
+        ]
+
+        if after:
+            value, last_id = decode_cursor(after)
+            op = "lt" if descending else "gt"
+            if order_by == "id":
+                self.filters.append(("id", op, last_id))
+            else:
+                self.keyset = (order_by, op, value, last_id)
+
+    @property
+    def order(self) -> List[Tuple[str, bool]]:
+        return [(column, self.descending) for column in self.order_columns]
+
+    @property
+    def fetch_limit(self) -> int:
+        # One extra row tells us whether another page exists
+        return self.limit + 1
+
+    def to_page(self, rows: List[Dict[str, Any]], model) -> Page:
+        """Build a page of models from the fetched rows"""
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        next_cursor = encode_cursor(rows[-1][self.order_by], rows[-1]["id"]) if has_more else None
+        return Page(items=[model(**row) for row in rows], next_cursor=next_cursor)
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    """Encode the last row's sort value and id as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(row_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+def _select_page(table: str, model, page_query: PageQuery) -> Page:
+    """Run a keyset-paginated select"""
+    rows = storage.select(
+        table,
+        order=page_query.order,
+        limit=page_query.fetch_limit,
+        conditions=page_query.filters,
+        keyset=page_query.keyset
+    )
+    return page_query.to_page(rows, model)
+
 # CRUD Operations for Users
 class UserCRUD:
     @staticmethod
     def create(user: UserCreate) -> User:
         """Create a new user"""
-        response = supabase.table("users").insert(user.model_dump()).execute()
-        if response.data:
-            return User(**response.data[0])
+        rows = storage.insert("users", [user.model_dump(mode="json")])
+        if rows:
+            return User(**rows[0])
         raise Exception("Failed to create user")
 
     @staticmethod
     def get(user_id: int) -> Optional[User]:
         """Get user by ID"""
-        response = supabase.table("users").select("*").eq("id", user_id).execute()
-        if response.data:
-            return User(**response.data[0])
+        rows = storage.select("users", {"id": user_id})
+        if rows:
+            return User(**rows[0])
         return None
 
     @staticmethod
     def get_by_email(email: str) -> Optional[User]:
         """Get user by email"""
-        response = supabase.table("users").select("*").eq("email", email).execute()
-        if response.data:
-            return User(**response.data[0])
+        rows = storage.select("users", {"email": email})
+        if rows:
+            return User(**rows[0])
         return None
 
     @staticmethod
     def get_all() -> List[User]:
         """Get all users"""
-        response = supabase.table("users").select("*").execute()
-        return [User(**user) for user in response.data] if response.data else []
+        rows = storage.select("users")
+        return [User(**user) for user in rows]
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False) -> Page[User]:
+        """Get a page of users"""
+        return _select_page("users", User, PageQuery(order_by, ("id",), limit, after, descending))
 
     @staticmethod
     def update(user_id: int, user_update: UserUpdate) -> Optional[User]:
         """Update user"""
-        update_data = {k: v for k, v in user_update.model_dump().items() if v is not None}
+        update_data = {k: v for k, v in user_update.model_dump(mode="json").items() if v is not None}
         if not update_data:
             return UserCRUD.get(user_id)
         
-        response = supabase.table("users").update(update_data).eq("id", user_id).execute()
-        if response.data:
-            return User(**response.data[0])
+        rows = storage.update("users", {"id": user_id}, update_data)
+        if rows:
+            return User(**rows[0])
         return None
 
     @staticmethod
     def delete(user_id: int) -> bool:
         """Delete user"""
-        response = supabase.table("users").delete().eq("id", user_id).execute()
-        return len(response.data) > 0 if response.data else False
+        rows = storage.delete("users", {"id": user_id})
+        return len(rows) > 0
 
 # CRUD Operations for Conversations
 class ConversationCRUD:
     @staticmethod
     def create(conversation: ConversationCreate) -> Conversation:
         """Create a new conversation"""
-        response = supabase.table("conversations").insert(conversation.model_dump()).execute()
-        if response.data:
-            return Conversation(**response.data[0])
+        rows = storage.insert("conversations", [conversation.model_dump(mode="json")])
+        if rows:
+            return Conversation(**rows[0])
         raise Exception("Failed to create conversation")
 
     @staticmethod
     def get(conversation_id: int) -> Optional[Conversation]:
         """Get conversation by ID"""
-        response = supabase.table("conversations").select("*").eq("id", conversation_id).execute()
-        if response.data:
-            return Conversation(**response.data[0])
+        rows = storage.select("conversations", {"id": conversation_id})
+        if rows:
+            return Conversation(**rows[0])
         return None
 
     @staticmethod
     def get_by_user(user_id: int) -> List[Conversation]:
         """Get all conversations for a user"""
-        response = supabase.table("conversations").select("*").eq("user_id", user_id).execute()
-        return [Conversation(**conv) for conv in response.data] if response.data else []
+        rows = storage.select("conversations", {"user_id": user_id})
+        return [Conversation(**conv) for conv in rows]
+
+    @staticmethod
+    def get_latest_by_user(user_id: int) -> Optional[Conversation]:
+        """Get the most recently started conversation for a user"""
+        rows = storage.select("conversations", {"user_id": user_id}, order=[("started_at", True), ("id", True)], limit=1)
+        if rows:
+            return Conversation(**rows[0])
+        return None
 
     @staticmethod
     def get_all() -> List[Conversation]:
         """Get all conversations"""
-        response = supabase.table("conversations").select("*").execute()
-        return [Conversation(**conv) for conv in response.data] if response.data else []
+        rows = storage.select("conversations")
+        return [Conversation(**conv) for conv in rows]
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                 user_id: Optional[int] = None, started_after: Optional[datetime] = None, started_before: Optional[datetime] = None) -> Page[Conversation]:
+        """Get a page of conversations, optionally filtered by user and start time"""
+        return _select_page("conversations", Conversation, PageQuery(order_by, ("id", "started_at"), limit, after, descending, [
+            ("user_id", "eq", user_id),
+            ("started_at", "gte", started_after),
+            ("started_at", "lt", started_before)
+        ]))
 
     @staticmethod
     def update(conversation_id: int, conversation_update: ConversationUpdate) -> Optional[Conversation]:
         """Update conversation"""
-        update_data = {k: v for k, v in conversation_update.model_dump().items() if v is not None}
+        update_data = {k: v for k, v in conversation_update.model_dump(mode="json").items() if v is not None}
         if not update_data:
             return ConversationCRUD.get(conversation_id)
         
-        response = supabase.table("conversations").update(update_data).eq("id", conversation_id).execute()
-        if response.data:
-            return Conversation(**response.data[0])
+        rows = storage.update("conversations", {"id": conversation_id}, update_data)
+        if rows:
+            return Conversation(**rows[0])
         return None
 
     @staticmethod
     def delete(conversation_id: int) -> bool:
         """Delete conversation"""
-        response = supabase.table("conversations").delete().eq("id", conversation_id).execute()
-        return len(response.data) > 0 if response.data else False
+        rows = storage.delete("conversations", {"id": conversation_id})
+        return len(rows) > 0
 
 # CRUD Operations for Messages
 class MessageCRUD:
     @staticmethod
     def create(message: MessageCreate) -> Message:
         """Create a new message"""
-        response = supabase.table("messages").insert(message.model_dump()).execute()
-        if response.data:
-            return Message(**response.data[0])
+        rows = storage.insert("messages", [message.model_dump(mode="json")])
+        if rows:
+            return Message(**rows[0])
         raise Exception("Failed to create message")
 
+    @staticmethod
+    def create_many(messages: List[MessageCreate]) -> List[Message]:
+        """Create several messages in one bulk insert, preserving their order"""
+        if not messages:
+            return []
+        rows = storage.insert("messages", [message.model_dump(mode="json") for message in messages])
+        if rows:
+            return [Message(**msg) for msg in rows]
+        raise Exception("Failed to create messages")
+
     @staticmethod
     def get(message_id: int) -> Optional[Message]:
         """Get message by ID"""
-        response = supabase.table("messages").select("*").eq("id", message_id).execute()
-        if response.data:
-            return Message(**response.data[0])
+        rows = storage.select("messages", {"id": message_id})
+        if rows:
+            return Message(**rows[0])
         return None
 
     @staticmethod
     def get_by_conversation(conversation_id: int) -> List[Message]:
         """Get all messages for a conversation"""
-        response = supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("sent_at").execute()
-        return [Message(**msg) for msg in response.data] if response.data else []
+        rows = storage.select("messages", {"conversation_id": conversation_id}, order=[("sent_at", False), ("id", False)])
+        return [Message(**msg) for msg in rows]
+
+    @staticmethod
+    def get_recent_contents(conversation_id: int, limit: int = 5) -> List[str]:
+        """Get the content of the last `limit` messages of a conversation, oldest first"""
+        rows = storage.select("messages", {"conversation_id": conversation_id}, columns="content",
+                              order=[("sent_at", True), ("id", True)], limit=limit)
+        return [msg["content"] for msg in reversed(rows)]
 
     @staticmethod
     def get_all() -> List[Message]:
         """Get all messages"""
-        response = supabase.table("messages").select("*").execute()
-        return [Message(**msg) for msg in response.data] if response.data else []
+        rows = storage.select("messages")
+        return [Message(**msg) for msg in rows]
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                 conversation_id: Optional[int] = None, sent_after: Optional[datetime] = None, sent_before: Optional[datetime] = None) -> Page[Message]:
+        """Get a page of messages, optionally filtered by conversation and send time"""
+        return _select_page("messages", Message, PageQuery(order_by, ("id", "sent_at"), limit, after, descending, [
+            ("conversation_id", "eq", conversation_id),
+            ("sent_at", "gte", sent_after),
+            ("sent_at", "lt", sent_before)
+        ]))
 
     @staticmethod
     def update(message_id: int, message_update: MessageUpdate) -> Optional[Message]:
         """Update message"""
-        update_data = {k: v for k, v in message_update.model_dump().items() if v is not None}
+        update_data = {k: v for k, v in message_update.model_dump(mode="json").items() if v is not None}
         if not update_data:
             return MessageCRUD.get(message_id)
         
-        response = supabase.table("messages").update(update_data).eq("id", message_id).execute()
-        if response.data:
-            return Message(**response.data[0])
+        rows = storage.update("messages", {"id": message_id}, update_data)
+        if rows:
+            return Message(**rows[0])
         return None
 
     @staticmethod
     def delete(message_id: int) -> bool:
         """Delete message"""
-        response = supabase.table("messages").delete().eq("id", message_id).execute()
-        return len(response.data) > 0 if response.data else False
+        rows = storage.delete("messages", {"id": message_id})
+        return len(rows) > 0
 
 # Convenience functions for common operations
 def get_conversation_with_messages(conversation_id: int) -> Optional[Dict[str, Any]]:
@@ -261,50 +403,73 @@ def add_message_to_conversation(conversation_id: int, content: str, **kwargs) ->
     )
     return MessageCRUD.create(message_data)
 
+# Session bootstrap for chat sessions
+class SessionCRUD:
+    @staticmethod
+    def get_or_create(session_id: str) -> SessionBootstrap:
+        """Get or create the anonymous user and conversation for a session in one round trip"""
+        row = storage.get_or_create_session(session_id)
+        if row:
+            return SessionBootstrap(**row)
+        raise Exception("Failed to get or create session conversation")
+
 # CRUD Operations for Escalations
 class EscalationCRUD:
     @staticmethod
     def create(escalation: EscalationCreate) -> Escalation:
         """Create a new escalation"""
-        response = supabase.table("escalations").insert(escalation.model_dump()).execute()
-        if response.data:
-            return Escalation(**response.data[0])
+        rows = storage.insert("escalations", [escalation.model_dump(mode="json")])
+        if rows:
+            return Escalation(**rows[0])
         raise Exception("Failed to create escalation")
 
     @staticmethod
     def get(escalation_id: int) -> Optional[Escalation]:
         """Get escalation by ID"""
-        response = supabase.table("escalations").select("*").eq("id", escalation_id).execute()
-        if response.data:
-            return Escalation(**response.data[0])
+        rows = storage.select("escalations", {"id": escalation_id})
+        if rows:
+            return Escalation(**rows[0])
         return None
 
     @staticmethod
     def get_by_conversation(conversation_id: int) -> List[Escalation]:
         """Get all escalations for a conversation"""
-        response = supabase.table("escalations").select("*").eq("conversation_id", conversation_id).execute()
-        return [Escalation(**esc) for esc in response.data] if response.data else []
+        rows = storage.select("escalations", {"conversation_id": conversation_id})
+        return [Escalation(**esc) for esc in rows]
 
     @staticmethod
     def get_all() -> List[Escalation]:
         """Get all escalations"""
-        response = supabase.table("escalations").select("*").execute()
-        return [Escalation(**esc) for esc in response.data] if response.data else []
+        rows = storage.select("escalations")
+        return [Escalation(**esc) for esc in rows]
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, order_by: str = "id", descending: bool = False,
+                 conversation_id: Optional[int] = None, status: Optional[str] = None, issue_type: Optional[str] = None,
+                 created_after: Optional[datetime] = None, created_before: Optional[datetime] = None) -> Page[Escalation]:
+        """Get a page of escalations, optionally filtered by conversation, status, issue type and creation time"""
+        return _select_page("escalations", Escalation, PageQuery(order_by, ("id", "created_at"), limit, after, descending, [
+            ("conversation_id", "eq", conversation_id),
+            ("status", "eq", status),
+            ("issue_type", "eq", issue_type),
+            ("created_at", "gte", created_after),
+            ("created_at", "lt", created_before)
+        ]))
 
     @staticmethod
     def update(escalation_id: int, escalation_update: EscalationUpdate) -> Optional[Escalation]:
         """Update escalation"""
-        update_data = {k: v for k, v in escalation_update.model_dump().items() if v is not None}
+        update_data = {k: v for k, v in escalation_update.model_dump(mode="json").items() if v is not None}
         if not update_data:
             return EscalationCRUD.get(escalation_id)
         
-        response = supabase.table("escalations").update(update_data).eq("id", escalation_id).execute()
-        if response.data:
-            return Escalation(**response.data[0])
+        rows = storage.update("escalations", {"id": escalation_id}, update_data)
+        if rows:
+            return Escalation(**rows[0])
         return None
 
     @staticmethod
     def delete(escalation_id: int) -> bool:
         """Delete escalation"""
-        response = supabase.table("escalations").delete().eq("id", escalation_id).execute()
-        return len(response.data) > 0 if response.data else False 
\ No newline at end of file
+        rows = storage.delete("escalations", {"id": escalation_id})
+        return len(rows) > 0 
\ No newline at end of file
@@ -1,16 +1,62 @@
 import os
+import json
+import hashlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from typing import List
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain.schema import Document
 from langchain.text_splitter import CharacterTextSplitter
 from config.constants import PDF_DIR
-from config.constants import CHUNK_SIZE, CHUNK_OVERLAP, VECTOR_DB_DIR
-from langchain_openai import OpenAIEmbeddings
+from config.constants import CHUNK_SIZE, CHUNK_OVERLAP, VECTOR_DB_DIR, INGEST_MANIFEST_FILE, PDF_PARSE_WORKERS, HYBRID_RETRIEVAL, VECTOR_ENGINE, CHUNKER
+from config.constants import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
 from langchain_chroma import Chroma
+from semantic_cache import bump_index_version
+from embedding_cache import cached_embeddings
+from embedding_providers import create_embeddings, is_local
+from embedding_batcher import EmbeddingBatcher
+from bm25_index import BM25Index, HybridRetriever
+from vector_index import VectorIndexRetriever, load_vector_index
+from chunker import StructuredChunker, extract_blocks
 
 load_dotenv()
 
+def file_sha256(path: str) -> str:
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_pdf(pdf_path: str, layout: bool = False) -> Tuple[Optional[List[Document]], Optional[str]]:
+    """Parse one PDF into page documents, or layout blocks for the structured
+    chunker; runs in a worker process.
+
+    Errors are returned instead of raised so one bad file never fails the batch.
+    """
+    try:
+        if layout:
+            return extract_blocks(pdf_path), None
+        return PyMuPDFLoader(pdf_path).load(), None
+    except Exception as e:
+        return None, str(e)
+
+def chunk_ids(filename: str, chunks: List[Document]) -> List[str]:
+    """Content-derived ids, so an unchanged chunk keeps its id across runs.
+
+    Repeated text in one file (e.g. page headers) is told apart by its
+    occurrence number.
+    """
+    seen = Counter()
+    ids = []
+    for chunk in chunks:
+        occurrence = seen[chunk.page_content]
+        seen[chunk.page_content] += 1
+        ids.append(hashlib.sha256(f"{filename}\0{occurrence}\0{chunk.page_content}".encode()).hexdigest())
+    return ids
+
 class DocumentPipeline:
     def __init__(self):
         # Initialize the document pipeline
@@ -18,7 +64,17 @@ class DocumentPipeline:
         self.chunks = []
         self.embeddings = []
         self.db_name = VECTOR_DB_DIR
+        self.manifest_path = INGEST_MANIFEST_FILE
+        self.parse_workers = PDF_PARSE_WORKERS
+        self.chunker = CHUNKER
+        self.lexical_index = BM25Index.load()
         self.vectorstore = None
+        # Query embeddings from a remote provider are cached so repeated
+        # searches skip the network round trip
+        embeddings = create_embeddings()
+        self.embedding_function = embeddings if is_local(embeddings) else cached_embeddings(embeddings)
+        # Chroma stays the source of truth; the NumPy engines serve queries from a mirror of it
+        self.vector_index = load_vector_index(VECTOR_ENGINE, self.embedding_function)
 
     def load_documents(self, pdf_dir: str = PDF_DIR) -> List[Document]:
         # Clear existing documents before loading new ones
@@ -39,19 +95,44 @@ class DocumentPipeline:
         else:
             print(f"Found {len(pdf_files)} PDF files in {pdf_dir}")
 
-        for pdf_file in pdf_files:
-            try:
-                # Load the PDF file
-                pdf_path = os.path.join(pdf_dir, pdf_file)
-                loader = PyMuPDFLoader(pdf_path)
-                docs = loader.load()
-                self.documents.extend(docs)
-                print(f"Loaded {pdf_file}")
-            except Exception as e:
-                print(f"Error loading {pdf_file}: {e}")
+        # Sorted so the documents come back in the same order on every run
+        pdf_files = sorted(pdf_files)
+        for pdf_file, (docs, error) in zip(pdf_files, self.parse_pdfs([os.path.join(pdf_dir, f) for f in pdf_files])):
+            if error:
+                print(f"Error loading {pdf_file}: {error}")
                 # Skip this file and continue with the next one
+                continue
+            self.documents.extend(docs)
+            print(f"Loaded {pdf_file}")
 
         return self.documents
+
+    def iter_parsed(self, pdf_paths: List[str]) -> Iterator[Tuple[str, Optional[List[Document]], Optional[str]]]:
+        """Yield (pdf_path, pages, error) in the order of pdf_paths as files are parsed.
+
+        The process pool works at most parse_workers files ahead of the
+        consumer, so parsed pages never pile up faster than they are indexed.
+        """
+        layout = self.chunker == "structured"
+        workers = min(self.parse_workers, len(pdf_paths))
+        if workers <= 1:
+            for pdf_path in pdf_paths:
+                yield (pdf_path, *parse_pdf(pdf_path, layout))
+            return
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ahead = deque()
+            for pdf_path in pdf_paths:
+                ahead.append((pdf_path, executor.submit(parse_pdf, pdf_path, layout)))
+                if len(ahead) > workers:
+                    pdf_path, future = ahead.popleft()
+                    yield (pdf_path, *future.result())
+            while ahead:
+                pdf_path, future = ahead.popleft()
+                yield (pdf_path, *future.result())
+
+    def parse_pdfs(self, pdf_paths: List[str]) -> List[Tuple[Optional[List[Document]], Optional[str]]]:
+        """Parse PDFs across a process pool; results are in the order of pdf_paths"""
+        return [(docs, error) for _, docs, error in self.iter_parsed(pdf_paths)]
     
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
         if not documents:
@@ -60,14 +141,17 @@ class DocumentPipeline:
         
         print(f"Chunking {len(documents)} documents")
 
-        # Chunk the documents into smaller chunks
-        text_splitter = CharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            length_function=len,
-        )
-
-        self.chunks = text_splitter.split_documents(documents)
+        if self.chunker == "structured":
+            # Sized in tokens along headings, lists and tables
+            self.chunks = StructuredChunker().split_documents(documents)
+        else:
+            # Chunk the documents into smaller chunks
+            text_splitter = CharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                length_function=len,
+            )
+            self.chunks = text_splitter.split_documents(documents)
 
         print(f"Created {len(self.chunks)} chunks")
 
@@ -78,43 +162,320 @@ class DocumentPipeline:
             print("No chunks to create vectorstore")
             return None
 
-        embeddings = OpenAIEmbeddings()
+        embeddings = self.embedding_function
         db_name = self.db_name
 
-        # Delete the collection if it already exists
-        if os.path.exists(db_name):
-            Chroma(persist_directory=db_name, embedding_function=embeddings).delete_collection()
+        # A full rebuild invalidates the incremental ingestion manifest
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+        # Upsert into the existing collection and only then drop what is no
+        # longer there, so an interrupted rebuild never leaves it empty and a
+        # rerun resumes where it stopped
+        self.vectorstore = Chroma(persist_directory=db_name, embedding_function=embeddings)
+        self._bootstrap_vector_index()
+        sources = {}
+        for chunk in chunks:
+            sources.setdefault(os.path.basename(chunk.metadata.get("source", "")), []).append(chunk)
+        chunks, ids = [], []
+        for source, source_chunks in sources.items():
+            chunks.extend(source_chunks)
+            ids.extend(chunk_ids(source, source_chunks))
+        self.lexical_index.clear()
+        self._index_chunks(chunks, ids)
 
-        # Create Vectorstore
-        self.vectorstore = Chroma.from_documents(documents=chunks, embedding=embeddings, persist_directory=db_name)
+        stale_ids = list(set(self.vectorstore._collection.get(include=[])["ids"]) - set(ids))
+        self._delete_chunks(stale_ids)
+        self._save_indexes()
         print(f"Vectorstore created with {self.vectorstore._collection.count()} documents")
 
+        # Cached answers may quote the old documents
+        bump_index_version()
+
         return self.vectorstore
     
+    def _index_chunks(self, chunks: List[Document], ids: List[str]) -> int:
+        """Embed and upsert chunks not already in the collection; returns how many were embedded.
+
+        Each batch is written as soon as it is embedded, so the collection
+        itself is the checkpoint an interrupted run resumes from. Every chunk
+        also goes into the lexical index, which needs no embedding.
+        """
+        pending = self._pending_chunks(chunks, ids)
+        batcher = EmbeddingBatcher(self.embedding_function)
+        for batch, vectors in batcher.iter_stream(pending, text=lambda item: item[1].page_content):
+            self._write_batch(batch, vectors)
+        return len(pending)
+
+    def _pending_chunks(self, chunks: List[Document], ids: List[str]) -> List[Tuple[str, Document]]:
+        """Add chunks to the lexical index and return the (chunk id, chunk) pairs still to embed"""
+        self.lexical_index.add(ids, chunks)
+        existing = set(self.vectorstore._collection.get(ids=ids, include=[])["ids"]) if ids else set()
+        return [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in existing]
+
+    def _write_batch(self, batch: List[Tuple[str, Document]], vectors: List[List[float]]):
+        """Upsert one embedded batch of (chunk id, chunk) pairs"""
+        ids = [chunk_id for chunk_id, _ in batch]
+        texts = [chunk.page_content for _, chunk in batch]
+        metadatas = [chunk.metadata for _, chunk in batch]
+        self.vectorstore._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        if self.vector_index is not None:
+            self.vector_index.upsert(ids, texts, metadatas, vectors)
+
+    def _delete_chunks(self, ids: List[str]):
+        """Remove chunks from both the vector and the lexical index"""
+        if ids:
+            self.vectorstore.delete(ids=ids)
+            self.lexical_index.delete(ids)
+            if self.vector_index is not None:
+                self.vector_index.delete(ids)
+
+    def _bootstrap_vector_index(self):
+        """Fill an empty NumPy index from the Chroma collection, e.g. after switching engines"""
+        if self.vector_index is None or len(self.vector_index) or not self.vectorstore._collection.count():
+            return
+        data = self.vectorstore._collection.get(include=["embeddings", "documents", "metadatas"])
+        self.vector_index.upsert(data["ids"], data["documents"], data["metadatas"], data["embeddings"])
+        print(f"Vector index filled with {len(self.vector_index)} chunks from the vectorstore")
+
+    def _bootstrap_lexical_index(self):
+        """Fill an empty BM25 index from the Chroma collection, e.g. one built before hybrid retrieval"""
+        if len(self.lexical_index):
+            return
+        if not self.vectorstore:
+            self.vectorstore = Chroma(persist_directory=self.db_name, embedding_function=self.embedding_function)
+        if not self.vectorstore._collection.count():
+            return
+        data = self.vectorstore._collection.get(include=["documents", "metadatas"])
+        self.lexical_index.add(data["ids"], [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+        ])
+        self.lexical_index.save()
+        print(f"Lexical index filled with {len(self.lexical_index)} chunks from the vectorstore")
+
+    def _save_indexes(self):
+        """Persist the indexes derived from the collection"""
+        self.lexical_index.save()
+        if self.vector_index is not None:
+            self.vector_index.save()
+
+    def indexed_count(self) -> int:
+        """Number of chunks the configured query engine can search"""
+        if self.vector_index is not None:
+            self.vector_index.refresh()
+            return len(self.vector_index)
+        if not self.vectorstore:
+            self.vectorstore = Chroma(persist_directory=self.db_name, embedding_function=self.embedding_function)
+        return self.vectorstore._collection.count()
+
     def get_retriever(self):
         """Get LangChain retriever from existing vectorstore"""
+        if HYBRID_RETRIEVAL:
+            self._bootstrap_lexical_index()
+            if not len(self.lexical_index):
+                print("⚠️ Hybrid retrieval is enabled but the lexical index is empty, using vector search only")
+        if self.vector_index is not None:
+            # The NumPy engines answer queries without opening Chroma
+            if HYBRID_RETRIEVAL and len(self.lexical_index):
+                return HybridRetriever(vectorstore=self.vector_index, lexical_index=self.lexical_index, k=3)
+            return VectorIndexRetriever(index=self.vector_index, k=3)
+
         if not self.vectorstore:
             # Load existing vectorstore if not initialized
-            embeddings = OpenAIEmbeddings()
-            self.vectorstore = Chroma(persist_directory=self.db_name, embedding_function=embeddings)
+            self.vectorstore = Chroma(persist_directory=self.db_name, embedding_function=self.embedding_function)
         
+        # Fuse with BM25 once the lexical index has been built by ingestion
+        if HYBRID_RETRIEVAL and len(self.lexical_index):
+            return HybridRetriever(vectorstore=self.vectorstore, lexical_index=self.lexical_index, k=3)
+
         return self.vectorstore.as_retriever(
             search_type="similarity",
             search_kwargs={"k": 3}
         )
     
+    def _chunking_settings(self) -> Dict[str, Any]:
+        """Settings that decide how a file is chunked, and so its chunk ids"""
+        if self.chunker == "structured":
+            return {"chunker": self.chunker, "chunk_tokens": CHUNK_TOKENS, "chunk_overlap_tokens": CHUNK_OVERLAP_TOKENS}
+        return {"chunker": self.chunker, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Indexed files as {filename: {"sha256": ..., "chunk_ids": [...]}}.
+
+        A manifest left by a rebuild that has not yet swept the chunks it did
+        not produce is incomplete and loads as empty, so the rebuild resumes.
+        So does one written with other chunking settings, so every file is
+        chunked again.
+        """
+        try:
+            with open(self.manifest_path) as f:
+                data = json.load(f)
+            if data.get("chunking") != self._chunking_settings():
+                print("Chunking settings changed since the last run, re-chunking every file")
+                return {}
+            return data["files"] if data.get("complete", True) else {}
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _save_manifest(self, files: Dict[str, Any], complete: bool = True):
+        # Write then rename so a crash never leaves a half-written manifest
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"files": files, "complete": complete, "chunking": self._chunking_settings()}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def update_vectorstore(self, pdf_dir: str = PDF_DIR) -> Dict[str, Any]:
+        """Incrementally sync the vectorstore with the PDFs in pdf_dir.
+
+        Only files whose content hash changed are loaded and chunked, only
+        chunks with new content are embedded, and chunks of changed or removed
+        files that no longer exist are deleted. Returns a report of what changed.
+
+        Files stream through parse → chunk → embed → write: the process pool
+        parses ahead while earlier files are embedded, embedding requests
+        overlap with writes, and each stage only pulls from the one before it
+        as fast as it keeps up, so memory stays flat however large the corpus.
+        """
+        report = {"added": [], "changed": [], "removed": [], "unchanged": [], "failed": [], "chunks_added": 0, "chunks_deleted": 0}
+        if not os.path.exists(pdf_dir):
+            print(f"Error: Directory {pdf_dir} does not exist!")
+            return report
+
+        if not self.vectorstore:
+            self.vectorstore = Chroma(persist_directory=self.db_name, embedding_function=self.embedding_function)
+        # An empty collection or lexical index means the manifest no longer
+        # describes it; files are then re-chunked but only missing vectors embedded
+        manifest = self._load_manifest() if self.vectorstore._collection.count() and len(self.lexical_index) else {}
+        # Without a manifest the indexes may hold chunks no file maps to (e.g.
+        # from before the manifest existed); a rebuild deletes them at the end
+        rebuild = not manifest
+        self._bootstrap_vector_index()
+
+        pdf_files = sorted(f for f in os.listdir(pdf_dir) if f.endswith('.pdf'))
+        updated = {}
+        hashes = {}
+        for pdf_file in pdf_files:
+            try:
+                hashes[pdf_file] = file_sha256(os.path.join(pdf_dir, pdf_file))
+            except OSError as e:
+                print(f"Error reading {pdf_file}: {e}")
+                if pdf_file in manifest:
+                    updated[pdf_file] = manifest[pdf_file]
+                report["failed"].append(pdf_file)
+                continue
+            previous = manifest.get(pdf_file)
+            if previous and previous["sha256"] == hashes[pdf_file]:
+                updated[pdf_file] = previous
+                report["unchanged"].append(pdf_file)
+
+        to_parse = [f for f in pdf_files if f in hashes and f not in updated]
+        # Files whose chunks are still being embedded, with their new manifest entry
+        in_progress = {}
+
+        def finish(pdf_file: str):
+            state = in_progress.pop(pdf_file)
+            stale_ids = list(state["old_ids"] - set(state["entry"]["chunk_ids"]))
+            self._delete_chunks(stale_ids)
+            updated[pdf_file] = state["entry"]
+            report["changed" if pdf_file in manifest else "added"].append(pdf_file)
+            report["chunks_added"] += state["new"]
+            report["chunks_deleted"] += len(stale_ids)
+            # Checkpoint after every file so a rerun skips finished files
+            self._save_indexes()
+            self._save_manifest({**manifest, **updated}, complete=not rebuild)
+
+        def fail(pdf_file: str, error: Any):
+            print(f"Error indexing {pdf_file}: {error}")
+            # Keep the old entry so its chunks are neither lost nor orphaned
+            if pdf_file in manifest:
+                updated[pdf_file] = manifest[pdf_file]
+            report["failed"].append(pdf_file)
+
+        def pending_chunks() -> Iterator[Tuple[str, str, Document]]:
+            """(file, chunk id, chunk) for every chunk to embed, parsed and chunked on demand"""
+            for pdf_path, docs, error in self.iter_parsed([os.path.join(pdf_dir, f) for f in to_parse]):
+                pdf_file = os.path.basename(pdf_path)
+                try:
+                    if error:
+                        raise RuntimeError(error)
+                    chunks = self.chunk_documents(docs)
+                    ids = chunk_ids(pdf_file, chunks)
+                    old_ids = set(manifest[pdf_file]["chunk_ids"]) if pdf_file in manifest else set()
+                    new_chunks = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in old_ids]
+                    pending = self._pending_chunks([chunk for _, chunk in new_chunks], [chunk_id for chunk_id, _ in new_chunks])
+                except Exception as e:
+                    fail(pdf_file, e)
+                    continue
+                in_progress[pdf_file] = {
+                    "entry": {"sha256": hashes[pdf_file], "chunk_ids": ids},
+                    "old_ids": old_ids,
+                    "new": len(new_chunks),
+                    "remaining": len(pending)
+                }
+                if not pending:
+                    finish(pdf_file)
+                for chunk_id, chunk in pending:
+                    yield pdf_file, chunk_id, chunk
+
+        # Batches span file boundaries; a file is finished once its last chunk is written
+        batcher = EmbeddingBatcher(self.embedding_function)
+        try:
+            for batch, vectors in batcher.iter_stream(pending_chunks(), text=lambda item: item[2].page_content):
+                self._write_batch([(chunk_id, chunk) for _, chunk_id, chunk in batch], vectors)
+                for pdf_file, _, _ in batch:
+                    in_progress[pdf_file]["remaining"] -= 1
+                    if not in_progress[pdf_file]["remaining"]:
+                        finish(pdf_file)
+        except Exception as e:
+            # Written batches stay in the collection, so a rerun only embeds the rest
+            for pdf_file in to_parse:
+                if pdf_file not in updated and pdf_file not in report["failed"]:
+                    fail(pdf_file, e)
+
+        for pdf_file, previous in manifest.items():
+            if pdf_file not in updated and pdf_file not in pdf_files:
+                self._delete_chunks(previous["chunk_ids"])
+                report["removed"].append(pdf_file)
+                report["chunks_deleted"] += len(previous["chunk_ids"])
+
+        if rebuild and report["failed"]:
+            # Chunks of failed files cannot be told apart from stale ones yet
+            print("Stale chunks are kept until a rebuild finishes without failed files")
+        elif rebuild:
+            produced = {chunk_id for entry in updated.values() for chunk_id in entry["chunk_ids"]}
+            indexed = set(self.vectorstore._collection.get(include=[])["ids"]) | set(self.lexical_index.docs)
+            if self.vector_index is not None:
+                indexed |= set(self.vector_index.ids)
+            stale_ids = list(indexed - produced)
+            self._delete_chunks(stale_ids)
+            report["chunks_deleted"] += len(stale_ids)
+
+        self._save_indexes()
+        self._save_manifest(updated, complete=not (rebuild and report["failed"]))
+        # Files finish in whatever order their last batch completes
+        for key in ("added", "changed", "failed"):
+            report[key].sort()
+        if report["chunks_added"] or report["chunks_deleted"]:
+            # Cached answers may quote the old documents
+            bump_index_version()
+
+        print(
+            f"Index sync: {len(report['added'])} added, {len(report['changed'])} changed, "
+            f"{len(report['removed'])} removed, {len(report['unchanged'])} unchanged, {len(report['failed'])} failed files; "
+            f"{report['chunks_added']} chunks embedded, {report['chunks_deleted']} chunks deleted"
+        )
+        return report
+
     def process_documents(self) -> Chroma:
-        """Complete pipeline: load → chunk → create vectorstore """
-        documents = self.load_documents()
-        if not documents:
+        """Complete pipeline: load → chunk → embed only what changed since the last run"""
+        self.update_vectorstore()
+        if not self.vectorstore or not self.indexed_count():
             return None
         
-        chunks = self.chunk_documents(documents)
-        if not chunks:
-            return None
-        
-        vectorstore = self.create_vectorstore(chunks)
-        if not vectorstore:
-            return None
-        
-        return vectorstore
+        return self.vectorstore
+
+if __name__ == "__main__":
+    # Re-index the knowledge base, embedding only what changed since the last run
+    DocumentPipeline().update_vectorstore()
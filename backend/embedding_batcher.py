@@ -0,0 +1,128 @@
+"""
+Batched embedding stage for Alexa - Member Support Agent
+Embeds chunks in fixed-size batches over a bounded number of concurrent
+requests, throttled by token buckets and retried with backoff on errors
+such as 429s. Batches can be drawn from a stream, so a producer upstream is
+only read as fast as the embedding requests complete
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+from langchain_core.embeddings import Embeddings
+from config.constants import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_CONCURRENCY, EMBEDDING_REQUESTS_PER_MINUTE,
+    EMBEDDING_TOKENS_PER_MINUTE, EMBEDDING_MAX_RETRIES
+)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token) for rate limiting"""
+    return max(1, len(text) // 4)
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Lists of up to size consecutive items, read lazily"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate_per_minute: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """Allow rate_per_minute units per minute, with bursts up to one minute's worth"""
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = rate_per_minute
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1):
+        """Block until amount units are available, then take them"""
+        # A request larger than the bucket would wait forever, so cap it
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                delay = (amount - self._tokens) / self.rate
+            self.sleep(delay)
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = EMBEDDING_MAX_CONCURRENCY,
+        requests_per_minute: float = EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = EMBEDDING_TOKENS_PER_MINUTE,
+        max_retries: int = EMBEDDING_MAX_RETRIES,
+        retry_backoff: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """Initialize the stage around an embedding model's embed_documents"""
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute, sleep=sleep)
+        self.tokens = TokenBucket(tokens_per_minute, sleep=sleep)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.sleep = sleep
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            self.requests.acquire()
+            self.tokens.acquire(sum(estimate_tokens(text) for text in texts))
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                error = e
+                if attempt < self.max_retries:
+                    print(f"Embedding batch failed ({e}), retrying")
+                    self.sleep(self.retry_backoff * (2 ** attempt))
+        raise error
+
+    def iter_stream(
+        self,
+        items: Iterable[Any],
+        text: Callable[[Any], str] = lambda item: item
+    ) -> Iterator[Tuple[List[Any], List[List[float]]]]:
+        """Yield (batch, vectors) for each batch of items as soon as it is embedded.
+
+        items is read lazily: no more than max_concurrency batches are in
+        flight, so a slow provider holds back the producer instead of letting
+        pending items pile up in memory. Batches finish out of order. If a
+        batch still fails after its retries, no further batches are started
+        and the error is raised.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        in_flight = {}
+        try:
+            for batch in batched(items, self.batch_size):
+                if len(in_flight) >= self.max_concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield in_flight.pop(future), future.result()
+                in_flight[executor.submit(self._embed_batch, [text(item) for item in batch])] = batch
+            for future in as_completed(list(in_flight)):
+                yield in_flight.pop(future), future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_batches(self, texts: List[str]) -> Iterator[Tuple[int, List[List[float]]]]:
+        """Yield (offset, vectors) for each batch of texts; the offset is the
+        index of the batch's first text"""
+        for batch, vectors in self.iter_stream(enumerate(texts), text=lambda item: item[1]):
+            yield batch[0][0], vectors
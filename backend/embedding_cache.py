@@ -0,0 +1,123 @@
+"""
+Embedding cache for Alexa - Member Support Agent
+Wraps an embedding model so repeated knowledge base queries are embedded once:
+an in-memory LRU in front of an optional SQLite file shared across restarts
+"""
+
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from config.constants import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_PERSIST
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different queries share an entry"""
+    return " ".join(text.split())
+
+class SQLiteEmbeddingStore:
+    """Embeddings keyed by (model, text) in a local SQLite file"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "text TEXT NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        row = self._connection().execute(
+            "SELECT vector FROM embeddings WHERE model = ? AND text = ?", (model, text)
+        ).fetchone()
+        return array("f", row[0]).tolist() if row else None
+
+    def put(self, model: str, text: str, vector: List[float]):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+            (model, text, array("f", vector).tobytes())
+        )
+
+class CachedEmbeddings(Embeddings):
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        store: Optional[SQLiteEmbeddingStore] = None,
+        model: Optional[str] = None
+    ):
+        """Wrap an embedding model.
+
+        Query embeddings are cached by (model, normalized text); document
+        embeddings pass straight through since each chunk is embedded once.
+        """
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.store = store
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_put(self, key: Tuple[str, str], vector: List[float]):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        text = normalize_text(text)
+        key = (self.model, text)
+
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        vector = self.store.get(self.model, text) if self.store else None
+        if vector is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            vector = self.embeddings.embed_query(text)
+            with self._lock:
+                self.misses += 1
+            if self.store:
+                self.store.put(self.model, text, vector)
+
+        self._cache_put(key, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for logging"""
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": len(self._cache)}
+
+def cached_embeddings(embeddings: Embeddings) -> CachedEmbeddings:
+    """Wrap embeddings with the cache tiers selected in config"""
+    store = SQLiteEmbeddingStore() if EMBEDDING_CACHE_PERSIST else None
+    return CachedEmbeddings(embeddings, store=store)
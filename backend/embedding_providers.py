@@ -0,0 +1,73 @@
+"""
+Embedding providers for Alexa - Member Support Agent
+Builds the embedding model selected by EMBEDDING_PROVIDER: OpenAI, or a
+CPU-only local model that needs no network and embeds a query in well under
+a millisecond
+"""
+
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config.constants import EMBEDDING_PROVIDER, LOCAL_EMBEDDING_DIMENSIONS
+
+class HashingEmbeddings(Embeddings):
+    """Hashed word and character n-gram vectors.
+
+    Each feature is hashed (crc32, stable across processes) into one of
+    `dimensions` signed buckets weighted by sublinear term frequency, then the
+    vector is L2-normalized, so cosine similarity measures shared wording.
+    """
+
+    def __init__(self, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS, ngram_range: Tuple[int, int] = (3, 5)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        # Used as the cache key by CachedEmbeddings
+        self.model = f"local-hashing-{dimensions}"
+
+    def _features(self, text: str) -> Iterator[str]:
+        text = " ".join(text.lower().split())
+        for word in re.findall(r"\w+", text):
+            yield f"w:{word}"
+        padded = f" {text} "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                yield padded[i:i + n]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in Counter(self._features(text)).items():
+            digest = zlib.crc32(feature.encode())
+            sign = -1.0 if digest & 0x80000000 else 1.0
+            vector[digest % self.dimensions] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER, model: Optional[str] = None) -> Embeddings:
+    """Build the embedding model selected in config.
+
+    model only applies to OpenAI; without it the client default is used,
+    which is what the existing knowledge base index was built with.
+    """
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model) if model else OpenAIEmbeddings()
+    if provider == "local":
+        return HashingEmbeddings()
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+def is_local(embeddings: Embeddings) -> bool:
+    """Local models are cheaper to run than to look up in the embedding cache"""
+    return isinstance(embeddings, HashingEmbeddings)
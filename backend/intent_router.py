@@ -0,0 +1,119 @@
+"""
+Intent router for Alexa - Member Support Agent
+Answers trivial turns (greetings, thanks, goodbyes and small talk) straight
+from response_templates, without an agent run, when keyword rules or an
+optional local classifier are confident enough
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from embedding_providers import HashingEmbeddings
+from response_templates import get_welcome_response, get_thanks_response, get_goodbye_response, get_small_talk_response
+from config.constants import INTENT_RULE_THRESHOLD, INTENT_CLASSIFIER, INTENT_CLASSIFIER_THRESHOLD
+
+INTENT_RESPONSES = {
+    "greeting": get_welcome_response,
+    "thanks": get_thanks_response,
+    "goodbye": get_goodbye_response,
+    "small_talk": get_small_talk_response
+}
+
+# Whole phrases per intent, matched on the normalized message. When a message
+# matches several, the later intent wins ("thanks, bye" is a goodbye)
+INTENT_PHRASES = {
+    "greeting": r"hi|hello|hey|hiya|howdy|greetings|good (?:morning|afternoon|evening|day)",
+    "small_talk": r"how are you(?: doing)?|hows it going|how are things|whats up|nice to meet you|who are you|are you a (?:bot|robot|human)",
+    "thanks": r"thanks?(?: you)?|thank u|thx|ty|much appreciated|appreciate it|cheers",
+    "goodbye": r"bye(?: bye)?|goodbye|good night|see you(?: later| soon)?|see ya|talk (?:to you )?later|take care|"
+               r"have a (?:good|great|nice) (?:day|night|evening|weekend|one)|thats all|im done|im all set"
+}
+_PATTERNS = {intent: re.compile(rf"\b(?:{phrases})\b") for intent, phrases in INTENT_PHRASES.items()}
+
+# Words that do not change what a short message means ("thanks so much alexa")
+FILLER_WORDS = frozenset(
+    "alexa there so much very a lot again for your the help ok okay oh well great and really just you all guys today".split()
+)
+
+# Labelled examples for the classifier; "support" turns always go to the agent
+INTENT_EXAMPLES = {
+    "greeting": ["hello", "hi there", "hey alexa", "good morning", "good afternoon", "hello hello"],
+    "thanks": ["thank you", "thanks a lot", "thank you so much", "many thanks", "thanks for the help", "appreciate it"],
+    "goodbye": ["bye", "goodbye", "see you later", "have a nice day", "that is all for today", "bye for now"],
+    "small_talk": ["how are you", "how are you doing today", "who are you", "are you a real person", "nice to meet you"],
+    "support": [
+        "how do i reset my pin", "what are your loan rates", "i lost my card", "how do i open an account",
+        "i want to talk to someone about a loan", "is there a fee for overdraft", "thanks, also how do i order checks",
+        "hello i need help with my account", "my card was stolen", "what are the branch hours"
+    ]
+}
+
+def normalize_message(message: str) -> List[str]:
+    """Lowercase words with apostrophes dropped ("what's" -> "whats") and other punctuation removed"""
+    return re.sub(r"[^a-z0-9 ]", " ", message.lower().replace("'", "").replace("’", "")).split()
+
+class IntentRouter:
+    def __init__(
+        self,
+        rule_threshold: float = INTENT_RULE_THRESHOLD,
+        use_classifier: bool = INTENT_CLASSIFIER,
+        classifier_threshold: float = INTENT_CLASSIFIER_THRESHOLD
+    ):
+        """Initialize the rules and, if enabled, the nearest-example classifier.
+
+        Rule confidence is the share of the message's words covered by an
+        intent's phrases or filler words, so "hi" scores 1.0 but "hi, I lost
+        my card" falls well below any sensible threshold. The classifier
+        compares hashed n-gram vectors of the message with INTENT_EXAMPLES,
+        which tolerates typos, and only runs when the rules are unsure.
+        """
+        self.rule_threshold = rule_threshold
+        self.classifier_threshold = classifier_threshold
+        self.embeddings = None
+        if use_classifier:
+            self.embeddings = HashingEmbeddings()
+            self.labels = [intent for intent, examples in INTENT_EXAMPLES.items() for _ in examples]
+            self.examples = np.array(self.embeddings.embed_documents(
+                [example for examples in INTENT_EXAMPLES.values() for example in examples]
+            ))
+
+    def _match_rules(self, words: List[str]) -> Tuple[Optional[str], float]:
+        text = " ".join(words)
+        intent = None
+        covered = set()
+        for name, pattern in _PATTERNS.items():
+            spans = [match.span() for match in pattern.finditer(text)]
+            if not spans:
+                continue
+            intent = name
+            # Map character spans back to word positions
+            position = 0
+            for i, word in enumerate(words):
+                if any(start <= position < end for start, end in spans):
+                    covered.add(i)
+                position += len(word) + 1
+        if intent is None:
+            return None, 0.0
+        covered.update(i for i, word in enumerate(words) if word in FILLER_WORDS)
+        return intent, len(covered) / len(words)
+
+    def _classify(self, message: str) -> Tuple[Optional[str], float]:
+        scores = self.examples @ np.array(self.embeddings.embed_query(message))
+        best = int(np.argmax(scores))
+        return self.labels[best], float(scores[best])
+
+    def route(self, message: str) -> Optional[Dict[str, Any]]:
+        """{"intent", "confidence", "method", "response"} for a trivial turn, None for the agent"""
+        words = normalize_message(message)
+        if not words:
+            return None
+        intent, confidence = self._match_rules(words)
+        method = "rules"
+        if confidence < self.rule_threshold and self.embeddings is not None:
+            intent, confidence = self._classify(message)
+            method = "classifier"
+            if intent == "support" or confidence < self.classifier_threshold:
+                return None
+        elif confidence < self.rule_threshold:
+            return None
+        return {"intent": intent, "confidence": confidence, "method": method, "response": INTENT_RESPONSES[intent]()}
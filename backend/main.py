@@ -1,16 +1,26 @@
 import os
+import json
+import asyncio
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Optional
 from chat_chain import ChatChain
+from tools import get_retriever, retriever_status
 from database import (
-    UserCRUD, ConversationCRUD, MessageCRUD,
     UserCreate, UserUpdate, User,
     ConversationCreate, ConversationUpdate, Conversation,
     MessageCreate, MessageUpdate, Message,
-    get_conversation_with_messages, create_user_conversation, add_message_to_conversation
+    Page
+)
+from config.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, RETRIEVER_WARMUP
+from async_database import (
+    AsyncUserCRUD, AsyncConversationCRUD, AsyncMessageCRUD,
+    aget_conversation_with_messages, acreate_user_conversation, aadd_message_to_conversation,
+    close_async_client
 )
 
 # Load environment variables from root directory
@@ -33,6 +43,26 @@ app.add_middleware(
 # Initialize the chat chain
 chat_chain = ChatChain()
 
+async def warm_up_retriever():
+    """Build the knowledge base retriever in a worker thread so startup never waits on it"""
+    try:
+        await asyncio.to_thread(get_retriever)
+        print("✅ RETRIEVER: Knowledge base ready")
+    except Exception as e:
+        print(f"❌ RETRIEVER WARM-UP ERROR: {e}")
+
+@app.on_event("startup")
+async def startup():
+    """Start the optional retriever warm-up in the background"""
+    if RETRIEVER_WARMUP:
+        app.state.retriever_warmup = asyncio.create_task(warm_up_retriever())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Write any queued chat messages and close pooled database connections"""
+    chat_chain.message_writer.close()
+    await close_async_client()
+
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
@@ -47,40 +77,69 @@ async def ping():
     """Health check endpoint"""
     return {"status": "ok", "message": "Member Support Agent API is running"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once the knowledge base retriever is loaded, 503 until then"""
+    status = retriever_status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **status})
+    return {"status": "ready", **status}
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Chat endpoint that accepts messages and returns responses"""
-    response = chat_chain.get_response(request.message, request.session_id)
+    response = await chat_chain.aget_response(request.message, request.session_id)
     return ChatResponse(
         response=response
     )
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Chat endpoint that streams status events and answer tokens as Server-Sent Events"""
+    async def event_source():
+        async for event in chat_chain.astream_response(request.message, request.session_id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # User CRUD Endpoints
 @app.post("/users/", response_model=User)
 async def create_user(user: UserCreate):
     """Create a new user"""
     try:
-        return UserCRUD.create(user)
+        return await AsyncUserCRUD.create(user)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: int):
     """Get a user by ID"""
-    user = UserCRUD.get(user_id)
+    user = await AsyncUserCRUD.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@app.get("/users/", response_model=List[User])
-async def get_all_users():
-    """Get all users"""
-    return UserCRUD.get_all()
+@app.get("/users/", response_model=Page[User])
+async def get_all_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: str = "id",
+    descending: bool = False
+):
+    """Get a page of users; pass next_cursor back as `after` for the next page"""
+    try:
+        return await AsyncUserCRUD.get_page(limit=limit, after=after, order_by=order_by, descending=descending)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/users/email/{email}", response_model=User)
 async def get_user_by_email(email: str):
     """Get a user by email"""
-    user = UserCRUD.get_by_email(email)
+    user = await AsyncUserCRUD.get_by_email(email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -88,7 +147,7 @@ async def get_user_by_email(email: str):
 @app.put("/users/{user_id}", response_model=User)
 async def update_user(user_id: int, user_update: UserUpdate):
     """Update a user"""
-    user = UserCRUD.update(user_id, user_update)
+    user = await AsyncUserCRUD.update(user_id, user_update)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -96,7 +155,7 @@ async def update_user(user_id: int, user_update: UserUpdate):
 @app.delete("/users/{user_id}")
 async def delete_user(user_id: int):
     """Delete a user"""
-    success = UserCRUD.delete(user_id)
+    success = await AsyncUserCRUD.delete(user_id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
@@ -106,32 +165,55 @@ async def delete_user(user_id: int):
 async def create_conversation(conversation: ConversationCreate):
     """Create a new conversation"""
     try:
-        return ConversationCRUD.create(conversation)
+        return await AsyncConversationCRUD.create(conversation)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(conversation_id: int):
     """Get a conversation by ID"""
-    conversation = ConversationCRUD.get(conversation_id)
+    conversation = await AsyncConversationCRUD.get(conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
-@app.get("/conversations/", response_model=List[Conversation])
-async def get_all_conversations():
-    """Get all conversations"""
-    return ConversationCRUD.get_all()
+@app.get("/conversations/", response_model=Page[Conversation])
+async def get_all_conversations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: str = "id",
+    descending: bool = False,
+    user_id: Optional[int] = None,
+    started_after: Optional[datetime] = None,
+    started_before: Optional[datetime] = None
+):
+    """Get a page of conversations; pass next_cursor back as `after` for the next page"""
+    try:
+        return await AsyncConversationCRUD.get_page(
+            limit=limit, after=after, order_by=order_by, descending=descending,
+            user_id=user_id, started_after=started_after, started_before=started_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/users/{user_id}/conversations", response_model=List[Conversation])
-async def get_user_conversations(user_id: int):
-    """Get all conversations for a user"""
-    return ConversationCRUD.get_by_user(user_id)
+@app.get("/users/{user_id}/conversations", response_model=Page[Conversation])
+async def get_user_conversations(
+    user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: str = "started_at",
+    descending: bool = False
+):
+    """Get a page of conversations for a user"""
+    try:
+        return await AsyncConversationCRUD.get_page(limit=limit, after=after, order_by=order_by, descending=descending, user_id=user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/conversations/{conversation_id}", response_model=Conversation)
 async def update_conversation(conversation_id: int, conversation_update: ConversationUpdate):
     """Update a conversation"""
-    conversation = ConversationCRUD.update(conversation_id, conversation_update)
+    conversation = await AsyncConversationCRUD.update(conversation_id, conversation_update)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
@@ -139,7 +221,7 @@ async def update_conversation(conversation_id: int, conversation_update: Convers
 @app.delete("/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: int):
     """Delete a conversation"""
-    success = ConversationCRUD.delete(conversation_id)
+    success = await AsyncConversationCRUD.delete(conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return {"message": "Conversation deleted successfully"}
@@ -149,32 +231,55 @@ async def delete_conversation(conversation_id: int):
 async def create_message(message: MessageCreate):
     """Create a new message"""
     try:
-        return MessageCRUD.create(message)
+        return await AsyncMessageCRUD.create(message)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/messages/{message_id}", response_model=Message)
 async def get_message(message_id: int):
     """Get a message by ID"""
-    message = MessageCRUD.get(message_id)
+    message = await AsyncMessageCRUD.get(message_id)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     return message
 
-@app.get("/messages/", response_model=List[Message])
-async def get_all_messages():
-    """Get all messages"""
-    return MessageCRUD.get_all()
+@app.get("/messages/", response_model=Page[Message])
+async def get_all_messages(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: str = "id",
+    descending: bool = False,
+    conversation_id: Optional[int] = None,
+    sent_after: Optional[datetime] = None,
+    sent_before: Optional[datetime] = None
+):
+    """Get a page of messages; pass next_cursor back as `after` for the next page"""
+    try:
+        return await AsyncMessageCRUD.get_page(
+            limit=limit, after=after, order_by=order_by, descending=descending,
+            conversation_id=conversation_id, sent_after=sent_after, sent_before=sent_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/conversations/{conversation_id}/messages", response_model=List[Message])
-async def get_conversation_messages(conversation_id: int):
-    """Get all messages for a conversation"""
-    return MessageCRUD.get_by_conversation(conversation_id)
+@app.get("/conversations/{conversation_id}/messages", response_model=Page[Message])
+async def get_conversation_messages(
+    conversation_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    order_by: str = "sent_at",
+    descending: bool = False
+):
+    """Get a page of messages for a conversation"""
+    try:
+        return await AsyncMessageCRUD.get_page(limit=limit, after=after, order_by=order_by, descending=descending, conversation_id=conversation_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.put("/messages/{message_id}", response_model=Message)
 async def update_message(message_id: int, message_update: MessageUpdate):
     """Update a message"""
-    message = MessageCRUD.update(message_id, message_update)
+    message = await AsyncMessageCRUD.update(message_id, message_update)
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     return message
@@ -182,16 +287,23 @@ async def update_message(message_id: int, message_update: MessageUpdate):
 @app.delete("/messages/{message_id}")
 async def delete_message(message_id: int):
     """Delete a message"""
-    success = MessageCRUD.delete(message_id)
+    success = await AsyncMessageCRUD.delete(message_id)
     if not success:
         raise HTTPException(status_code=404, detail="Message not found")
     return {"message": "Message deleted successfully"}
 
 # Convenience Endpoints
 @app.get("/conversations/{conversation_id}/full")
-async def get_conversation_with_all_messages(conversation_id: int):
-    """Get a conversation with all its messages"""
-    result = get_conversation_with_messages(conversation_id)
+async def get_conversation_with_all_messages(
+    conversation_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    """Get a conversation with a page of its messages; pass next_cursor back as `after` for the next page"""
+    try:
+        result = await aget_conversation_with_messages(conversation_id, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not result:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return result
@@ -200,7 +312,7 @@ async def get_conversation_with_all_messages(conversation_id: int):
 async def create_user_conversation_endpoint(user_id: int, title: Optional[str] = None):
     """Create a new conversation for a user"""
     try:
-        return create_user_conversation(user_id, title)
+        return await acreate_user_conversation(user_id, title)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -208,7 +320,7 @@ async def create_user_conversation_endpoint(user_id: int, title: Optional[str] =
 async def add_message_to_conversation_endpoint(conversation_id: int, content: str, topic: Optional[str] = None, private: bool = False):
     """Add a message to a conversation"""
     try:
-        return add_message_to_conversation(conversation_id, content, topic=topic, private=private)
+        return await aadd_message_to_conversation(conversation_id, content, topic=topic, private=private)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
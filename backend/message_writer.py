@@ -0,0 +1,141 @@
+"""
+Write-behind message persistence for Alexa - Member Support Agent
+Queues chat messages and stores them in batched bulk inserts off the response path
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+from config.constants import (
+    MESSAGE_QUEUE_MAX_SIZE, MESSAGE_BATCH_SIZE, MESSAGE_FLUSH_INTERVAL_SECONDS,
+    MESSAGE_WRITE_MAX_RETRIES, MESSAGE_DEAD_LETTER_FILE
+)
+
+# Sentinel that tells the worker thread to exit once the queue is drained
+_STOP = object()
+
+def _persist_with_message_crud(messages: List[Any]):
+    """Default batch writer: one bulk insert through MessageCRUD"""
+    from database import MessageCRUD
+    MessageCRUD.create_many(messages)
+
+class MessageWriter:
+    def __init__(
+        self,
+        persist_batch: Callable[[List[Any]], Any] = _persist_with_message_crud,
+        max_queue_size: int = MESSAGE_QUEUE_MAX_SIZE,
+        batch_size: int = MESSAGE_BATCH_SIZE,
+        flush_interval: float = MESSAGE_FLUSH_INTERVAL_SECONDS,
+        max_retries: int = MESSAGE_WRITE_MAX_RETRIES,
+        dead_letter_path: str = MESSAGE_DEAD_LETTER_FILE,
+        retry_backoff: float = 0.5
+    ):
+        """Initialize the writer.
+
+        A single worker thread drains the queue in FIFO order, so messages of
+        a conversation are inserted in the order they were enqueued.
+        """
+        self.persist_batch = persist_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.retry_backoff = retry_backoff
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._dead_letter_lock = threading.Lock()
+
+    def start(self):
+        """Start the background worker (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, message: Any) -> bool:
+        """Queue a message for persistence without blocking.
+
+        Returns False when the queue is full; the message is then written to
+        the dead-letter file instead so memory stays bounded.
+        """
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self._dead_letter([message], "write-behind queue full")
+            return False
+
+    def flush(self):
+        """Block until every queued message has been written or dead-lettered"""
+        self._queue.join()
+
+    def close(self, timeout: float = 10.0):
+        """Flush outstanding messages and stop the worker"""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _next_batch(self) -> List[Any]:
+        """Wait for one message, then take whatever else is ready up to batch_size"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while batch[-1] is not _STOP and len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            messages = batch[:-1] if stop else batch
+            try:
+                if messages:
+                    self._write(messages)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, messages: List[Any]):
+        """Write one batch, retrying with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.persist_batch(messages)
+                print(f"💾 MESSAGE: Stored batch of {len(messages)} messages")
+                return
+            except Exception as e:
+                error = e
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+        print(f"❌ MESSAGE STORAGE ERROR: {error}")
+        self._dead_letter(messages, str(error))
+
+    def _dead_letter(self, messages: List[Any], reason: str):
+        """Append messages that could not be stored to the dead-letter file"""
+        try:
+            with self._dead_letter_lock:
+                os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+                with open(self.dead_letter_path, "a") as f:
+                    for message in messages:
+                        f.write(json.dumps({
+                            "failed_at": datetime.now().isoformat(),
+                            "reason": reason,
+                            "message": message.model_dump()
+                        }) + "\n")
+            print(f"⚠️ MESSAGE: {len(messages)} messages written to {self.dead_letter_path}")
+        except Exception as e:
+            print(f"❌ DEAD LETTER ERROR: {e}")
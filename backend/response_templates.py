@@ -12,4 +12,16 @@ def get_escalation_response(issue_type: str):
 
 def get_knowledge_not_found_response(topic: str):
     """Response when knowledge not available"""
-    return f"I don't have specific information about {topic} in my knowledge base. I'd be happy to connect you with a member service representative who can help. You can reach them at 1-888-HBCU-HELP." 
\ No newline at end of file
+    return f"I don't have specific information about {topic} in my knowledge base. I'd be happy to connect you with a member service representative who can help. You can reach them at 1-888-HBCU-HELP."
+
+def get_thanks_response():
+    """Reply to a member thanking the agent"""
+    return "You're welcome! Is there anything else I can help you with today?"
+
+def get_goodbye_response():
+    """Reply to a member ending the conversation"""
+    return "Thank you for contacting Horizon Bay Credit Union. Have a great day!"
+
+def get_small_talk_response():
+    """Reply to small talk such as 'how are you' or 'who are you'"""
+    return "I'm doing well, thanks for asking! I'm Alexa, your Member Support Agent at Horizon Bay Credit Union. I can help with accounts, cards, loans and more. What can I do for you today?"
@@ -0,0 +1,160 @@
+"""
+Semantic answer cache for Alexa - Member Support Agent
+Serves stored answers to questions that mean the same thing as one already
+answered, keyed on the embedding of the normalized question
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional
+import numpy as np
+from config.constants import (
+    INDEX_VERSION_FILE, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_THRESHOLD
+)
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+def read_index_version(path: str = INDEX_VERSION_FILE) -> str:
+    """Current knowledge base index version, or "" if it was never written"""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def bump_index_version(path: str = INDEX_VERSION_FILE) -> str:
+    """Record that the knowledge base was re-indexed; invalidates cached answers in every worker"""
+    version = uuid.uuid4().hex
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(version)
+    return version
+
+class _CacheEntry:
+    def __init__(self, key: str, answer: str, created_at: float):
+        self.key = key
+        self.answer = answer
+        self.created_at = created_at
+
+class SemanticCache:
+    def __init__(
+        self,
+        embed: Callable[[str], List[float]],
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        index_version: Callable[[], str] = read_index_version,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize the cache.
+
+        embed turns a question into a vector (e.g. OpenAIEmbeddings.embed_query);
+        a stored answer is returned when the cosine similarity of the two
+        questions is at least threshold.
+        """
+        self.embed = embed
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.index_version = index_version
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._version = index_version()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # Unit vectors of the entries, one row per key in _keys
+        self._keys: List[str] = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embed(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        """Drop everything if the knowledge base was re-indexed since the last call"""
+        version = self.index_version()
+        if version != self._version:
+            self._version = version
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._keys = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+
+    def _remove(self, key: str):
+        index = self._keys.index(key)
+        del self._entries[key]
+        del self._keys[index]
+        self._matrix = np.delete(self._matrix, index, axis=0)
+
+    def _evict(self, now: float):
+        for key in [key for key, entry in self._entries.items() if now - entry.created_at >= self.ttl_seconds]:
+            self._remove(key)
+        # Entries are kept in access order, so the least recently used are at the front
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Return the cached answer for a question with the same meaning, if any"""
+        key = normalize_question(question)
+        if not key:
+            return None
+
+        with self._lock:
+            self._check_version()
+            self._evict(self.clock())
+            if not self._entries:
+                self.misses += 1
+                return None
+            entry = self._entries.get(key)
+
+        # Exact repeats skip the embedding call entirely
+        if entry is None:
+            vector = self._embed(key)
+            with self._lock:
+                if len(self._keys):
+                    scores = self._matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        entry = self._entries[self._keys[best]]
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if entry.key in self._entries:
+                self._entries.move_to_end(entry.key)
+            return entry.answer
+
+    def store(self, question: str, answer: str):
+        """Cache an answer for a question"""
+        key = normalize_question(question)
+        if not key:
+            return
+        vector = self._embed(key)
+
+        with self._lock:
+            self._check_version()
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(key, answer, self.clock())
+            self._keys.append(key)
+            self._matrix = vector[None, :] if not self._matrix.size else np.vstack([self._matrix, vector])
+            self._evict(self.clock())
+
+    def clear(self):
+        with self._lock:
+            self._clear()
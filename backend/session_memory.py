@@ -0,0 +1,88 @@
+"""
+Session-keyed conversation memory for Alexa - Member Support Agent
+Keeps a bounded chat history per session with LRU and idle TTL eviction
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from config.constants import MEMORY_MAX_TOKENS, MEMORY_MAX_SESSIONS, MEMORY_SESSION_TTL_SECONDS
+
+class _SessionHistory:
+    def __init__(self, now: float):
+        self.messages: List[BaseMessage] = []
+        self.last_access = now
+
+class SessionMemoryStore:
+    def __init__(
+        self,
+        token_counter: Callable[[List[BaseMessage]], int],
+        max_tokens: int = MEMORY_MAX_TOKENS,
+        max_sessions: int = MEMORY_MAX_SESSIONS,
+        ttl_seconds: float = MEMORY_SESSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Initialize the store.
+
+        token_counter measures a list of messages in model tokens; each
+        session's history is trimmed to max_tokens after every turn.
+        """
+        self.token_counter = token_counter
+        self.max_tokens = max_tokens
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._sessions: "OrderedDict[str, _SessionHistory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float):
+        """Drop idle sessions, then the least recently used ones over the cap"""
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session_id, history = next(iter(self._sessions.items()))
+            if now - history.last_access < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _touch(self, session_id: str, create: bool) -> Optional[_SessionHistory]:
+        now = self.clock()
+        self._evict(now)
+        history = self._sessions.get(session_id)
+        if history is None:
+            if not create:
+                return None
+            history = _SessionHistory(now)
+            self._sessions[session_id] = history
+            self._evict(now)
+        history.last_access = now
+        self._sessions.move_to_end(session_id)
+        return history
+
+    def get_history(self, session_id: str) -> List[BaseMessage]:
+        """Get a copy of the chat history for a session"""
+        with self._lock:
+            history = self._touch(session_id, create=False)
+            return list(history.messages) if history else []
+
+    def add_turn(self, session_id: str, user_message: str, ai_message: str):
+        """Append one exchange and trim the session to its token window"""
+        with self._lock:
+            history = self._touch(session_id, create=True)
+            history.messages.extend([HumanMessage(content=user_message), AIMessage(content=ai_message)])
+
+            # Drop whole exchanges from the front so the history never starts mid-turn
+            while len(history.messages) > 2 and self.token_counter(history.messages) > self.max_tokens:
+                del history.messages[:2]
+
+    def clear(self, session_id: str):
+        """Forget a session's history"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
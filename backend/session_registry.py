@@ -0,0 +1,167 @@
+"""
+Session registry for Alexa - Member Support Agent
+Maps chat session ids to conversation ids with an in-process LRU front
+over a backing store that every worker can share
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from config.constants import SESSION_REGISTRY_BACKEND, SESSION_REGISTRY_PATH, SESSION_CACHE_MAX_ENTRIES
+
+class MemorySessionStore:
+    """Process-local store; only suitable for a single worker"""
+
+    def __init__(self):
+        self._conversations = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[int]:
+        return self._conversations.get(session_id)
+
+    def get_or_create(self, session_id: str, create: Callable[[], int]) -> int:
+        conversation_id = self._conversations.get(session_id)
+        if conversation_id is None:
+            # create() is idempotent, so it runs outside the lock
+            conversation_id = create()
+            with self._lock:
+                conversation_id = self._conversations.setdefault(session_id, conversation_id)
+        return conversation_id
+
+class SQLiteSessionStore:
+    """SQLite file shared by all workers on a host and kept across restarts"""
+
+    def __init__(self, path: str = SESSION_REGISTRY_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_conversations ("
+            "session_id TEXT PRIMARY KEY, "
+            "conversation_id INTEGER NOT NULL, "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT conversation_id FROM session_conversations WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_or_create(self, session_id: str, create: Callable[[], int]) -> int:
+        conversation_id = self.get(session_id)
+        if conversation_id is not None:
+            return conversation_id
+        # create() is the idempotent get-or-create database call, so it runs
+        # without holding the write lock; if workers race, the first mapping
+        # written wins and every worker returns it
+        conversation_id = create()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR IGNORE INTO session_conversations (session_id, conversation_id) VALUES (?, ?)",
+            (session_id, conversation_id)
+        )
+        return self.get(session_id)
+
+class DatabaseSessionStore:
+    """Resolve sessions from the users/conversations tables themselves"""
+
+    def get(self, session_id: str) -> Optional[int]:
+        from database import UserCRUD, ConversationCRUD
+
+        user = UserCRUD.get_by_email(f"anonymous_{session_id}@demo.com")
+        if not user:
+            return None
+        conversation = ConversationCRUD.get_latest_by_user(user.id)
+        return conversation.id if conversation else None
+
+    def get_or_create(self, session_id: str, create: Callable[[], int]) -> int:
+        # create() is the atomic get-or-create database call, so a lookup first
+        # would only add a round trip
+        return create()
+
+def create_session_store(backend: str = SESSION_REGISTRY_BACKEND):
+    """Build the backing store selected in config"""
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend == "database":
+        return DatabaseSessionStore()
+    if backend == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown session registry backend: {backend}")
+
+class SessionRegistry:
+    def __init__(self, store=None, max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        """Initialize the registry with a bounded LRU cache in front of the store"""
+        self.store = store if store is not None else create_session_store()
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_get(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            conversation_id = self._cache.get(session_id)
+            if conversation_id is not None:
+                self._cache.move_to_end(session_id)
+            return conversation_id
+
+    def _cache_put(self, session_id: str, conversation_id: int):
+        with self._lock:
+            self._cache[session_id] = conversation_id
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[int]:
+        """Get the conversation for a session, or None if it has none yet"""
+        conversation_id = self._cache_get(session_id)
+        if conversation_id is None:
+            conversation_id = self.store.get(session_id)
+            if conversation_id is not None:
+                self._cache_put(session_id, conversation_id)
+        return conversation_id
+
+    def get_or_create(self, session_id: str, create: Callable[[], int]) -> int:
+        """Get the conversation for a session, calling create() only on a miss.
+
+        create() must be idempotent (the atomic get-or-create database call):
+        workers that miss at the same time may each call it.
+        """
+        conversation_id = self._cache_get(session_id)
+        if conversation_id is None:
+            conversation_id = self.store.get_or_create(session_id, create)
+            self._cache_put(session_id, conversation_id)
+        return conversation_id
+
+    async def aget_or_create(self, session_id: str, create: Callable[[], Awaitable[int]]) -> int:
+        """Async variant of get_or_create for an awaitable create().
+
+        The store is checked first, so a session another worker already
+        mapped costs no remote call; store I/O runs in a worker thread.
+        """
+        conversation_id = self._cache_get(session_id)
+        if conversation_id is not None:
+            return conversation_id
+        if isinstance(self.store, DatabaseSessionStore):
+            # create() is the lookup itself for this store
+            conversation_id = await create()
+        else:
+            conversation_id = await asyncio.to_thread(self.store.get, session_id)
+            if conversation_id is None:
+                created = await create()
+                conversation_id = await asyncio.to_thread(self.store.get_or_create, session_id, lambda: created)
+        self._cache_put(session_id, conversation_id)
+        return conversation_id
@@ -0,0 +1,253 @@
+"""
+Storage backends for the CRUD layer in database.py
+
+Each backend exposes the same small table interface (insert, select, update,
+delete, get_or_create_session) over plain dict rows:
+- SupabaseBackend talks to the hosted Supabase project
+- SQLiteBackend keeps the same schema in a local WAL-mode SQLite file, so the
+  agent can run, be benchmarked and be load-tested with no external service
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# (column, descending) pairs
+Order = List[Tuple[str, bool]]
+# (column, operator, value) filters with PostgREST operator names
+Conditions = List[Tuple[str, str, Any]]
+# (column, operator, last value, last id) from a keyset pagination cursor
+Keyset = Tuple[str, str, Any, int]
+
+def postgrest_keyset_filter(keyset: Keyset) -> str:
+    """Build the PostgREST or() body selecting rows after a (value, id) keyset"""
+    column, op, value, last_id = keyset
+    return f'{column}.{op}."{value}",and({column}.eq."{value}",id.{op}.{last_id})'
+
+class SupabaseBackend:
+    def __init__(self, url: str, key: str):
+        """Initialize the Supabase client"""
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    @staticmethod
+    def _apply_filters(query, filters: Optional[Dict[str, Any]]):
+        for column, value in (filters or {}).items():
+            query = query.eq(column, value)
+        return query
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        response = self.client.table(table).insert(rows).execute()
+        return response.data or []
+
+    def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order: Optional[Order] = None,
+        limit: Optional[int] = None,
+        conditions: Optional[Conditions] = None,
+        keyset: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        query = self._apply_filters(self.client.table(table).select(columns), filters)
+        for column, op, value in conditions or []:
+            query = query.filter(column, op, value)
+        if keyset:
+            query = query.or_(postgrest_keyset_filter(keyset))
+        for column, descending in order or []:
+            query = query.order(column, desc=descending)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execute().data or []
+
+    def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = self._apply_filters(self.client.table(table).update(data), filters).execute()
+        return response.data or []
+
+    def delete(self, table: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = self._apply_filters(self.client.table(table).delete(), filters).execute()
+        return response.data or []
+
+    def get_or_create_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        response = self.client.rpc("get_or_create_session_conversation", {"p_session_id": session_id}).execute()
+        return response.data[0] if response.data else None
+
+# SQLite translation of supabase/migrations; timestamps are ISO-8601 text
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER REFERENCES users(id),
+    started_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER REFERENCES conversations(id),
+    content TEXT NOT NULL,
+    sent_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS escalations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    issue_type TEXT NOT NULL CHECK (issue_type IN ('loan', 'card', 'account', 'fraud', 'refinance')),
+    original_request TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'notified', 'in_progress', 'resolved')),
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    resolved_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_escalations_conversation_id ON escalations(conversation_id);
+CREATE INDEX IF NOT EXISTS idx_escalations_status ON escalations(status);
+CREATE INDEX IF NOT EXISTS idx_escalations_issue_type ON escalations(issue_type);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_id_started_at ON conversations(user_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_started_at_id ON conversations(started_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_sent_at_id ON messages(sent_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_sent_at_id ON messages(conversation_id, sent_at, id);
+CREATE INDEX IF NOT EXISTS idx_escalations_created_at_id ON escalations(created_at, id);
+"""
+
+SQLITE_OPERATORS = {"eq": "=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def _identifier(name: str) -> str:
+    # Table and column names are interpolated into SQL, so only allow plain identifiers
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier: {name}")
+    return name
+
+class SQLiteBackend:
+    def __init__(self, path: str):
+        """Open (and create if needed) the SQLite database at path"""
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection().executescript(SQLITE_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _where(filters: Optional[Dict[str, Any]], conditions: Optional[Conditions] = None, keyset: Optional[Keyset] = None) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            clauses.append(f"{_identifier(column)} = ?")
+            params.append(value)
+        for column, op, value in conditions or []:
+            clauses.append(f"{_identifier(column)} {SQLITE_OPERATORS[op]} ?")
+            params.append(value)
+        if keyset:
+            column, op, value, last_id = keyset
+            column, op = _identifier(column), SQLITE_OPERATORS[op]
+            clauses.append(f"({column} {op} ? OR ({column} = ? AND id {op} ?))")
+            params.extend([value, value, last_id])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        conn = self._connection()
+        inserted = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                if row:
+                    columns = ", ".join(_identifier(column) for column in row)
+                    placeholders = ", ".join("?" for _ in row)
+                    values = f"({columns}) VALUES ({placeholders})"
+                else:
+                    values = "DEFAULT VALUES"
+                cursor = conn.execute(f"INSERT INTO {_identifier(table)} {values} RETURNING *", list(row.values()))
+                inserted.append(dict(cursor.fetchone()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return inserted
+
+    def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = "*",
+        order: Optional[Order] = None,
+        limit: Optional[int] = None,
+        conditions: Optional[Conditions] = None,
+        keyset: Optional[Keyset] = None
+    ) -> List[Dict[str, Any]]:
+        if columns != "*":
+            columns = ", ".join(_identifier(column.strip()) for column in columns.split(","))
+        where, params = self._where(filters, conditions, keyset)
+        sql = f"SELECT {columns} FROM {_identifier(table)}{where}"
+        if order:
+            sql += " ORDER BY " + ", ".join(f"{_identifier(column)} {'DESC' if descending else 'ASC'}" for column, descending in order)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._connection().execute(sql, params).fetchall()]
+
+    def update(self, table: str, filters: Dict[str, Any], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        assignments = ", ".join(f"{_identifier(column)} = ?" for column in data)
+        where, params = self._where(filters)
+        cursor = self._connection().execute(
+            f"UPDATE {_identifier(table)} SET {assignments}{where} RETURNING *",
+            list(data.values()) + params
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+    def delete(self, table: str, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        where, params = self._where(filters)
+        cursor = self._connection().execute(f"DELETE FROM {_identifier(table)}{where} RETURNING *", params)
+        return [dict(row) for row in cursor.fetchall()]
+
+    def get_or_create_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """SQLite equivalent of the get_or_create_session_conversation SQL function"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            user_id = conn.execute(
+                "INSERT INTO users (name, email) VALUES ('Anonymous', ?) "
+                "ON CONFLICT (email) DO UPDATE SET email = excluded.email RETURNING id",
+                (f"anonymous_{session_id}@demo.com",)
+            ).fetchone()[0]
+            row = conn.execute(
+                "SELECT id FROM conversations WHERE user_id = ? ORDER BY started_at DESC, id DESC LIMIT 1",
+                (user_id,)
+            ).fetchone()
+            if row:
+                conversation_id = row[0]
+            else:
+                conversation_id = conn.execute(
+                    "INSERT INTO conversations (user_id) VALUES (?) RETURNING id", (user_id,)
+                ).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {"user_id": user_id, "conversation_id": conversation_id}
+
+def create_storage_backend(backend: str, supabase_url: str = None, supabase_key: str = None, sqlite_path: str = None):
+    """Build the storage backend selected in config"""
+    if backend == "supabase":
+        return SupabaseBackend(supabase_url, supabase_key)
+    if backend == "sqlite":
+        return SQLiteBackend(sqlite_path)
+    raise ValueError(f"Unknown storage backend: {backend}")
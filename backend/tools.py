@@ -3,143 +3,318 @@ Tools for Alexa - Member Support Agent
 Implements send_notification, record_user_details, log_unknown_question, search_knowledge_base
 """
 
+import asyncio
 import json
 import os
+import threading
 from datetime import datetime
 from typing import Dict, Any, Optional, List
-from langchain_core.tools import tool
-from langchain.tools.retriever import create_retriever_tool
+from langchain_core.tools import tool, StructuredTool
 from pushover_alerts import push
 from document_pipeline import DocumentPipeline
+from context_compressor import ContextCompressor, find_boilerplate
+from semantic_cache import read_index_version
+from config.constants import CONTEXT_COMPRESSION
 
-# Initialize document pipeline for retriever tool
-_document_pipeline = DocumentPipeline()
-
-# Check if vector database needs to be populated
-try:
-    _retriever = _document_pipeline.get_retriever()
-    # Test if the vector database has documents by checking the vectorstore directly
-    vectorstore = _document_pipeline.vectorstore
-    if not vectorstore:
-        # Try to load existing vectorstore
-        from langchain_openai import OpenAIEmbeddings
-        from langchain_chroma import Chroma
-        embeddings = OpenAIEmbeddings()
-        vectorstore = Chroma(persist_directory=_document_pipeline.db_name, embedding_function=embeddings)
-        _document_pipeline.vectorstore = vectorstore
-    
-    # Check if vectorstore has documents
-    doc_count = vectorstore._collection.count() if vectorstore else 0
-    if doc_count == 0:
-        print("Vector database is empty, processing documents...")
+# The retriever is built on first use (or by the startup warm-up), never at
+# import time, so importing this module stays fast
+_document_pipeline = None
+_retriever = None
+_retriever_error = None
+_retriever_lock = threading.Lock()
+_compressor = None
+_compressor_version = None
+# Write-behind queue for chat messages, set by ChatChain
+_message_writer = None
+
+def _build_retriever():
+    """Open the vector database, ingesting the documents first if it is empty"""
+    global _document_pipeline
+    _document_pipeline = DocumentPipeline()
+    try:
+        # Check if the index has documents
+        doc_count = _document_pipeline.indexed_count()
+        retriever = _document_pipeline.get_retriever()
+        if doc_count == 0:
+            print("Vector database is empty, processing documents...")
+            _document_pipeline.process_documents()
+            retriever = _document_pipeline.get_retriever()
+        else:
+            print(f"Vector database loaded with {doc_count} documents")
+        return retriever
+        
+    except Exception as e:
+        print(f"Vector database not found or empty, processing documents: {e}")
         _document_pipeline.process_documents()
-        _retriever = _document_pipeline.get_retriever()
-    else:
-        print(f"Vector database loaded with {doc_count} documents")
-        
-except Exception as e:
-    print(f"Vector database not found or empty, processing documents: {e}")
-    _document_pipeline.process_documents()
-    _retriever = _document_pipeline.get_retriever()
-
-# Create retriever tool using LangChain's create_retriever_tool
-search_knowledge_base = create_retriever_tool(
-    retriever=_retriever,
-    name="search_knowledge_base",
-    description="Search the credit union knowledge base for relevant information. Use this to find answers about credit union services."
+        return _document_pipeline.get_retriever()
+
+def get_retriever():
+    """Get the shared knowledge base retriever, building it on first call"""
+    global _retriever, _retriever_error
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                try:
+                    _retriever = _build_retriever()
+                    _retriever_error = None
+                except Exception as e:
+                    # Leave it unset so the next call tries again
+                    _retriever_error = str(e)
+                    raise
+    return _retriever
+
+def retriever_status() -> Dict[str, Any]:
+    """Readiness of the knowledge base retriever for health checks"""
+    if _retriever is not None:
+        return {"ready": True}
+    return {"ready": False, "error": _retriever_error}
+
+def get_compressor() -> Optional[ContextCompressor]:
+    """Get the shared context compressor, or None if compression is disabled.
+
+    Headers and footers are learned from the indexed chunks, so the compressor
+    is rebuilt whenever the knowledge base is re-indexed. It is only kept once
+    there are chunks to learn from.
+    """
+    global _compressor, _compressor_version
+    if not CONTEXT_COMPRESSION:
+        return None
+    version = read_index_version()
+    if _compressor is not None and _compressor_version == version:
+        return _compressor
+    get_retriever()
+    with _retriever_lock:
+        if _compressor is not None and _compressor_version == version:
+            return _compressor
+        lexical_index = _document_pipeline.lexical_index if _document_pipeline else None
+        if lexical_index is not None:
+            # Another worker may have re-indexed since this one loaded the chunks
+            lexical_index.refresh()
+        chunks = lexical_index.docs.values() if lexical_index is not None else []
+        compressor = ContextCompressor(boilerplate=find_boilerplate(text for text, _ in chunks))
+        if chunks:
+            _compressor, _compressor_version = compressor, version
+        return compressor
+
+def _format_results(query: str, docs: List[Any]) -> str:
+    """Retrieved chunks as tool output, compressed to the context token budget"""
+    compressor = get_compressor()
+    if compressor is None:
+        return "\n\n".join(doc.page_content for doc in docs)
+    context, stats = compressor.compress(query, docs)
+    print(f"📉 CONTEXT: {stats['tokens_in']} → {stats['tokens_out']} tokens ({stats['tokens_saved']} saved)")
+    return context
+
+def search_context(query: str) -> str:
+    """Knowledge base results for a query, as the search tool returns them"""
+    docs = get_retriever().invoke(query)
+    return _format_results(query, docs)
+
+async def asearch_context(query: str) -> str:
+    """Async variant of search_context"""
+    # The first call may build the index, keep that off the event loop
+    retriever = await asyncio.to_thread(get_retriever)
+    docs = await retriever.ainvoke(query)
+    return _format_results(query, docs)
+
+def _search_knowledge_base(query: str) -> str:
+    """Search the credit union knowledge base for relevant information. Use this to find answers about credit union services."""
+    return search_context(query)
+
+async def _asearch_knowledge_base(query: str) -> str:
+    """Search the credit union knowledge base for relevant information. Use this to find answers about credit union services."""
+    return await asearch_context(query)
+
+search_knowledge_base = StructuredTool.from_function(
+    func=_search_knowledge_base,
+    coroutine=_asearch_knowledge_base,
+    name="search_knowledge_base"
 )
 
-@tool
-def send_notification(original_request: str, issue_type: str, session_id: str = "", contact_name: str = "", contact_email: str = "", contact_phone: str = "") -> Dict[str, Any]:
+VALID_ISSUE_TYPES = ["loan", "card", "account", "fraud", "refinance"]
+
+# Number of recent messages included in an escalation notification
+ESCALATION_CONTEXT_MESSAGES = 5
+
+def _validate_notification(issue_type: str, session_id: str, contact_name: str, contact_email: str) -> Optional[Dict[str, Any]]:
+    """Return an error result if the escalation request is incomplete"""
+    if issue_type not in VALID_ISSUE_TYPES:
+        return {"status": "error", "message": f"Invalid issue_type. Must be one of: {VALID_ISSUE_TYPES}"}
+    
+    # Check if session_id is provided
+    if not session_id:
+        return {"status": "error", "message": "Session ID is required for escalation notification"}
+    
+    # Check if contact information is provided
+    if not contact_name or not contact_email:
+        return {"status": "error", "message": "Contact information (name and email) is required. Please call record_user_details first to capture user details."}
+    return None
+
+def _build_notification(original_request: str, issue_type: str, contact_name: str, contact_email: str, contact_phone: str, conversation_context: str, escalation_id: Optional[int]):
+    """Build the Pushover message and title for an escalation"""
+    # Create contact_info dictionary from individual parameters
+    contact_info = {
+        "name": contact_name,
+        "email": contact_email,
+        "phone": contact_phone
+    }
+    
+    # Create enhanced notification message with context
+    message = f"ESCALATION: {issue_type.upper()}\nRequest: {original_request}\nContact: {contact_info}"
+    if conversation_context:
+        message += f"\n\nConversation Context:\n{conversation_context}"
+    if escalation_id:
+        message += f"\n\nEscalation ID: {escalation_id}"
+        
+    title = f"Member Support - {issue_type.title()} Issue"
+    return message, title
+
+def _notification_result(push_success: bool, issue_type: str, escalation_id: Optional[int]) -> Dict[str, Any]:
+    if push_success:
+        result = {"status": "success", "message": f"Notification sent for {issue_type} issue", "escalation_id": escalation_id}
+        print(f"DEBUG: send_notification success - escalation {escalation_id}")
+        return result
+    result = {"status": "error", "message": f"Failed to send Pushover notification for {issue_type} issue"}
+    print(f"DEBUG: send_notification failed")
+    return result
+
+def set_message_writer(writer):
+    """Use writer's queue as the pending messages escalations wait for"""
+    global _message_writer
+    _message_writer = writer
+
+def _flush_pending_messages():
+    """Write queued chat messages so an escalation's context includes the current turn"""
+    if _message_writer is not None:
+        _message_writer.flush()
+
+def _session_email(session_id: str) -> str:
+    """Email of the anonymous user created for a chat session"""
+    return f"anonymous_{session_id}@demo.com"
+
+def _escalation_for(conversation_id: int, issue_type: str, original_request: str):
+    """Escalation record to create for a notification"""
+    from database import EscalationCreate
+    return EscalationCreate(conversation_id=conversation_id, issue_type=issue_type, original_request=original_request)
+
+def _notification_error(e: Exception) -> Dict[str, Any]:
+    print(f"DEBUG: send_notification error: {str(e)}")
+    return {"status": "error", "message": f"Failed to send notification: {str(e)}"}
+
+def _send_notification(original_request: str, issue_type: str, session_id: str = "", contact_name: str = "", contact_email: str = "", contact_phone: str = "") -> Dict[str, Any]:
     """Send notification for escalation with conversation context. Use when user needs escalation for loan, card, account, fraud, or refinance issues. ONLY call this AFTER record_user_details has been successfully executed."""
     print(f"DEBUG: send_notification called with issue_type='{issue_type}', session_id='{session_id}', contact_name='{contact_name}', contact_email='{contact_email}'")
     try:
-        # Validate issue_type
-        valid_types = ["loan", "card", "account", "fraud", "refinance"]
-        if issue_type not in valid_types:
-            return {"status": "error", "message": f"Invalid issue_type. Must be one of: {valid_types}"}
-        
-        # Check if session_id is provided
-        if not session_id:
-            return {"status": "error", "message": "Session ID is required for escalation notification"}
-        
-        # Check if contact information is provided
-        if not contact_name or not contact_email:
-            return {"status": "error", "message": "Contact information (name and email) is required. Please call record_user_details first to capture user details."}
+        error = _validate_notification(issue_type, session_id, contact_name, contact_email)
+        if error:
+            return error
         
         # Import database models
-        from database import EscalationCRUD, EscalationCreate, ConversationCRUD, UserCRUD
+        from database import EscalationCRUD, EscalationUpdate, ConversationCRUD, UserCRUD, MessageCRUD
         
         # Get conversation context if session_id provided
         conversation_context = ""
         escalation_id = None
         
-        if session_id:
-            # Find the user for this session
-            anonymous_email = f"anonymous_{session_id}@demo.com"
-            user = UserCRUD.get_by_email(anonymous_email)
-            
-            if not user:
-                return {"status": "error", "message": "No user found for this session. Please call record_user_details first."}
-            
-            # Get user's conversations
-            conversations = ConversationCRUD.get_by_user(user.id)
-            if conversations:
-                latest_conversation = conversations[-1]  # Most recent conversation
-                
-                # Create escalation record
-                escalation = EscalationCRUD.create(EscalationCreate(
-                    conversation_id=latest_conversation.id,
-                    issue_type=issue_type,
-                    original_request=original_request
-                ))
-                escalation_id = escalation.id
-                
-                # Get conversation messages for context
-                from database import MessageCRUD
-                messages = MessageCRUD.get_by_conversation(latest_conversation.id)
-                if messages:
-                    conversation_context = "\n".join([f"{msg.content}" for msg in messages[-5:]])  # Last 5 messages
-        
-        # Create contact_info dictionary from individual parameters
-        contact_info = {
-            "name": contact_name,
-            "email": contact_email,
-            "phone": contact_phone
-        }
+        # Find the user for this session
+        user = UserCRUD.get_by_email(_session_email(session_id))
+        if not user:
+            return {"status": "error", "message": "No user found for this session. Please call record_user_details first."}
+        
+        # Only the latest conversation and its last few messages are fetched
+        latest_conversation = ConversationCRUD.get_latest_by_user(user.id)
+        if latest_conversation:
+            escalation_id = EscalationCRUD.create(_escalation_for(latest_conversation.id, issue_type, original_request)).id
+            _flush_pending_messages()
+            recent_messages = MessageCRUD.get_recent_contents(latest_conversation.id, limit=ESCALATION_CONTEXT_MESSAGES)
+            conversation_context = "\n".join(recent_messages)
         
-        # Create enhanced notification message with context
-        message = f"ESCALATION: {issue_type.upper()}\nRequest: {original_request}\nContact: {contact_info}"
-        if conversation_context:
-            message += f"\n\nConversation Context:\n{conversation_context}"
-        if escalation_id:
-            message += f"\n\nEscalation ID: {escalation_id}"
-            
-        title = f"Member Support - {issue_type.title()} Issue"
+        message, title = _build_notification(original_request, issue_type, contact_name, contact_email, contact_phone, conversation_context, escalation_id)
         
         # Send Pushover notification
         push_success = push(message, title)
         
         # Update escalation record with notification status
         if escalation_id and push_success:
-            EscalationCRUD.update(escalation_id, {"status": "notified"})
+            EscalationCRUD.update(escalation_id, EscalationUpdate(status="notified"))
         
-        if push_success:
-            result = {"status": "success", "message": f"Notification sent for {issue_type} issue", "escalation_id": escalation_id}
-            print(f"DEBUG: send_notification success - escalation {escalation_id}")
-            return result
-        else:
-            result = {"status": "error", "message": f"Failed to send Pushover notification for {issue_type} issue"}
-            print(f"DEBUG: send_notification failed")
-            return result
+        return _notification_result(push_success, issue_type, escalation_id)
         
     except Exception as e:
-        result = {"status": "error", "message": f"Failed to send notification: {str(e)}"}
-        print(f"DEBUG: send_notification error: {str(e)}")
-        return result
+        return _notification_error(e)
 
-@tool
-def record_user_details(name: str = "", email: str = "", phone: str = "", notes: str = "", session_id: str = "") -> Dict[str, Any]:
+async def _asend_notification(original_request: str, issue_type: str, session_id: str = "", contact_name: str = "", contact_email: str = "", contact_phone: str = "") -> Dict[str, Any]:
+    """Async variant of send_notification using the pooled async database client"""
+    print(f"DEBUG: send_notification (async) called with issue_type='{issue_type}', session_id='{session_id}', contact_name='{contact_name}', contact_email='{contact_email}'")
+    try:
+        error = _validate_notification(issue_type, session_id, contact_name, contact_email)
+        if error:
+            return error
+        
+        from database import EscalationUpdate
+        from async_database import AsyncEscalationCRUD, AsyncConversationCRUD, AsyncUserCRUD, AsyncMessageCRUD
+        
+        conversation_context = ""
+        escalation_id = None
+        
+        user = await AsyncUserCRUD.get_by_email(_session_email(session_id))
+        if not user:
+            return {"status": "error", "message": "No user found for this session. Please call record_user_details first."}
+        
+        latest_conversation = await AsyncConversationCRUD.get_latest_by_user(user.id)
+        if latest_conversation:
+            await asyncio.to_thread(_flush_pending_messages)
+            # The escalation insert and the context fetch are independent, run them together
+            escalation, recent_messages = await asyncio.gather(
+                AsyncEscalationCRUD.create(_escalation_for(latest_conversation.id, issue_type, original_request)),
+                AsyncMessageCRUD.get_recent_contents(latest_conversation.id, limit=ESCALATION_CONTEXT_MESSAGES)
+            )
+            escalation_id = escalation.id
+            conversation_context = "\n".join(recent_messages)
+        
+        message, title = _build_notification(original_request, issue_type, contact_name, contact_email, contact_phone, conversation_context, escalation_id)
+        
+        # Pushover uses a blocking HTTP client, keep it off the event loop
+        push_success = await asyncio.to_thread(push, message, title)
+        
+        if escalation_id and push_success:
+            await AsyncEscalationCRUD.update(escalation_id, EscalationUpdate(status="notified"))
+        
+        return _notification_result(push_success, issue_type, escalation_id)
+        
+    except Exception as e:
+        return _notification_error(e)
+
+send_notification = StructuredTool.from_function(
+    func=_send_notification,
+    coroutine=_asend_notification,
+    name="send_notification"
+)
+
+def _user_update(name: str):
+    """Update for the session's user (keep email for session lookup)"""
+    from database import UserUpdate
+    update_data = {}
+    if name:
+        update_data["name"] = name
+    return UserUpdate(**update_data)
+
+def _user_details_result(updated_user, name: str, email: str, phone: str) -> Dict[str, Any]:
+    if not updated_user:
+        return {"status": "error", "message": "Failed to update user details"}
+    
+    # Store contact info for escalation (email and phone will be passed to send_notification)
+    print(f"DEBUG: Contact info stored - Name: {name}, Email: {email}, Phone: {phone}")
+    
+    result = {"status": "success", "message": f"User details updated successfully for {updated_user.name}"}
+    print(f"DEBUG: record_user_details success - updated user {updated_user.id}")
+    return result
+
+def _user_details_error(e: Exception) -> Dict[str, Any]:
+    print(f"DEBUG: record_user_details error: {str(e)}")
+    return {"status": "error", "message": f"Failed to record user details: {str(e)}"}
+
+def _record_user_details(name: str = "", email: str = "", phone: str = "", notes: str = "", session_id: str = "") -> Dict[str, Any]:
     """Record user contact information for follow-up. Updates anonymous user with real details. Use when user provides any contact information."""
     print(f"DEBUG: record_user_details called with name='{name}', email='{email}', phone='{phone}', session_id='{session_id}'")
     try:
@@ -147,42 +322,41 @@ def record_user_details(name: str = "", email: str = "", phone: str = "", notes:
             return {"status": "error", "message": "Session ID is required to update user details"}
         
         # Import database models
-        from database import UserCRUD, UserUpdate
+        from database import UserCRUD
         
         # Find the anonymous user for this session
-        anonymous_email = f"anonymous_{session_id}@demo.com"
-        user = UserCRUD.get_by_email(anonymous_email)
-        
+        user = UserCRUD.get_by_email(_session_email(session_id))
         if not user:
             return {"status": "error", "message": "No user found for this session"}
         
-        # Update user with real details
-        update_data = {}
-        if name:
-            update_data["name"] = name
-        # Update user with real details (keep email for session lookup)
-        update_data = {}
-        if name:
-            update_data["name"] = name
+        return _user_details_result(UserCRUD.update(user.id, _user_update(name)), name, email, phone)
         
-        # Create UserUpdate model with the data
-        user_update = UserUpdate(**update_data)
-        updated_user = UserCRUD.update(user.id, user_update)
+    except Exception as e:
+        return _user_details_error(e)
+
+async def _arecord_user_details(name: str = "", email: str = "", phone: str = "", notes: str = "", session_id: str = "") -> Dict[str, Any]:
+    """Async variant of record_user_details using the pooled async database client"""
+    print(f"DEBUG: record_user_details (async) called with name='{name}', email='{email}', phone='{phone}', session_id='{session_id}'")
+    try:
+        if not session_id:
+            return {"status": "error", "message": "Session ID is required to update user details"}
         
-        if not updated_user:
-            return {"status": "error", "message": "Failed to update user details"}
+        from async_database import AsyncUserCRUD
         
-        # Store contact info for escalation (email and phone will be passed to send_notification)
-        print(f"DEBUG: Contact info stored - Name: {name}, Email: {email}, Phone: {phone}")
+        user = await AsyncUserCRUD.get_by_email(_session_email(session_id))
+        if not user:
+            return {"status": "error", "message": "No user found for this session"}
         
-        result = {"status": "success", "message": f"User details updated successfully for {updated_user.name}"}
-        print(f"DEBUG: record_user_details success - updated user {updated_user.id}")
-        return result
+        return _user_details_result(await AsyncUserCRUD.update(user.id, _user_update(name)), name, email, phone)
         
     except Exception as e:
-        result = {"status": "error", "message": f"Failed to record user details: {str(e)}"}
-        print(f"DEBUG: record_user_details error: {str(e)}")
-        return result
+        return _user_details_error(e)
+
+record_user_details = StructuredTool.from_function(
+    func=_record_user_details,
+    coroutine=_arecord_user_details,
+    name="record_user_details"
+)
 
 @tool
 def log_unknown_question(question: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
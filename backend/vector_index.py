@@ -0,0 +1,311 @@
+"""
+NumPy vector index for Alexa - Member Support Agent
+Keeps chunk embeddings as one contiguous float32 matrix in a memory-mapped
+.npy file, so every worker process shares a single page-cached copy and a
+query is one matrix-vector product. IVFVectorIndex adds inverted-file
+partitioning so large indexes only scan the partitions nearest the query.
+"""
+
+import json
+import math
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from config.constants import (
+    VECTOR_INDEX_DIR, IVF_NLIST, IVF_NPROBE, IVF_MIN_TRAIN_SIZE, IVF_RETRAIN_GROWTH,
+    IVF_TRAIN_ITERATIONS, IVF_TRAIN_SAMPLES_PER_LIST
+)
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if k < len(scores):
+        # argpartition finds the top k in linear time; only those are sorted
+        top = np.argpartition(-scores, k)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+class VectorIndex:
+    def __init__(self, path: str = VECTOR_INDEX_DIR, embedding_function: Optional[Embeddings] = None):
+        """Initialize an empty index stored in the directory path.
+
+        The directory holds vectors-<version>.npy (unit-length rows) and
+        chunks.json, which names the current vectors file and lists the id,
+        text and metadata of each row.
+        """
+        self.path = path
+        self.embedding_function = embedding_function
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self._rows: Dict[str, int] = {}
+        self._mtime: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def _chunks_path(self) -> str:
+        return os.path.join(self.path, "chunks.json")
+
+    @classmethod
+    def load(cls, path: str = VECTOR_INDEX_DIR, embedding_function: Optional[Embeddings] = None) -> "VectorIndex":
+        """Open the persisted index (memory-mapped), or an empty one if there is none"""
+        index = cls(path, embedding_function)
+        index.refresh()
+        return index
+
+    def refresh(self):
+        """Reopen the index if another process saved a new version since the last load"""
+        try:
+            mtime = os.path.getmtime(self._chunks_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self._chunks_path) as f:
+            data = json.load(f)
+        self.ids, self.texts, self.metadatas = data["ids"], data["texts"], data["metadatas"]
+        self._read_arrays(data)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._mtime = mtime
+
+    def _read_arrays(self, data: Dict[str, Any]):
+        self.matrix = np.load(os.path.join(self.path, data["vectors"]), mmap_mode="r") if self.ids else np.empty((0, 0), dtype=np.float32)
+
+    def _write_arrays(self, version: str) -> Dict[str, str]:
+        """Write this version's array files; returns them by chunks.json key"""
+        vectors_file = f"vectors-{version}.npy"
+        np.save(os.path.join(self.path, vectors_file), np.ascontiguousarray(self.matrix, dtype=np.float32))
+        return {"vectors": vectors_file}
+
+    def save(self):
+        """Write a new vectors file, then switch chunks.json to it.
+
+        Readers that still have the old file mapped keep a valid view until
+        they refresh, so saving never disturbs queries in other processes.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        previous = self._current_array_files()
+        files = self._write_arrays(uuid.uuid4().hex)
+
+        tmp_path = f"{self._chunks_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({**files, "ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+        os.replace(tmp_path, self._chunks_path)
+        self._mtime = os.path.getmtime(self._chunks_path)
+
+        for name in previous - set(files.values()):
+            os.remove(os.path.join(self.path, name))
+
+    def _current_array_files(self) -> set:
+        try:
+            with open(self._chunks_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        return {value for key, value in data.items() if key in ("vectors", "ivf")}
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], vectors: List[List[float]]):
+        """Add rows, replacing any with the same id"""
+        self.delete([chunk_id for chunk_id in ids if chunk_id in self._rows])
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.matrix = vectors if not len(self.ids) else np.vstack([self.matrix, vectors])
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self._rows[chunk_id] = len(self.ids)
+            self.ids.append(chunk_id)
+            self.texts.append(text)
+            self.metadatas.append(metadata or {})
+
+    def delete(self, ids: List[str]):
+        rows = sorted(self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows)
+        if not rows:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self._keep_rows(keep)
+
+    def _keep_rows(self, keep: np.ndarray):
+        """Drop the rows where keep is False"""
+        self.matrix = self.matrix[keep]
+        self.ids = [value for value, kept in zip(self.ids, keep) if kept]
+        self.texts = [value for value, kept in zip(self.texts, keep) if kept]
+        self.metadatas = [value for value, kept in zip(self.metadatas, keep) if kept]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def clear(self):
+        self.ids, self.texts, self.metadatas = [], [], []
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self._rows = {}
+
+    def search(self, vector: List[float], k: int) -> List[Tuple[int, float]]:
+        """Top k (row, cosine similarity) pairs, best first"""
+        if not len(self.ids):
+            return []
+        scores = self.matrix @ _normalize(np.asarray(vector, dtype=np.float32))
+        return [(int(row), float(scores[row])) for row in _top_k(scores, k)]
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=self.metadatas[row])
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        """Embed the query and return the k most similar chunks (same call as a LangChain vectorstore)"""
+        self.refresh()
+        return [self.document(row) for row, _ in self.search(self.embedding_function.embed_query(query), k)]
+
+class IVFVectorIndex(VectorIndex):
+    """Approximate index: rows are partitioned into nlist clusters (spherical
+    k-means) and a query only scores the rows of its nprobe nearest clusters,
+    so query cost grows with about sqrt(n) instead of n.
+
+    nprobe trades speed for recall; nprobe == nlist is an exact search. Until
+    the index holds min_train_size rows it is searched exactly. New rows are
+    assigned to the nearest existing cluster, and the clusters are retrained
+    on save once the index has grown retrain_growth times since training.
+    """
+
+    def __init__(
+        self,
+        path: str = VECTOR_INDEX_DIR,
+        embedding_function: Optional[Embeddings] = None,
+        nlist: int = IVF_NLIST,
+        nprobe: int = IVF_NPROBE,
+        min_train_size: int = IVF_MIN_TRAIN_SIZE,
+        retrain_growth: float = IVF_RETRAIN_GROWTH
+    ):
+        super().__init__(path, embedding_function)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self._untrain()
+
+    def _untrain(self):
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+        self._lists = None
+
+    def _read_arrays(self, data: Dict[str, Any]):
+        super()._read_arrays(data)
+        self._untrain()
+        if data.get("ivf"):
+            with np.load(os.path.join(self.path, data["ivf"])) as arrays:
+                self.centroids = arrays["centroids"]
+                self.assignments = arrays["assignments"]
+                self.trained_size = int(arrays["trained_size"])
+
+    def _write_arrays(self, version: str) -> Dict[str, str]:
+        files = super()._write_arrays(version)
+        if self.centroids is not None:
+            files["ivf"] = f"ivf-{version}.npz"
+            np.savez(
+                os.path.join(self.path, files["ivf"]),
+                centroids=self.centroids, assignments=self.assignments, trained_size=np.array(self.trained_size)
+            )
+        return files
+
+    def save(self):
+        """Train or retrain the clusters if needed, then persist"""
+        if len(self) >= self.min_train_size and (self.centroids is None or len(self) > self.trained_size * self.retrain_growth):
+            self.train()
+        super().save()
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+        """Nearest centroid of each vector, computed in batches to bound memory"""
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            labels[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+        return labels
+
+    def train(self, seed: int = 0):
+        """Cluster the rows with spherical k-means on a sample, then assign every row"""
+        rng = np.random.default_rng(seed)
+        nlist = min(self.nlist or max(1, int(4 * math.sqrt(len(self)))), len(self))
+        sample_size = min(len(self), nlist * IVF_TRAIN_SAMPLES_PER_LIST)
+        sample = np.asarray(self.matrix[np.sort(rng.choice(len(self), sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            # Reseed empty clusters with random sample points
+            empty = np.bincount(labels, minlength=nlist) == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = self._assign(self.matrix, self.centroids)
+        self.trained_size = len(self)
+        self._lists = None
+        print(f"IVF index trained: {len(self)} vectors in {nlist} lists")
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]], vectors: List[List[float]]):
+        super().upsert(ids, texts, metadatas, vectors)
+        if self.centroids is not None and ids:
+            # New rows are appended, so assign just the tail
+            self.assignments = np.concatenate([self.assignments, self._assign(self.matrix[-len(ids):], self.centroids)])
+            self._lists = None
+
+    def _keep_rows(self, keep: np.ndarray):
+        super()._keep_rows(keep)
+        if self.centroids is not None:
+            self.assignments = self.assignments[keep]
+            self._lists = None
+
+    def clear(self):
+        super().clear()
+        self._untrain()
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by cluster: rows order[bounds[c]:bounds[c + 1]] belong to cluster c"""
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, bounds)
+        return self._lists
+
+    def search(self, vector: List[float], k: int) -> List[Tuple[int, float]]:
+        if self.centroids is None:
+            return super().search(vector, k)
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        order, bounds = self._inverted_lists()
+        probe = _top_k(self.centroids @ query, self.nprobe)
+        rows = np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probe]))
+        if not len(rows):
+            return []
+        # Only the probed rows are read from the memory-mapped matrix
+        scores = self.matrix[rows] @ query
+        return [(int(rows[i]), float(scores[i])) for i in _top_k(scores, k)]
+
+def load_vector_index(engine: str, embedding_function: Optional[Embeddings] = None) -> Optional[VectorIndex]:
+    """Open the index for VECTOR_ENGINE; None means queries go to Chroma"""
+    if engine == "chroma":
+        return None
+    if engine == "numpy":
+        return VectorIndex.load(embedding_function=embedding_function)
+    if engine == "ivf":
+        return IVFVectorIndex.load(embedding_function=embedding_function)
+    raise ValueError(f"Unknown vector engine: {engine}")
+
+class VectorIndexRetriever(BaseRetriever):
+    """Similarity search over a VectorIndex"""
+
+    index: Any
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.index.similarity_search(query, k=self.k)
@@ -0,0 +1,37 @@
+-- Get or create the anonymous user and conversation for a chat session in one call
+CREATE OR REPLACE FUNCTION get_or_create_session_conversation(p_session_id TEXT)
+RETURNS TABLE (user_id INTEGER, conversation_id INTEGER)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_user_id INTEGER;
+    v_conversation_id INTEGER;
+BEGIN
+    -- The no-op update makes RETURNING yield the existing row and locks it,
+    -- so concurrent calls for the same session are serialized here
+    INSERT INTO users (name, email)
+    VALUES ('Anonymous', 'anonymous_' || p_session_id || '@demo.com')
+    ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
+    RETURNING id INTO v_user_id;
+
+    SELECT c.id INTO v_conversation_id
+    FROM conversations c
+    WHERE c.user_id = v_user_id
+    ORDER BY c.started_at DESC, c.id DESC
+    LIMIT 1;
+
+    IF v_conversation_id IS NULL THEN
+        INSERT INTO conversations (user_id)
+        VALUES (v_user_id)
+        RETURNING id INTO v_conversation_id;
+    END IF;
+
+    RETURN QUERY SELECT v_user_id, v_conversation_id;
+END;
+$$;
+
+-- Speeds up the latest-conversation lookup above
+CREATE INDEX IF NOT EXISTS idx_conversations_user_id_started_at ON conversations(user_id, started_at DESC);
+
+COMMENT ON FUNCTION get_or_create_session_conversation(TEXT) IS 'Returns the anonymous user and latest conversation for a chat session, creating them if needed';
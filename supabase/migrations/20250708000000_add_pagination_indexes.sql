@@ -0,0 +1,5 @@
+-- Indexes backing keyset pagination on (timestamp, id) and per-parent listings
+CREATE INDEX IF NOT EXISTS idx_conversations_started_at_id ON conversations(started_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_sent_at_id ON messages(sent_at, id);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_sent_at_id ON messages(conversation_id, sent_at, id);
+CREATE INDEX IF NOT EXISTS idx_escalations_created_at_id ON escalations(created_at, id);
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from langchain_core.documents import Document
+from bm25_index import BM25Index, HybridRetriever, tokenize
+
+CHUNKS = {
+    "fees": "Overdraft fee is $25. Courtesy Pay covers overdrafts up to $500.",
+    "phone": "For help call member services at 1-888-HBCU-HELP, available 24/7.",
+    "loans": "Auto loan rates start at 5.9% APR for qualified members.",
+}
+
+def build(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25_index.json"))
+    index.add(list(CHUNKS), [Document(page_content=text, metadata={"id": chunk_id}) for chunk_id, text in CHUNKS.items()])
+    return index
+
+def test_tokenize_keeps_exact_terms():
+    tokens = tokenize("Call 1-888-HBCU-HELP now")
+    assert "1-888-hbcu-help" in tokens
+    assert "hbcu" in tokens
+
+def test_exact_terms_rank_first(tmp_path):
+    index = build(tmp_path)
+    assert index.search("what is the 1-888-HBCU-HELP number")[0][0] == "phone"
+    assert index.search("courtesy pay")[0][0] == "fees"
+    assert index.search("mortgage") == []
+
+def test_delete_and_replace(tmp_path):
+    index = build(tmp_path)
+    index.delete(["phone"])
+    assert all(chunk_id != "phone" for chunk_id, _ in index.search("member services"))
+    index.add(["loans"], [Document(page_content="Boat loans available")])
+    assert index.search("auto") == []
+    assert len(index) == 2
+
+def test_persisted_and_reloaded(tmp_path):
+    build(tmp_path).save()
+    loaded = BM25Index.load(str(tmp_path / "bm25_index.json"))
+    assert loaded.search("overdraft")[0][0] == "fees"
+    assert loaded.document("fees").metadata == {"id": "fees"}
+
+class FakeVectorStore:
+    def __init__(self, results):
+        self.results = results
+
+    def similarity_search(self, query, k):
+        return [Document(page_content=CHUNKS[chunk_id]) for chunk_id in self.results][:k]
+
+def test_hybrid_fuses_both_rankings(tmp_path):
+    # Vector search misses the exact phone number; BM25 finds it
+    retriever = HybridRetriever(vectorstore=FakeVectorStore(["loans", "fees"]), lexical_index=build(tmp_path), k=2)
+    docs = retriever.invoke("1-888-HBCU-HELP")
+    assert CHUNKS["phone"] in [doc.page_content for doc in docs]
@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+import chat_chain
+from chat_chain import ChatChain
+from session_registry import SessionRegistry, MemorySessionStore
+from response_templates import get_thanks_response
+
+class FakeLLM:
+    def __init__(self, **kwargs):
+        pass
+
+    def bind_tools(self, tools):
+        return self
+
+    def get_num_tokens_from_messages(self, messages):
+        return len(messages)
+
+class FakeExecutor:
+    """Records each turn's input instead of calling the model"""
+
+    def __init__(self, agent, tools, **kwargs):
+        self.prompt = agent
+        self.tools = tools
+        self.inputs = []
+
+    def invoke(self, agent_input):
+        self.inputs.append(agent_input)
+        return {"output": "From the knowledge base", "intermediate_steps": []}
+
+class FakeMessageWriter:
+    def start(self):
+        pass
+
+@pytest.fixture
+def make_chain(monkeypatch):
+    monkeypatch.setattr(chat_chain, "ChatOpenAI", FakeLLM)
+    monkeypatch.setattr(chat_chain, "create_tool_calling_agent", lambda llm, tools, prompt: prompt)
+    monkeypatch.setattr(chat_chain, "AgentExecutor", FakeExecutor)
+    monkeypatch.setattr(chat_chain, "MessageWriter", FakeMessageWriter)
+    monkeypatch.setattr(chat_chain, "SessionRegistry", lambda: SessionRegistry(MemorySessionStore()))
+    monkeypatch.setattr(chat_chain, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(chat_chain, "INTENT_ROUTER_ENABLED", True)
+    return ChatChain
+
+def test_routed_turn_skips_the_agent(make_chain):
+    chain = make_chain(mode="agent")
+    assert chain.get_response("Thank you so much!") == get_thanks_response()
+    assert chain.executor.inputs == []
+    assert chain.route_counts == {"fast_path": 1}
+
+    chain.get_response("What is the routing number for wire transfers?")
+    assert len(chain.executor.inputs) == 1
+    assert chain.route_counts == {"fast_path": 1, "agent": 1}
+
+def test_pre_retrieval_puts_results_in_the_prompt(make_chain, monkeypatch):
+    queries = []
+    monkeypatch.setattr(chat_chain, "search_context", lambda query: queries.append(query) or "Reset your PIN in the app.")
+    monkeypatch.setattr(chat_chain, "INTENT_ROUTER_ENABLED", False)
+    chain = make_chain(mode="pre_retrieval")
+
+    assert "search_knowledge_base" not in [tool.name for tool in chain.tools]
+    assert "context" in chain.executor.prompt.input_variables
+
+    chain.get_response("How do I reset my card PIN?")
+    assert chain.executor.inputs[0]["context"] == "Reset your PIN in the app."
+    assert chain._tools_used([]) == {"search_knowledge_base"}
+
+    # A follow-up is searched together with the member's previous message
+    chain.get_response("And for a credit card?")
+    assert queries == ["How do I reset my card PIN?", "How do I reset my card PIN?\nAnd for a credit card?"]
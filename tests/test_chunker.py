@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from chunker import StructuredChunker, count_tokens, _classify
+from langchain.schema import Document
+
+def words(text):
+    return len(text.split())
+
+def block(kind, text, font_size=10.0, page=0):
+    return Document(page_content=text, metadata={"source": "manual.pdf", "page": page, "kind": kind, "font_size": font_size})
+
+def test_headings_start_sections_with_titles():
+    chunker = StructuredChunker(max_tokens=50, count=words)
+    chunks = chunker.split_documents([
+        block("heading", "Cards", 16),
+        block("heading", "PIN reset", 13),
+        block("text", "Reset your PIN in the app."),
+        block("heading", "Lost cards", 13, page=1),
+        block("text", "Call us to freeze a lost card."),
+        block("heading", "Loans", 16, page=2),
+        block("text", "Rates vary by term."),
+    ])
+    assert [chunk.metadata["section"] for chunk in chunks] == ["Cards > PIN reset", "Cards > Lost cards", "Loans"]
+    assert chunks[1].page_content == "Lost cards\nCall us to freeze a lost card."
+    assert chunks[1].metadata["page"] == 1
+
+def test_list_stays_with_its_lead_in():
+    chunker = StructuredChunker(max_tokens=20, count=words)
+    chunks = chunker.split_documents([
+        block("text", "Members can visit any branch for help with their accounts."),
+        block("text", "To reset your PIN:"),
+        block("list", "1. Open the app\n2. Tap Cards"),
+        block("list", "3. Choose Reset PIN"),
+    ])
+    assert chunks[-1].page_content == "To reset your PIN:\n1. Open the app\n2. Tap Cards\n3. Choose Reset PIN"
+
+def test_oversized_table_split_by_row_with_header():
+    chunker = StructuredChunker(max_tokens=12, count=words)
+    rows = "\n".join(f"Fee{i} | ${i}" for i in range(8))
+    chunks = chunker.split_documents([block("table", f"Fee | Amount\n{rows}")])
+    assert len(chunks) > 1
+    assert all(chunk.page_content.startswith("Fee | Amount\n") for chunk in chunks)
+    assert all(words(chunk.page_content) <= 12 for chunk in chunks)
+    assert sum(chunk.page_content.count("$") for chunk in chunks) == 8
+
+def test_long_paragraph_split_by_sentence_with_overlap():
+    chunker = StructuredChunker(max_tokens=12, overlap_tokens=3, count=words)
+    text = " ".join(f"Step {i} done." for i in range(10))
+    chunks = chunker.split_documents([block("text", text)])
+    assert all(words(chunk.page_content) <= 12 for chunk in chunks)
+    # Each piece repeats the last sentence of the one before
+    assert chunks[1].page_content.startswith(chunks[0].page_content.split(". ")[-1])
+
+def test_newlines_between_blocks_count_toward_the_budget():
+    # Short blocks cost about as much in joining newlines as in text
+    chunker = StructuredChunker(max_tokens=50)
+    chunks = chunker.split_documents([block("text", "Yes.") for _ in range(100)])
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk.page_content) <= 50 for chunk in chunks)
+
+def test_emphasized_numbered_line_is_a_heading():
+    assert _classify("1. Card Services", 10.0, True, 10.0) == "heading"
+    assert _classify("2. Loans", 14.0, False, 10.0) == "heading"
+    assert _classify("1. Open the app", 10.0, False, 10.0) == "list"
+    assert _classify("1. Open the app, then tap Cards.", 10.0, True, 10.0) == "list"
+    assert _classify("• Savings", 10.0, True, 10.0) == "list"
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from context_compressor import ContextCompressor, find_boilerplate
+from langchain.schema import Document
+
+def words(text):
+    return len(text.split())
+
+def docs(*texts):
+    return [Document(page_content=text) for text in texts]
+
+def test_overlapping_chunk_text_removed():
+    compressor = ContextCompressor(count=words, min_overlap_chars=10)
+    context, stats = compressor.compress("reset PIN code", docs(
+        "Open the app. Tap Cards and choose Reset PIN.",
+        "Tap Cards and choose Reset PIN. Confirm with the code we text you."
+    ))
+    assert context.count("Tap Cards") == 1
+    assert "Confirm with the code" in context
+    assert stats["tokens_saved"] == stats["tokens_in"] - stats["tokens_out"] > 0
+
+def test_boilerplate_and_page_numbers_dropped():
+    boilerplate = find_boilerplate(["Horizon Bay CU\nLoans", "Horizon Bay CU\nCards", "Horizon Bay CU\nFees"], min_count=3)
+    assert boilerplate == {"horizon bay cu"}
+    compressor = ContextCompressor(boilerplate=boilerplate, count=words)
+    context, _ = compressor.compress("card fees", docs("Horizon Bay CU\nCard fees are waived.\nPage 3 of 12"))
+    assert context == "Card fees are waived."
+
+def test_irrelevant_sentences_dropped_outside_top_chunk():
+    compressor = ContextCompressor(count=words, min_relevance=0.1)
+    context, _ = compressor.compress("wire transfer limit", docs(
+        "Members may send wires online. Branch hours vary.",
+        "Our history began in 1950. Founders met in Baltimore. Staff enjoy picnics. Wire transfer limits are $10,000 daily."
+    ))
+    # The top chunk is kept whole, the second only where it matches and its neighbour
+    assert "Branch hours vary." in context
+    assert "Wire transfer limits are $10,000 daily." in context
+    assert "Staff enjoy picnics." in context
+    assert "Founders met" not in context
+
+def test_token_budget_drops_least_relevant_first():
+    compressor = ContextCompressor(token_budget=10, count=words)
+    context, stats = compressor.compress("overdraft fee", docs(
+        "The overdraft fee is $25. Courtesy pay is optional. Checks clear in two days."
+    ))
+    assert context == "The overdraft fee is $25. Courtesy pay is optional."
+    assert stats["tokens_out"] <= 10
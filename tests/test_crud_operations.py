@@ -9,7 +9,8 @@ import pytest
 from database import (
     UserCRUD, UserCreate, UserUpdate,
     ConversationCRUD, ConversationCreate, ConversationUpdate,
-    MessageCRUD, MessageCreate, MessageUpdate
+    MessageCRUD, MessageCreate, MessageUpdate,
+    SessionCRUD
 )
 
 @pytest.fixture
@@ -288,4 +289,68 @@ def test_get_messages_by_conversation():
     MessageCRUD.delete(msg1.id)
     MessageCRUD.delete(msg2.id)
     ConversationCRUD.delete(conversation.id)
-    UserCRUD.delete(user.id) 
\ No newline at end of file
+    UserCRUD.delete(user.id)
+
+# Session Bootstrap Tests
+def test_session_bootstrap_creates_user_and_conversation():
+    session_id = f"test_{uuid.uuid4().hex[:8]}"
+    session = SessionCRUD.get_or_create(session_id)
+    
+    user = UserCRUD.get(session.user_id)
+    assert user.email == f"anonymous_{session_id}@demo.com"
+    assert ConversationCRUD.get(session.conversation_id).user_id == user.id
+    
+    # Clean up in correct order
+    ConversationCRUD.delete(session.conversation_id)
+    UserCRUD.delete(session.user_id)
+
+def test_session_bootstrap_is_idempotent():
+    session_id = f"test_{uuid.uuid4().hex[:8]}"
+    first = SessionCRUD.get_or_create(session_id)
+    second = SessionCRUD.get_or_create(session_id)
+    assert first == second
+    
+    # Clean up in correct order
+    ConversationCRUD.delete(first.conversation_id)
+    UserCRUD.delete(first.user_id)
+
+# Pagination Tests
+def test_get_messages_page_by_conversation():
+    user = UserCRUD.create(UserCreate(email=f"testuser_{uuid.uuid4().hex[:8]}@example.com", name="Test User"))
+    conversation = ConversationCRUD.create(ConversationCreate(user_id=user.id))
+    messages = [MessageCRUD.create(MessageCreate(conversation_id=conversation.id, content=f"Message {i}")) for i in range(5)]
+    
+    # Walk every page and check nothing is skipped or repeated
+    seen = []
+    after = None
+    while True:
+        page = MessageCRUD.get_page(limit=2, after=after, order_by="sent_at", conversation_id=conversation.id)
+        assert len(page.items) <= 2
+        seen.extend(msg.id for msg in page.items)
+        if not page.next_cursor:
+            break
+        after = page.next_cursor
+    assert seen == [msg.id for msg in messages]
+    
+    # Clean up in correct order
+    for msg in messages:
+        MessageCRUD.delete(msg.id)
+    ConversationCRUD.delete(conversation.id)
+    UserCRUD.delete(user.id)
+
+# Latest-N Query Tests
+def test_get_latest_conversation_and_recent_messages():
+    user = UserCRUD.create(UserCreate(email=f"testuser_{uuid.uuid4().hex[:8]}@example.com", name="Test User"))
+    older = ConversationCRUD.create(ConversationCreate(user_id=user.id))
+    latest = ConversationCRUD.create(ConversationCreate(user_id=user.id))
+    messages = [MessageCRUD.create(MessageCreate(conversation_id=latest.id, content=f"Message {i}")) for i in range(7)]
+    
+    assert ConversationCRUD.get_latest_by_user(user.id).id == latest.id
+    assert MessageCRUD.get_recent_contents(latest.id, limit=3) == ["Message 4", "Message 5", "Message 6"]
+    
+    # Clean up in correct order
+    for msg in messages:
+        MessageCRUD.delete(msg.id)
+    ConversationCRUD.delete(older.id)
+    ConversationCRUD.delete(latest.id)
+    UserCRUD.delete(user.id)
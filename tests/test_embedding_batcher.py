@@ -0,0 +1,99 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from embedding_batcher import EmbeddingBatcher, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class FlakyEmbeddings:
+    """Fails the first `failures` calls, like a burst of 429s"""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("429 Too Many Requests")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.batches.append(list(texts))
+        # Hold the slot like a real request, so overlapping calls are seen
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(len(text))] for text in texts]
+
+def no_sleep(seconds):
+    pass
+
+def test_batches_cover_every_text():
+    embeddings = FlakyEmbeddings(delay=0.05)
+    batcher = EmbeddingBatcher(embeddings, batch_size=3, max_concurrency=2, sleep=no_sleep)
+    texts = [f"chunk {i}" for i in range(10)]
+
+    vectors = [None] * len(texts)
+    for offset, batch in batcher.iter_batches(texts):
+        vectors[offset:offset + len(batch)] = batch
+
+    assert vectors == [[float(len(text))] for text in texts]
+    assert sorted(len(batch) for batch in embeddings.batches) == [1, 3, 3, 3]
+    assert embeddings.max_in_flight == 2
+
+def test_retries_with_backoff():
+    sleeps = []
+    embeddings = FlakyEmbeddings(failures=2)
+    batcher = EmbeddingBatcher(embeddings, batch_size=10, max_retries=3, retry_backoff=1.0, sleep=sleeps.append)
+    assert list(batcher.iter_batches(["a", "b"])) == [(0, [[1.0], [1.0]])]
+    assert sleeps == [1.0, 2.0]
+
+def test_gives_up_after_max_retries():
+    batcher = EmbeddingBatcher(FlakyEmbeddings(failures=10), max_retries=1, sleep=no_sleep)
+    with pytest.raises(RuntimeError):
+        list(batcher.iter_batches(["a"]))
+
+def test_stream_is_read_lazily():
+    pulled = []
+
+    def source():
+        for i in range(100):
+            pulled.append(i)
+            yield f"chunk {i}"
+
+    batcher = EmbeddingBatcher(FlakyEmbeddings(), batch_size=5, max_concurrency=2, sleep=no_sleep)
+    stream = batcher.iter_stream(source())
+    batch, vectors = next(stream)
+    assert vectors == [[float(len(text))] for text in batch]
+    # Two batches in flight and a third being filled, never the whole source
+    assert len(pulled) <= 15
+    stream.close()
+
+def test_token_bucket_throttles():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock, sleep=clock.sleep)  # One per second
+    for _ in range(60):
+        bucket.acquire()
+    assert clock.now == 0
+    bucket.acquire(2)
+    assert clock.now == pytest.approx(2.0)
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings, SQLiteEmbeddingStore
+
+class CountingEmbeddings(Embeddings):
+    model = "fake-model"
+
+    def __init__(self):
+        self.query_calls = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return [float(len(text)), 0.5]
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), 0.5] for text in texts]
+
+def test_repeated_query_embedded_once():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner)
+    first = cached.embed_query("card pin reset")
+    assert cached.embed_query("  card   pin reset ") == first
+    assert inner.query_calls == 1
+    assert (cached.hits, cached.misses) == (1, 1)
+
+def test_lru_bound():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner, max_entries=2)
+    for text in ["a", "b", "c"]:
+        cached.embed_query(text)
+    cached.embed_query("a")
+    assert inner.query_calls == 4
+    assert cached.stats()["entries"] == 2
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, store=SQLiteEmbeddingStore(path)).embed_query("branch hours")
+
+    restarted = CachedEmbeddings(inner, store=SQLiteEmbeddingStore(path))
+    assert restarted.embed_query("branch hours") == [12.0, 0.5]
+    assert inner.query_calls == 1
+    assert restarted.disk_hits == 1
+
+def test_cache_keyed_by_model(tmp_path):
+    store = SQLiteEmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    inner = CountingEmbeddings()
+    CachedEmbeddings(inner, store=store, model="model-a").embed_query("hours")
+    CachedEmbeddings(inner, store=store, model="model-b").embed_query("hours")
+    assert inner.query_calls == 2
+
+def test_documents_pass_through():
+    inner = CountingEmbeddings()
+    cached = CachedEmbeddings(inner)
+    assert cached.embed_documents(["ab", "abc"]) == [[2.0, 0.5], [3.0, 0.5]]
+    assert cached.stats()["misses"] == 0
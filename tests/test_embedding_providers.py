@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from embedding_providers import HashingEmbeddings, create_embeddings, is_local
+
+def cosine(a, b):
+    return float(np.dot(a, b))
+
+def test_vectors_are_unit_length_and_deterministic():
+    embeddings = HashingEmbeddings(dimensions=256)
+    vector = embeddings.embed_query("How do I reset my card PIN?")
+    assert len(vector) == 256
+    assert np.linalg.norm(vector) == pytest.approx(1.0, abs=1e-5)
+    assert HashingEmbeddings(dimensions=256).embed_query("How do I reset my card PIN?") == vector
+
+def test_shared_wording_is_more_similar():
+    embeddings = HashingEmbeddings()
+    query = embeddings.embed_query("reset my debit card PIN")
+    related, unrelated = embeddings.embed_documents([
+        "To reset your debit card PIN, visit any branch or call member services.",
+        "Auto loan rates start at 5.9% APR for qualified members."
+    ])
+    assert cosine(query, related) > cosine(query, unrelated)
+
+def test_empty_text():
+    assert not any(HashingEmbeddings(dimensions=8).embed_query(""))
+
+def test_create_embeddings():
+    assert is_local(create_embeddings("local"))
+    with pytest.raises(ValueError):
+        create_embeddings("unknown")
@@ -0,0 +1,195 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+import document_pipeline
+from document_pipeline import DocumentPipeline, chunk_ids
+from bm25_index import BM25Index, HybridRetriever
+from langchain.schema import Document
+
+class FakeVectorStore:
+    """Records upserts and deletes by id, like the Chroma collection"""
+
+    def __init__(self):
+        self.docs = {}
+        self._collection = self
+
+    def count(self):
+        return len(self.docs)
+
+    def get(self, ids=None, include=None):
+        found = [chunk_id for chunk_id in self.docs if ids is None or chunk_id in ids]
+        return {
+            "ids": found,
+            "documents": [self.docs[chunk_id].page_content for chunk_id in found],
+            "metadatas": [self.docs[chunk_id].metadata for chunk_id in found]
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.docs.update(
+            (chunk_id, Document(page_content=text, metadata=metadata))
+            for chunk_id, text, metadata in zip(ids, documents, metadatas)
+        )
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.docs.pop(chunk_id, None)
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [[float(len(text))] for text in texts]
+
+class TextLoader:
+    """Stands in for PyMuPDFLoader: one page per paragraph of a text file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        text = Path(self.path).read_text()
+        return [Document(page_content=page, metadata={"source": self.path}) for page in text.split("\n\n")]
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_pipeline, "PyMuPDFLoader", TextLoader)
+    monkeypatch.setattr(document_pipeline, "create_embeddings", FakeEmbeddings)
+    monkeypatch.setattr(document_pipeline, "cached_embeddings", lambda embeddings: embeddings)
+    monkeypatch.setattr(document_pipeline, "bump_index_version", lambda: None)
+    pipeline = DocumentPipeline()
+    pipeline.manifest_path = str(tmp_path / "manifest.json")
+    pipeline.vectorstore = FakeVectorStore()
+    pipeline.lexical_index = BM25Index(str(tmp_path / "bm25_index.json"))
+    pipeline.parse_workers = 1
+    # TextLoader yields plain pages, not layout blocks
+    pipeline.chunker = "character"
+    return pipeline
+
+def test_chunk_ids_stable_and_unique():
+    chunks = [Document(page_content="header"), Document(page_content="body"), Document(page_content="header")]
+    ids = chunk_ids("a.pdf", chunks)
+    assert len(set(ids)) == 3
+    assert chunk_ids("a.pdf", chunks) == ids
+    assert chunk_ids("b.pdf", chunks) != ids
+
+def test_only_changes_are_embedded(pipeline, tmp_path):
+    pdf_dir = tmp_path / "kb"
+    pdf_dir.mkdir()
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nLost cards")
+    (pdf_dir / "loans.pdf").write_text("Loan rates")
+
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["added"] == ["cards.pdf", "loans.pdf"]
+    assert pipeline.embedding_function.embedded == 3
+
+    # Nothing changed: nothing is loaded or embedded
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["unchanged"] == ["cards.pdf", "loans.pdf"]
+    assert pipeline.embedding_function.embedded == 3
+
+    # One new page in one file: only that page is embedded
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nLost cards\n\nCard limits")
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["changed"] == ["cards.pdf"]
+    assert (report["chunks_added"], report["chunks_deleted"]) == (1, 0)
+    assert pipeline.vectorstore.count() == 4
+
+def test_edited_and_removed_chunks_deleted(pipeline, tmp_path):
+    pdf_dir = tmp_path / "kb"
+    pdf_dir.mkdir()
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nLost cards")
+    (pdf_dir / "loans.pdf").write_text("Loan rates")
+    pipeline.update_vectorstore(str(pdf_dir))
+
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nStolen cards")
+    (pdf_dir / "loans.pdf").unlink()
+    report = pipeline.update_vectorstore(str(pdf_dir))
+
+    assert report["changed"] == ["cards.pdf"]
+    assert report["removed"] == ["loans.pdf"]
+    assert (report["chunks_added"], report["chunks_deleted"]) == (1, 2)
+    assert sorted(doc.page_content for doc in pipeline.vectorstore.docs.values()) == ["Card PIN reset", "Stolen cards"]
+    # The lexical index follows the same changes
+    assert sorted(pipeline.lexical_index.docs) == sorted(pipeline.vectorstore.docs)
+
+def test_parallel_parse_keeps_order_and_isolates_errors(pipeline, tmp_path):
+    pdf_dir = tmp_path / "kb"
+    pdf_dir.mkdir()
+    for name in ["c", "a", "b"]:
+        (pdf_dir / f"{name}.pdf").write_text(f"Manual {name}")
+    (pdf_dir / "broken.pdf").mkdir()  # Unreadable as a file
+
+    pipeline.parse_workers = 2
+    documents = pipeline.load_documents(str(pdf_dir))
+    assert [doc.page_content for doc in documents] == ["Manual a", "Manual b", "Manual c"]
+
+def test_interrupted_run_resumes_without_reembedding(pipeline, tmp_path):
+    pdf_dir = tmp_path / "kb"
+    pdf_dir.mkdir()
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nLost cards")
+
+    # A previous run stored one chunk and died before writing the manifest
+    chunks = pipeline.chunk_documents(TextLoader(str(pdf_dir / "cards.pdf")).load())
+    pipeline._index_chunks(chunks[:1], chunk_ids("cards.pdf", chunks)[:1])
+    assert pipeline.embedding_function.embedded == 1
+
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["added"] == ["cards.pdf"]
+    assert pipeline.embedding_function.embedded == 2
+    assert pipeline.vectorstore.count() == 2
+
+def test_rebuild_deletes_chunks_missing_from_the_manifest(pipeline, tmp_path):
+    pdf_dir = tmp_path / "kb"
+    pdf_dir.mkdir()
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nLost cards")
+
+    # A collection built before the manifest existed, under other ids
+    legacy = [Document(page_content="Card PIN reset"), Document(page_content="Old loan rates")]
+    pipeline._index_chunks(legacy, ["legacy-1", "legacy-2"])
+    assert not Path(pipeline.manifest_path).exists()
+
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["added"] == ["cards.pdf"]
+    assert report["chunks_deleted"] == 2
+    assert sorted(doc.page_content for doc in pipeline.vectorstore.docs.values()) == ["Card PIN reset", "Lost cards"]
+    assert sorted(pipeline.lexical_index.docs) == sorted(pipeline.vectorstore.docs)
+
+    # Once swept, the next run is incremental again
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["unchanged"] == ["cards.pdf"]
+    assert report["chunks_deleted"] == 0
+
+def test_hybrid_retriever_fills_lexical_index_from_collection(pipeline, monkeypatch):
+    monkeypatch.setattr(document_pipeline, "HYBRID_RETRIEVAL", True)
+    pipeline.vector_index = None
+    # A collection ingested before the lexical index existed
+    pipeline.vectorstore.upsert(["a", "b"], [[1.0], [2.0]], ["Card PIN reset", "Loan rates"], [{"source": "cards.pdf"}, {"source": "loans.pdf"}])
+
+    retriever = pipeline.get_retriever()
+    assert isinstance(retriever, HybridRetriever)
+    assert sorted(pipeline.lexical_index.docs) == ["a", "b"]
+    assert pipeline.lexical_index.document("a").metadata == {"source": "cards.pdf"}
+
+def test_changed_chunking_settings_rechunk_every_file(pipeline, tmp_path, monkeypatch):
+    pdf_dir = tmp_path / "kb"
+    pdf_dir.mkdir()
+    (pdf_dir / "cards.pdf").write_text("Card PIN reset\n\nLost cards")
+    pipeline.update_vectorstore(str(pdf_dir))
+    assert pipeline.embedding_function.embedded == 2
+
+    monkeypatch.setattr(document_pipeline, "CHUNK_SIZE", 500)
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["added"] == ["cards.pdf"]
+    assert not report["unchanged"]
+    # Chunks the new settings produce unchanged are not embedded again
+    assert pipeline.embedding_function.embedded == 2
+
+    report = pipeline.update_vectorstore(str(pdf_dir))
+    assert report["unchanged"] == ["cards.pdf"]
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from intent_router import IntentRouter
+from response_templates import get_welcome_response, get_thanks_response, get_goodbye_response
+
+@pytest.mark.parametrize("message, response", [
+    ("Hi!", get_welcome_response()),
+    ("Good morning, Alexa", get_welcome_response()),
+    ("Thank you so much!", get_thanks_response()),
+    ("thanks, bye", get_goodbye_response()),
+    ("That's all, have a great day", get_goodbye_response()),
+])
+def test_trivial_turns_take_fast_path(message, response):
+    route = IntentRouter().route(message)
+    assert route["response"] == response
+    assert route["method"] == "rules"
+    assert route["confidence"] >= 0.9
+
+@pytest.mark.parametrize("message", [
+    "Hi, I lost my card",
+    "Thanks, also how do I order checks?",
+    "How are your loan rates?",
+    "What is a good day to visit a branch?",
+    "",
+])
+def test_support_questions_go_to_agent(message):
+    assert IntentRouter().route(message) is None
+
+def test_threshold_is_configurable():
+    message = "thanks for sorting that out"
+    assert IntentRouter().route(message) is None
+    assert IntentRouter(rule_threshold=0.4).route(message)["intent"] == "thanks"
+
+def test_classifier_catches_typos():
+    router = IntentRouter(use_classifier=True, classifier_threshold=0.5)
+    assert IntentRouter().route("helloo") is None
+    assert router.route("helloo")["method"] == "classifier"
+    assert router.route("how do i reset my pin") is None
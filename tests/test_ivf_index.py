@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from vector_index import IVFVectorIndex
+
+def build(tmp_path, count=2000, nlist=16, nprobe=4, seed=0):
+    rng = np.random.default_rng(seed)
+    # Clustered data, like chunks grouped by topic
+    centers = rng.normal(size=(nlist, 32))
+    vectors = centers[rng.integers(nlist, size=count)] + 0.3 * rng.normal(size=(count, 32))
+    index = IVFVectorIndex(str(tmp_path / "ivf_index"), nlist=nlist, nprobe=nprobe, min_train_size=500)
+    ids = [f"chunk-{i}" for i in range(count)]
+    index.upsert(ids, ids, [{} for _ in ids], vectors.tolist())
+    index.save()
+    return index, vectors
+
+def exact_top(vectors, query, k):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(unit @ query))[:k])
+
+def test_small_index_is_searched_exactly(tmp_path):
+    index, vectors = build(tmp_path, count=200)
+    assert index.centroids is None
+    assert [row for row, _ in index.search(vectors[7], k=5)] == exact_top(vectors, vectors[7], 5)
+
+def test_probing_every_list_is_exact(tmp_path):
+    index, vectors = build(tmp_path)
+    index.nprobe = index.nlist
+    for query in vectors[:20]:
+        assert [row for row, _ in index.search(query, k=5)] == exact_top(vectors, query, 5)
+
+def test_recall_with_few_probes(tmp_path):
+    index, vectors = build(tmp_path)
+    queries = vectors[:50] + 0.1
+    found = sum(
+        len(set(row for row, _ in index.search(query, k=10)) & set(exact_top(vectors, query, 10)))
+        for query in queries
+    )
+    assert found / (10 * len(queries)) >= 0.9
+
+def test_reload_and_incremental_insert(tmp_path):
+    index, vectors = build(tmp_path)
+    loaded = IVFVectorIndex.load(str(tmp_path / "ivf_index"))
+    assert np.array_equal(loaded.centroids, index.centroids)
+    assert np.array_equal(loaded.assignments, index.assignments)
+
+    # New and deleted rows keep the inverted lists aligned without retraining
+    loaded.upsert(["new"], ["new"], [{}], [list(vectors[3] * 2)])
+    loaded.delete(["chunk-0"])
+    assert len(loaded.assignments) == len(loaded) == 2000
+    assert {loaded.ids[row] for row, _ in loaded.search(vectors[3], k=2)} == {"new", "chunk-3"}
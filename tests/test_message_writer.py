@@ -0,0 +1,51 @@
+import sys
+import json
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from pydantic import BaseModel
+from message_writer import MessageWriter
+
+class FakeMessage(BaseModel):
+    conversation_id: int
+    content: str
+
+def test_messages_written_in_order(tmp_path):
+    batches = []
+    writer = MessageWriter(persist_batch=batches.append, batch_size=3, dead_letter_path=str(tmp_path / "dead.jsonl"))
+    writer.start()
+    for i in range(7):
+        writer.enqueue(FakeMessage(conversation_id=1, content=f"message {i}"))
+    writer.close()
+
+    written = [msg.content for batch in batches for msg in batch]
+    assert written == [f"message {i}" for i in range(7)]
+    assert all(len(batch) <= 3 for batch in batches)
+
+def test_failed_batch_retried_then_dead_lettered(tmp_path):
+    attempts = []
+
+    def failing_persist(batch):
+        attempts.append(batch)
+        raise Exception("database unavailable")
+
+    dead_letter = tmp_path / "dead.jsonl"
+    writer = MessageWriter(persist_batch=failing_persist, max_retries=2, retry_backoff=0, dead_letter_path=str(dead_letter))
+    writer.start()
+    writer.enqueue(FakeMessage(conversation_id=1, content="lost message"))
+    writer.flush()
+    writer.close()
+
+    assert len(attempts) == 3
+    entry = json.loads(dead_letter.read_text().strip())
+    assert entry["message"]["content"] == "lost message"
+
+def test_full_queue_goes_to_dead_letter(tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    # Not started, so nothing drains the queue
+    writer = MessageWriter(persist_batch=lambda batch: None, max_queue_size=1, dead_letter_path=str(dead_letter))
+    assert writer.enqueue(FakeMessage(conversation_id=1, content="first")) is True
+    assert writer.enqueue(FakeMessage(conversation_id=1, content="second")) is False
+    assert "second" in dead_letter.read_text()
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from prompt_manager import get_pre_retrieval_system_prompt
+
+def test_pre_retrieval_prompt_has_no_search_tool():
+    prompt = get_pre_retrieval_system_prompt()
+    assert "search_knowledge_base" not in prompt
+    for tool_name in ("record_user_details", "send_notification", "log_unknown_question"):
+        assert tool_name in prompt
+    # Used as a prompt template, so literal braces would be read as variables
+    assert "{" not in prompt and "}" not in prompt
@@ -0,0 +1,75 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from semantic_cache import SemanticCache, normalize_question, read_index_version, bump_index_version
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+# Questions about the same topic share a direction, so they are similar
+TOPICS = {"pin": [1.0, 0.0, 0.0], "hours": [0.0, 1.0, 0.0], "loan": [0.0, 0.0, 1.0]}
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        for topic, vector in TOPICS.items():
+            if topic in text:
+                return vector
+        return [0.5, 0.5, 0.5]
+
+def make_cache(**kwargs):
+    return SemanticCache(embed=FakeEmbedder(), index_version=lambda: "v1", **kwargs)
+
+def test_normalize_question():
+    assert normalize_question("  How do I reset my card PIN?? ") == "how do i reset my card pin"
+
+def test_similar_question_hits():
+    cache = make_cache()
+    cache.store("How do I reset my card PIN?", "Call us to reset it.")
+    assert cache.lookup("I forgot my PIN, how can I reset it") == "Call us to reset it."
+    assert cache.lookup("What are your hours?") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_exact_repeat_skips_embedding():
+    cache = make_cache()
+    cache.store("What are your hours?", "9 to 5.")
+    calls = cache.embed.calls
+    assert cache.lookup("what are your HOURS") == "9 to 5."
+    assert cache.embed.calls == calls
+
+def test_entries_expire():
+    clock = FakeClock()
+    cache = make_cache(ttl_seconds=10, clock=clock)
+    cache.store("What are your hours?", "9 to 5.")
+    clock.now = 11
+    assert cache.lookup("What are your hours?") is None
+    assert len(cache) == 0
+
+def test_least_recently_used_evicted():
+    cache = make_cache(max_entries=2)
+    cache.store("pin question", "pin answer")
+    cache.store("hours question", "hours answer")
+    cache.lookup("pin question")
+    cache.store("loan question", "loan answer")
+    assert cache.lookup("pin question") == "pin answer"
+    assert cache.lookup("hours question") is None
+
+def test_reindex_invalidates(tmp_path):
+    path = str(tmp_path / "index_version")
+    assert read_index_version(path) == ""
+    bump_index_version(path)
+
+    cache = SemanticCache(embed=FakeEmbedder(), index_version=lambda: read_index_version(path))
+    cache.store("What are your hours?", "9 to 5.")
+    bump_index_version(path)
+    assert cache.lookup("What are your hours?") is None
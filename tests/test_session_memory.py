@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from session_memory import SessionMemoryStore
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def count_messages(messages):
+    # One "token" per message keeps the window arithmetic obvious
+    return len(messages)
+
+def test_sessions_are_isolated():
+    store = SessionMemoryStore(token_counter=count_messages)
+    store.add_turn("a", "hello", "hi there")
+    assert len(store.get_history("a")) == 2
+    assert store.get_history("b") == []
+
+def test_history_trimmed_to_token_window():
+    store = SessionMemoryStore(token_counter=count_messages, max_tokens=4)
+    for i in range(5):
+        store.add_turn("a", f"question {i}", f"answer {i}")
+    history = store.get_history("a")
+    assert len(history) == 4
+    assert history[0].content == "question 3"
+
+def test_lru_cap_evicts_least_recently_used():
+    store = SessionMemoryStore(token_counter=count_messages, max_sessions=2)
+    store.add_turn("a", "q", "a")
+    store.add_turn("b", "q", "a")
+    store.get_history("a")  # "a" is now most recently used
+    store.add_turn("c", "q", "a")
+    assert len(store) == 2
+    assert store.get_history("b") == []
+    assert store.get_history("a") != []
+
+def test_idle_sessions_expire():
+    clock = FakeClock()
+    store = SessionMemoryStore(token_counter=count_messages, ttl_seconds=60, clock=clock)
+    store.add_turn("a", "q", "a")
+    clock.now = 61
+    assert store.get_history("a") == []
+    assert len(store) == 0
@@ -0,0 +1,106 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from session_registry import SessionRegistry, SQLiteSessionStore, MemorySessionStore
+
+def test_create_called_once_per_session(tmp_path):
+    registry = SessionRegistry(SQLiteSessionStore(str(tmp_path / "sessions.sqlite3")))
+    created = []
+
+    def create():
+        created.append(1)
+        return 42
+
+    assert registry.get_or_create("abc", create) == 42
+    assert registry.get_or_create("abc", create) == 42
+    assert len(created) == 1
+
+def test_mapping_shared_between_registries(tmp_path):
+    # Two registries stand in for two workers (or a restart) on one host
+    path = str(tmp_path / "sessions.sqlite3")
+    first = SessionRegistry(SQLiteSessionStore(path))
+    second = SessionRegistry(SQLiteSessionStore(path))
+
+    first.get_or_create("abc", lambda: 7)
+    assert second.get("abc") == 7
+    assert second.get_or_create("abc", lambda: 99) == 7
+
+def test_concurrent_bootstrap_agrees_on_one_conversation(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    created = []
+    results = []
+
+    def create():
+        # Like the get-or-create RPC: every call returns the same conversation
+        created.append(1)
+        return 1
+
+    def worker():
+        registry = SessionRegistry(SQLiteSessionStore(path))
+        results.append(registry.get_or_create("abc", create))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 1 <= len(created) <= 8
+    assert results == [1] * 8
+    assert SQLiteSessionStore(path).get("abc") == 1
+
+def test_create_runs_without_holding_the_write_lock(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    other = SQLiteSessionStore(path)
+
+    def create():
+        # Another worker bootstraps a different session during the remote call
+        assert other.get_or_create("other", lambda: 2) == 2
+        return 1
+
+    store = SQLiteSessionStore(path)
+    store._connection().execute("PRAGMA busy_timeout = 100")
+    other._connection().execute("PRAGMA busy_timeout = 100")
+    assert store.get_or_create("abc", create) == 1
+
+def test_lru_front_is_bounded():
+    registry = SessionRegistry(MemorySessionStore(), max_entries=2)
+    for i in range(5):
+        registry.get_or_create(f"session_{i}", lambda i=i: i)
+    assert len(registry._cache) == 2
+    # Evicted entries are still served by the backing store
+    assert registry.get("session_0") == 0
+
+def test_async_bootstrap_awaits_create_once(tmp_path):
+    registry = SessionRegistry(SQLiteSessionStore(str(tmp_path / "sessions.sqlite3")))
+    created = []
+
+    async def create():
+        created.append(1)
+        return 42
+
+    async def bootstrap():
+        first = await registry.aget_or_create("abc", create)
+        second = await registry.aget_or_create("abc", create)
+        return first, second
+
+    assert asyncio.run(bootstrap()) == (42, 42)
+    assert len(created) == 1
+
+def test_async_bootstrap_reuses_mapping_from_another_worker(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SessionRegistry(SQLiteSessionStore(path)).get_or_create("abc", lambda: 7)
+    created = []
+
+    async def create():
+        created.append(1)
+        return 99
+
+    second = SessionRegistry(SQLiteSessionStore(path))
+    assert asyncio.run(second.aget_or_create("abc", create)) == 7
+    assert created == []
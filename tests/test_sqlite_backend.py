@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from storage_backends import SQLiteBackend, create_storage_backend
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "member_support.sqlite3"))
+
+def test_insert_returns_stored_rows(backend):
+    rows = backend.insert("users", [{"name": "Jane", "email": "jane@example.com"}])
+    assert rows[0]["id"] == 1
+    assert rows[0]["email"] == "jane@example.com"
+
+    conversation = backend.insert("conversations", [{"user_id": rows[0]["id"]}])[0]
+    assert conversation["started_at"]  # Filled by the column default
+
+def test_select_update_delete(backend):
+    user = backend.insert("users", [{"name": "Jane", "email": "jane@example.com"}])[0]
+
+    assert backend.select("users", {"email": "jane@example.com"})[0]["id"] == user["id"]
+    assert backend.select("users", {"email": "nobody@example.com"}) == []
+
+    updated = backend.update("users", {"id": user["id"]}, {"name": "Jane Doe"})
+    assert updated[0]["name"] == "Jane Doe"
+
+    assert len(backend.delete("users", {"id": user["id"]})) == 1
+    assert backend.select("users") == []
+
+def test_unique_email_enforced(backend):
+    import sqlite3
+
+    backend.insert("users", [{"name": "Jane", "email": "jane@example.com"}])
+    with pytest.raises(sqlite3.IntegrityError):
+        backend.insert("users", [{"name": "Jane", "email": "jane@example.com"}])
+
+def test_batch_insert_is_atomic(backend):
+    import sqlite3
+
+    with pytest.raises(sqlite3.IntegrityError):
+        backend.insert("users", [
+            {"name": "Jane", "email": "jane@example.com"},
+            {"name": "Copy", "email": "jane@example.com"}
+        ])
+    assert backend.select("users") == []
+
+def test_keyset_pages_cover_every_row_once(backend):
+    conversation = backend.insert("conversations", [{}])[0]
+    # Identical timestamps force the id tie-breaker
+    backend.insert("messages", [
+        {"conversation_id": conversation["id"], "content": f"m{i}", "sent_at": "2025-07-01T00:00:00.000"}
+        for i in range(5)
+    ])
+
+    seen, keyset = [], None
+    while True:
+        rows = backend.select("messages", order=[("sent_at", False), ("id", False)], limit=2, keyset=keyset)
+        seen.extend(row["content"] for row in rows)
+        if len(rows) < 2:
+            break
+        keyset = ("sent_at", "gt", rows[-1]["sent_at"], rows[-1]["id"])
+
+    assert seen == [f"m{i}" for i in range(5)]
+
+def test_conditions_and_order(backend):
+    conversation = backend.insert("conversations", [{}])[0]
+    backend.insert("messages", [
+        {"conversation_id": conversation["id"], "content": "old", "sent_at": "2025-06-01T00:00:00.000"},
+        {"conversation_id": conversation["id"], "content": "new", "sent_at": "2025-07-02T00:00:00.000"}
+    ])
+
+    rows = backend.select("messages", conditions=[("sent_at", "gte", "2025-07-01")])
+    assert [row["content"] for row in rows] == ["new"]
+
+    rows = backend.select("messages", order=[("sent_at", True), ("id", True)], limit=1)
+    assert rows[0]["content"] == "new"
+
+def test_get_or_create_session_is_idempotent(backend):
+    first = backend.get_or_create_session("abc")
+    second = backend.get_or_create_session("abc")
+    other = backend.get_or_create_session("xyz")
+
+    assert first == second
+    assert other["conversation_id"] != first["conversation_id"]
+    assert len(backend.select("users")) == 2
+
+def test_rejects_unsafe_identifiers(backend):
+    with pytest.raises(ValueError):
+        backend.select("users; DROP TABLE users")
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_storage_backend("mongodb")
@@ -134,6 +134,54 @@ def test_search_knowledge_base_via_dispatcher():
     assert "result" in result
     assert isinstance(result["result"], str)
 
+def test_retriever_built_lazily_once(monkeypatch):
+    """Test that the retriever is built on first use, once"""
+    import tools
+
+    calls = []
+    monkeypatch.setattr(tools, "_retriever", None)
+    monkeypatch.setattr(tools, "_build_retriever", lambda: calls.append(1) or "retriever")
+
+    assert tools.retriever_status()["ready"] is False
+    assert tools.get_retriever() == "retriever"
+    assert tools.get_retriever() == "retriever"
+    assert calls == [1]
+    assert tools.retriever_status() == {"ready": True}
+
+def test_compressor_rebuilt_when_index_changes(monkeypatch):
+    """Test that the compressor follows re-indexing and never keeps an empty boilerplate set"""
+    import tools
+
+    class FakeLexicalIndex:
+        def __init__(self):
+            self.docs = {}
+
+        def refresh(self):
+            pass
+
+    class FakePipeline:
+        lexical_index = FakeLexicalIndex()
+
+    version = {"value": "v1"}
+    monkeypatch.setattr(tools, "CONTEXT_COMPRESSION", True)
+    monkeypatch.setattr(tools, "_retriever", "retriever")
+    monkeypatch.setattr(tools, "_document_pipeline", FakePipeline())
+    monkeypatch.setattr(tools, "_compressor", None)
+    monkeypatch.setattr(tools, "read_index_version", lambda: version["value"])
+
+    # Nothing indexed yet: nothing is learned and nothing is kept
+    assert tools.get_compressor().boilerplate == set()
+    assert tools._compressor is None
+
+    footer = "Member Services 555-0100"
+    FakePipeline.lexical_index.docs = {str(i): (f"Chunk {i}\n{footer}", {}) for i in range(5)}
+    first = tools.get_compressor()
+    assert first.boilerplate
+    assert tools.get_compressor() is first
+
+    version["value"] = "v2"
+    assert tools.get_compressor() is not first
+
 if __name__ == "__main__":
     print("🚀 Starting tools tests...\n")
     
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add backend to path
+sys.path.append(str(Path(__file__).parent.parent / "backend"))
+
+from vector_index import VectorIndex, VectorIndexRetriever
+
+class AxisEmbeddings:
+    """Embeds a query onto the axis named in it"""
+
+    def embed_query(self, text):
+        return [1.0 if axis in text else 0.0 for axis in ("x", "y", "z")]
+
+def build(tmp_path):
+    index = VectorIndex(str(tmp_path / "numpy_index"), embedding_function=AxisEmbeddings())
+    index.upsert(
+        ["a", "b", "c"],
+        ["about x", "about y", "about z"],
+        [{"source": "a.pdf"}, {"source": "b.pdf"}, {"source": "c.pdf"}],
+        [[2.0, 0.0, 0.0], [0.0, 3.0, 0.0], [0.0, 0.1, 1.0]]
+    )
+    return index
+
+def test_top_k_best_first(tmp_path):
+    index = build(tmp_path)
+    results = index.search([0.0, 1.0, 0.2], k=2)
+    assert [index.ids[row] for row, _ in results] == ["b", "c"]
+    assert results[0][1] == pytest.approx(1 / np.sqrt(1.04), rel=1e-5)
+
+def test_saved_index_is_memory_mapped(tmp_path):
+    build(tmp_path).save()
+    loaded = VectorIndex.load(str(tmp_path / "numpy_index"), embedding_function=AxisEmbeddings())
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.similarity_search("x marks the spot", k=1)[0].metadata == {"source": "a.pdf"}
+
+def test_upsert_replaces_and_delete_removes(tmp_path):
+    index = build(tmp_path)
+    index.upsert(["a"], ["now about y"], [{}], [[0.0, 1.0, 0.0]])
+    index.delete(["b"])
+    assert sorted(index.ids) == ["a", "c"]
+    row, _ = index.search([0.0, 1.0, 0.0], k=1)[0]
+    assert index.texts[row] == "now about y"
+
+def test_refresh_picks_up_new_version(tmp_path):
+    writer = build(tmp_path)
+    writer.save()
+    reader = VectorIndex.load(str(tmp_path / "numpy_index"))
+    writer.delete(["a"])
+    writer.save()
+    reader.refresh()
+    assert len(reader) == 2
+    # Only the current vectors file is kept
+    assert len(list((tmp_path / "numpy_index").glob("vectors-*.npy"))) == 1
+
+def test_retriever(tmp_path):
+    retriever = VectorIndexRetriever(index=build(tmp_path), k=1)
+    assert retriever.invoke("tell me about z")[0].page_content == "about z"